@@ -0,0 +1,27 @@
+"""Starts the bot.
+
+Usage:
+    python helasheroplannerbot      # from the repository root
+    python .                        # from this directory
+
+Settings come from HELA_* environment variables or the JSON config file (see
+config.py); HELA_DISCORD_TOKEN (or "DISCORD_TOKEN" in the file) is required.
+"""
+import logging
+
+import config
+
+
+def main():
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if not config.DISCORD_TOKEN:
+        raise SystemExit(f"No Discord bot token: set HELA_DISCORD_TOKEN or add DISCORD_TOKEN to {config.CONFIG_FILE}")
+
+    # Imported here so a missing token fails before discord.py and the commands are loaded
+    from helaheroplannerbot import create_app
+
+    create_app().run(config.DISCORD_TOKEN, log_handler=None)
+
+
+if __name__ == "__main__":
+    main()
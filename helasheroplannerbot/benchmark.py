@@ -0,0 +1,365 @@
+"""Offline load benchmark of the slash commands against an in-process Sheets API stand-in.
+
+Usage:
+    python benchmark.py                                    # 100, 1k, 10k and 100k roster rows
+    python benchmark.py --rows 10000 --concurrency 50 --latency 0.3 --error-rate 0.05
+    python benchmark.py --commands manage_hero plan_all --json results.json
+
+Every command is invoked `--invocations` times by random users, `--concurrency`
+at a time, through the real command callbacks, storage backend and Sheets
+gateway; only Google and Discord are replaced. For each command it reports
+throughput, p50/p95/p99 latency, Sheets API calls per invocation and failed
+replies. Needs the bot's own dependencies, but no credentials or network.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import config
+from fake_sheets import FakeSheetsGateway, FakeSheetsServer
+from hero_catalog import RARITY_ORDER
+from metrics import metrics
+from progression_costs import requirements
+from sheets_storage import SheetsBackend
+from storage import ROSTER_COLUMNS, ROSTER_SHEET
+
+DEFAULT_ROWS = (100, 1000, 10000, 100000)
+FIRST_USER_ID = 100000000000000000  # Discord ids are snowflakes of this size
+FAILURE_MARKERS = ("error occurred", "timed out")  # Replies the commands send when they fail
+
+# Commands in the order they are benchmarked: read-only ones first, then the ones that change rosters
+COMMAND_ORDER = (
+    "help",
+    "all_hero_statistics",
+    "hero_list",
+    "hero_info",
+    "my_heroes",
+    "my_heroes_with_input_information",
+    "add_hero",
+    "manage_hero",
+    "calculate_relics_needed",
+    "calculate_xp_and_oaths_needed",
+    "plan_all",
+    "remove_hero",
+    "reload_heroes",
+)
+# Share of --invocations run for commands that are rare in practice and hit the quota-paced Sheets API by design
+INVOCATION_SHARE = {"reload_heroes": 0.05}
+
+
+def build_spreadsheets(roster_rows, hero_count, heroes_per_user, seed):
+    """Generates a hero catalog and `roster_rows` roster rows in the bot's spreadsheet layout.
+
+    Returns (spreadsheets, heroes, user_ids) where heroes holds a
+    (name, rarity, max level) tuple per hero.
+    """
+    rng = random.Random(seed)
+    heroes = [(f"Hero {i + 1:03d}", RARITY_ORDER[i % len(RARITY_ORDER)], rng.choice((40, 50, 60))) for i in range(hero_count)]
+
+    master_tab = [["Name", "", "", "", "Rarity"]] + [[name, "", "", "", rarity] for name, rarity, _ in heroes]
+    hero_data = [["Name", "Rarity", "Max Level", "Council or March", "Signature Skill", "Level 10", "Level 20"]] + [
+        [name, rarity, str(max_level), rng.choice(("Council", "March")), f"{name} Strike", "+5% attack", "+10% attack"]
+        for name, rarity, max_level in heroes
+    ]
+
+    roster = [[column.replace("_", " ").title() for column in ROSTER_COLUMNS]]
+    user_ids = []
+    while len(roster) <= roster_rows:
+        user_id = FIRST_USER_ID + len(user_ids)
+        user_ids.append(user_id)
+        for name, _, max_level in rng.sample(heroes, min(heroes_per_user, hero_count, roster_rows + 1 - len(roster))):
+            current_level = rng.randint(1, max_level)
+            next_goal_level = rng.randint(current_level, max_level)
+            ultimate_goal_level = rng.randint(next_goal_level, max_level)
+            current_relics = rng.randint(0, 50000)
+            derived = requirements(current_level, current_relics, max_level, next_goal_level, ultimate_goal_level)
+            roster.append([str(value) for value in (user_id, name, current_level, current_relics, next_goal_level, ultimate_goal_level, *derived)])
+
+    spreadsheets = {
+        config.SPREADSHEET_ID: {"Master Tab": master_tab, ROSTER_SHEET: roster},
+        config.SPREADSHEET_ID_HERO_DATA: {"Hero Data General": hero_data},
+    }
+    return spreadsheets, heroes, user_ids
+
+
+class FakeMessage:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def edit(self, content=None, **kwargs):
+        await self._interaction._reply(content, kwargs)
+
+
+class _FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, **kwargs):
+        self._done = True
+        await self._interaction._round_trip()
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        await self._interaction._reply(content, kwargs)
+
+    async def edit_message(self, content=None, **kwargs):
+        self._done = True
+        await self._interaction._reply(content, kwargs)
+
+    async def send_modal(self, modal):
+        self._done = True
+        await self._interaction._round_trip()
+
+
+class _FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, wait=False, **kwargs):
+        await self._interaction._reply(content, kwargs)
+        return FakeMessage(self._interaction) if wait else None
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the slash command callbacks.
+
+    Replies are recorded instead of sent; every call that would reach Discord
+    waits `discord_latency` seconds first.
+    """
+
+    def __init__(self, command, user_id, discord_latency=0.0):
+        self.command = command
+        self.user = SimpleNamespace(id=user_id, name=f"user{user_id % 100000}", display_name=f"User {user_id % 100000}")
+        self.response = _FakeResponse(self)
+        self.followup = _FakeFollowup(self)
+        self.discord_latency = discord_latency
+        self.replies = []  # Text of every message sent or edited, embeds included
+
+    async def _round_trip(self):
+        if self.discord_latency:
+            await asyncio.sleep(self.discord_latency)
+
+    async def _reply(self, content, kwargs):
+        await self._round_trip()
+        parts = [content or ""]
+        for embed in ([kwargs["embed"]] if kwargs.get("embed") else []) + list(kwargs.get("embeds") or []):
+            parts.append(embed.description or "")
+            parts.extend(field.value for field in embed.fields)
+        self.replies.append("\n".join(part for part in parts if part))
+
+    async def edit_original_response(self, content=None, **kwargs):
+        await self._reply(content, kwargs)
+
+    @property
+    def failed(self):
+        return not self.replies or any(marker in reply for reply in self.replies for marker in FAILURE_MARKERS)
+
+
+def _percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+class Benchmark:
+    def __init__(self, bot_module, server, args):
+        self.bot = bot_module
+        self.server = server
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.heroes = []
+        self.user_ids = []
+        self.commands = {command.name: command for command in bot_module.bot.tree.get_commands()}
+
+    async def load(self, roster_rows):
+        # Replaces the spreadsheets and reloads the bot's caches from them; returns the warm-up time
+        await self.bot.storage.flush()
+        spreadsheets, self.heroes, self.user_ids = build_spreadsheets(roster_rows, self.args.heroes, self.args.heroes_per_user, self.args.seed)
+        self.server.load(spreadsheets)
+
+        started = time.perf_counter()
+        await asyncio.gather(self.bot.hero_catalog.load(), self.bot.roster.load())
+        if config.WARM_HERO_INFO_CACHE:
+            self.bot._warm_hero_info_cache()
+        self.bot.readiness.finish()
+        return time.perf_counter() - started
+
+    def _tracked_hero(self, user_id):
+        roster = self.bot.roster.get_roster(str(user_id))
+        return self.rng.choice(roster).hero_name if roster else self.rng.choice(self.heroes)[0]
+
+    def _arguments(self, command_name, user_id):
+        if command_name == "hero_info":
+            if self.rng.random() < 0.5:
+                return {"hero_number_or_name": str(self.rng.randint(1, len(self.heroes)))}
+            return {"hero_number_or_name": self.rng.choice(self.heroes)[0]}
+        if command_name == "add_hero":
+            return {"hero_name": self.rng.choice(self.heroes)[0]}
+        if command_name in ("remove_hero", "calculate_relics_needed", "calculate_xp_and_oaths_needed"):
+            return {"hero_name": self._tracked_hero(user_id)}
+        if command_name == "manage_hero":
+            hero_name = self._tracked_hero(user_id)
+            max_level = self.bot.hero_catalog.find_hero(hero_name).max_level
+            current_level = self.rng.randint(1, max_level)
+            next_goal_level = self.rng.randint(current_level, max_level)
+            return {
+                "hero_name": hero_name,
+                "current_level": current_level,
+                "current_relics": self.rng.randint(0, 50000),
+                "next_goal_level": next_goal_level,
+                "ultimate_goal_level": self.rng.randint(next_goal_level, max_level),
+            }
+        if command_name == "plan_all":
+            return {"goal": self.rng.choice(list(self.bot.PLAN_GOALS))}
+        return {}
+
+    async def _invoke(self, command, latencies, failures):
+        user_id = self.rng.choice(self.user_ids)
+        arguments = self._arguments(command.name, user_id)
+        interaction = FakeInteraction(command, user_id, self.args.discord_latency)
+        started = time.perf_counter()
+        try:
+            await command.callback(interaction, **arguments)
+        except Exception:
+            failures.append(command.name)
+        else:
+            if interaction.failed:
+                failures.append(command.name)
+        latencies.append(time.perf_counter() - started)
+
+    async def run_command(self, command_name):
+        command = self.commands[command_name]
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        latencies = []
+        failures = []
+
+        async def invoke():
+            async with semaphore:
+                await self._invoke(command, latencies, failures)
+
+        invocations = max(1, round(self.args.invocations * INVOCATION_SHARE.get(command_name, 1)))
+        calls_before = Counter(metrics.sheets_calls)
+        started = time.perf_counter()
+        await asyncio.gather(*(invoke() for _ in range(invocations)))
+        elapsed = time.perf_counter() - started
+
+        calls = sum(count for (name, _, _), count in (Counter(metrics.sheets_calls) - calls_before).items() if name == command.qualified_name)
+        latencies.sort()
+        return {
+            "command": command_name,
+            "invocations": len(latencies),
+            "throughput": len(latencies) / elapsed if elapsed else 0.0,
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "sheets_calls_per_invocation": calls / len(latencies) if latencies else 0.0,
+            "failures": len(failures),
+        }
+
+    async def run_scenario(self, roster_rows):
+        warm_up = await self.load(roster_rows)
+        background_before = self._background_calls()
+        results = [await self.run_command(name) for name in self.args.commands]
+        await self.bot.storage.flush()  # Roster writes still held back by the write-behind queue count as background calls
+        return {
+            "roster_rows": roster_rows,
+            "users": len(self.user_ids),
+            "warm_up_seconds": warm_up,
+            "background_sheets_calls": self._background_calls() - background_before,
+            "commands": results,
+        }
+
+    @staticmethod
+    def _background_calls():
+        return sum(count for (name, _, _), count in metrics.sheets_calls.items() if name == "background")
+
+
+def print_scenario(scenario):
+    print(f"\n{scenario['roster_rows']:,} roster rows, {scenario['users']:,} users, warm-up {scenario['warm_up_seconds']:.2f}s, "
+          f"{scenario['background_sheets_calls']} background Sheets calls")
+    print(f"{'command':<34} {'n':>5} {'cmd/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'calls/cmd':>10} {'failed':>7}")
+    for result in scenario["commands"]:
+        print(f"{result['command']:<34} {result['invocations']:>5} {result['throughput']:>8.1f} {result['p50'] * 1000:>8.1f} "
+              f"{result['p95'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} {result['sheets_calls_per_invocation']:>10.2f} {result['failures']:>7}")
+
+
+def load_bot(server, args):
+    sheets = FakeSheetsGateway(
+        server,
+        max_workers=config.SHEETS_MAX_WORKERS,
+        timeout=config.SHEETS_TIMEOUT,
+        reads_per_minute=args.reads_per_minute,
+        writes_per_minute=args.writes_per_minute,
+        max_retries=config.SHEETS_MAX_RETRIES,
+    )
+    backend = SheetsBackend(sheets, config.SPREADSHEET_ID, config.SPREADSHEET_ID_HERO_DATA, flush_interval=config.ROSTER_WRITE_FLUSH_INTERVAL)
+
+    import helaheroplannerbot
+    helaheroplannerbot.create_app(storage_backend=backend)
+    return helaheroplannerbot
+
+
+async def run(args):
+    server = FakeSheetsServer(
+        {},
+        latency=args.latency,
+        bytes_per_second=args.bytes_per_second,
+        error_rate=args.error_rate,
+        quota_per_minute=args.quota_per_minute,
+        seed=args.seed,
+    )
+    bot_module = load_bot(server, args)
+    benchmark = Benchmark(bot_module, server, args)
+    unknown = [name for name in args.commands if name not in benchmark.commands]
+    if unknown:
+        raise SystemExit(f"Unknown commands: {', '.join(unknown)}")
+
+    scenarios = []
+    try:
+        for roster_rows in args.rows:
+            scenario = await benchmark.run_scenario(roster_rows)
+            print_scenario(scenario)
+            scenarios.append(scenario)
+    finally:
+        bot_module.storage.close()
+
+    print(f"\nSheets requests received: {dict(sorted(server.requests.items()))}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "scenarios": scenarios}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the slash commands offline against a fake Google Sheets API")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS), help="roster sizes to benchmark, one scenario each")
+    parser.add_argument("--heroes", type=int, default=120, help="heroes in the catalog")
+    parser.add_argument("--heroes-per-user", type=int, default=40)
+    parser.add_argument("--commands", nargs="+", default=list(COMMAND_ORDER), help="commands to run, in order")
+    parser.add_argument("--invocations", type=int, default=200, help="invocations of each command per scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="invocations running at the same time")
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds per Sheets call, with ±50%% jitter")
+    parser.add_argument("--bytes-per-second", type=float, default=5_000_000, help="Sheets response transfer rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of Sheets calls failing with HTTP 429")
+    parser.add_argument("--quota-per-minute", type=int, default=None, help="Sheets reads and writes accepted per minute before HTTP 429")
+    parser.add_argument("--reads-per-minute", type=int, default=config.SHEETS_READS_PER_MINUTE, help="the gateway's read pacing")
+    parser.add_argument("--writes-per-minute", type=int, default=config.SHEETS_WRITES_PER_MINUTE, help="the gateway's write pacing")
+    parser.add_argument("--discord-latency", type=float, default=0.0, help="seconds per Discord API call")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import json
+import os
+
+# Every setting below can be overridden by a HELA_<NAME> environment variable or by an entry in the JSON config file,
+# e.g. {"DISCORD_TOKEN": "...", "METRICS_PORT": 9100}. The environment wins over the file, the file over the default
+CONFIG_FILE = os.environ.get("HELA_CONFIG_FILE", "hela_config.json")
+
+try:
+    with open(CONFIG_FILE) as f:
+        _file_settings = json.load(f)
+except FileNotFoundError:
+    _file_settings = {}
+
+
+def _setting(name, default, cast=None):
+    value = os.environ.get("HELA_" + name)
+    if value is None:
+        return _file_settings.get(name, default)
+    cast = cast or type(default)
+    if cast is bool:
+        return value == "1"
+    return cast(value)
+
+
+# Bot token from the Discord developer portal; required to start the bot
+DISCORD_TOKEN = _setting("DISCORD_TOKEN", None, str)
+
+SERVICE_ACCOUNT_FILE = _setting("SERVICE_ACCOUNT_FILE", "hela-hero-planner-256ecb561827.json")
+SPREADSHEET_ID = _setting("SPREADSHEET_ID", '15ewV9pkz0TyzLxQQSb8KnYYeAskxDODqQA8mxwgWAwk') #contains Master Tab tab as well as User Hero Data tab
+SPREADSHEET_ID_HERO_DATA = _setting("SPREADSHEET_ID_HERO_DATA", '1IEL1FVbCFNXqCUMfQQX8kQOIek-_J-Q9Z9EpGz-2lyA')  #contains Hero Data General tab
+USER_HERO_DATA_SHEET_ID = _setting("USER_HERO_DATA_SHEET_ID", None, int)  # sheetId of the 'User Hero Data' tab, looked up by tab name at startup when None
+
+# Where the hero catalog and user rosters live: "sheets" (Google Sheets) or "sqlite" (local database file)
+STORAGE_BACKEND = _setting("STORAGE_BACKEND", "sheets")
+SQLITE_DATABASE_FILE = _setting("SQLITE_DATABASE_FILE", "hela_hero_planner.db")
+
+# All Sheets calls go through the gateway so they run off the event loop with a working timeout
+SHEETS_MAX_WORKERS = _setting("SHEETS_MAX_WORKERS", 8)
+SHEETS_TIMEOUT = _setting("SHEETS_TIMEOUT", 30)
+
+# Sheets calls are paced to the project's per-minute quota (Google's default is 60 reads and 60 writes per minute per
+# user, and the service account counts as one user); 429 and 5xx responses are retried up to SHEETS_MAX_RETRIES times
+SHEETS_READS_PER_MINUTE = _setting("SHEETS_READS_PER_MINUTE", 60)
+SHEETS_WRITES_PER_MINUTE = _setting("SHEETS_WRITES_PER_MINUTE", 60)
+SHEETS_MAX_RETRIES = _setting("SHEETS_MAX_RETRIES", 5)
+
+# Roster writes are collected for this many seconds and sent to Sheets as a single batch write
+ROSTER_WRITE_FLUSH_INTERVAL = _setting("ROSTER_WRITE_FLUSH_INTERVAL", 2.0)
+
+# Removed heroes leave a blank row behind in Sheets; blank rows are deleted in one batch every this many seconds (0 disables it)
+ROSTER_COMPACTION_INTERVAL = _setting("ROSTER_COMPACTION_INTERVAL", 6 * 60 * 60)
+
+# Edits made directly in the 'User Hero Data' tab are picked up every this many seconds (0 disables it). Only the changed
+# rows are read, and nothing at all while the spreadsheet's Drive version is unchanged
+ROSTER_SYNC_INTERVAL = _setting("ROSTER_SYNC_INTERVAL", 300)
+
+# By default every command stores the derived columns G-P next to the user's inputs. In lazy mode only the inputs
+# (C-F) are stored, derived values are computed when read, and a background job refreshes G-P in bulk every
+# DERIVED_COLUMNS_REFRESH_INTERVAL seconds (0 disables it) for people who browse the spreadsheet directly
+LAZY_DERIVED_COLUMNS = _setting("LAZY_DERIVED_COLUMNS", False)
+DERIVED_COLUMNS_REFRESH_INTERVAL = _setting("DERIVED_COLUMNS_REFRESH_INTERVAL", 3600)
+
+# Master Tab and Hero Data General are shared by every command and only reloaded after the TTL or via /reload_heroes
+HERO_CATALOG_TTL = _setting("HERO_CATALOG_TTL", 6 * 60 * 60)
+
+# Rendered /hero_info embeds kept in memory, optionally rendered for every hero at startup
+HERO_INFO_CACHE_SIZE = _setting("HERO_INFO_CACHE_SIZE", 512)
+WARM_HERO_INFO_CACHE = _setting("WARM_HERO_INFO_CACHE", True)
+
+# Logging level for the bot's own messages (DEBUG shows each command step)
+LOG_LEVEL = _setting("LOG_LEVEL", "INFO")
+
+# Command latency, Sheets call and cache metrics: served as Prometheus text on http://METRICS_HOST:METRICS_PORT/metrics
+# when METRICS_PORT is set, and summarised in the log every METRICS_LOG_INTERVAL seconds (0 disables the summary)
+METRICS_HOST = _setting("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = _setting("METRICS_PORT", 0)
+METRICS_LOG_INTERVAL = _setting("METRICS_LOG_INTERVAL", 900)
+
+# Application commands are only synced with Discord when their definitions change; the hash of the last synced
+# command set is kept in this file. Set HELA_FORCE_COMMAND_SYNC=1 to sync regardless
+COMMAND_TREE_HASH_FILE = _setting("COMMAND_TREE_HASH_FILE", ".command_tree.sha256")
+FORCE_COMMAND_SYNC = _setting("FORCE_COMMAND_SYNC", False)
+
+# Commands that arrive while the startup warm-up is still loading data wait up to this many seconds for it
+STARTUP_QUEUE_TIMEOUT = _setting("STARTUP_QUEUE_TIMEOUT", 60)
+
+# Sharded mode: with SHARD_COUNT set, the bot runs as an AutoShardedBot and several processes on one host can split the
+# shards between them, each started with its own SHARD_IDS (e.g. "0,1") and METRICS_PORT. The processes share the roster
+# and hero catalog through the SQLite file SHARED_STORE_FILE, which must be on a local disk. Only the process holding
+# the Sheets writer lease (renewed every ROSTER_WRITE_FLUSH_INTERVAL, taken over by another process SHEETS_WRITER_LEASE
+# seconds after its holder stops) talks to Google Sheets. Every SHARED_STORE_SYNC_INTERVAL seconds each process picks
+# up the roster rows the others changed
+SHARD_COUNT = _setting("SHARD_COUNT", 0)
+SHARD_IDS = _setting("SHARD_IDS", None, str)  # Shards run by this process; all of them when None
+if isinstance(SHARD_IDS, str):
+    SHARD_IDS = [int(shard_id) for shard_id in SHARD_IDS.split(",") if shard_id.strip()]
+SHARED_STORE_FILE = _setting("SHARED_STORE_FILE", "hela_shared_store.db")
+SHEETS_WRITER_LEASE = _setting("SHEETS_WRITER_LEASE", 30)
+SHARED_STORE_SYNC_INTERVAL = _setting("SHARED_STORE_SYNC_INTERVAL", 3.0)
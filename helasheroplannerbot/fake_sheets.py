@@ -0,0 +1,272 @@
+import collections
+import json
+import random
+import re
+import threading
+import time
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from sheets_gateway import READ_METHODS, SheetsGateway, _MeteredHttp
+from storage import column_index, column_letter
+
+_CELL = re.compile(r"^([A-Z]*)(\d*)$")
+
+# API method id -> FakeSheetsServer method answering it
+_HANDLERS = {
+    "sheets.spreadsheets.get": "_spreadsheets_get",
+    "sheets.spreadsheets.batchUpdate": "_spreadsheets_batchUpdate",
+    "sheets.spreadsheets.values.get": "_values_get",
+    "sheets.spreadsheets.values.batchGet": "_values_batchGet",
+    "sheets.spreadsheets.values.update": "_values_update",
+    "sheets.spreadsheets.values.batchUpdate": "_values_batchUpdate",
+    "sheets.spreadsheets.values.append": "_values_append",
+    "sheets.spreadsheets.values.clear": "_values_clear",
+    "drive.files.get": "_files_get",
+}
+
+
+def _parse_range(range_name):
+    # "'User Hero Data'!C2:F" -> (title, first row, last row, first column, last column); rows are 1-based, None is unbounded
+    title, _, cells = range_name.rpartition("!") if "!" in range_name else (range_name, "", "")
+    start, _, end = cells.partition(":")
+    start_column, start_row = _CELL.match(start).groups()
+    end_column, end_row = _CELL.match(end).groups() if end else (start_column, start_row)
+    return (
+        title.strip("'"),
+        int(start_row) if start_row else 1,
+        int(end_row) if end_row else None,
+        column_index(start_column) if start_column else 0,
+        column_index(end_column) if end_column else None,
+    )
+
+
+class FakeSheetsServer:
+    """In-process stand-in for the Google Sheets API, for offline benchmarks.
+
+    Holds spreadsheets as {spreadsheet_id: {tab title: rows}} and answers the
+    requests the bot sends with the same JSON shapes Google returns: values
+    come back as strings, trailing empty cells and rows are left out, and
+    appends land below the first table in their range, which can be a gap
+    between rows. It behaves like the httplib2
+    object a request is executed with, so everything above the HTTP layer
+    (gateway threads, retries, rate limiting, metrics) runs unchanged.
+
+    Every call sleeps for `latency` seconds (±50% jitter) plus its response
+    size over `bytes_per_second`. A share `error_rate` of calls fails with
+    HTTP 429, and with `quota_per_minute` set, reads or writes beyond that
+    many within a minute do as well, like Google's per-user quota.
+
+    Each spreadsheet also has a Drive version number, which every write
+    raises, like the real one.
+    """
+
+    def __init__(self, spreadsheets, latency=0.0, bytes_per_second=None, error_rate=0.0, quota_per_minute=None, seed=None):
+        self.latency = latency
+        self.bytes_per_second = bytes_per_second
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self.requests = collections.Counter()  # API method -> requests received, including rejected ones
+
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._recent = {"read": collections.deque(), "write": collections.deque()}  # Request times inside the quota window
+        self.load(spreadsheets)
+
+    def load(self, spreadsheets):
+        with self._lock:
+            self._spreadsheets = {spreadsheet_id: {title: [list(row) for row in rows] for title, rows in tabs.items()} for spreadsheet_id, tabs in spreadsheets.items()}
+            self._versions = dict.fromkeys(self._spreadsheets, 1)
+
+    def tab(self, spreadsheet_id, title):
+        return self._spreadsheets[spreadsheet_id][title]
+
+    def edit(self, spreadsheet_id, title, row_number, first_column, values):
+        # Changes cells the way someone typing into the spreadsheet would, bypassing the API
+        with self._lock:
+            self._write(spreadsheet_id, f"'{title}'!{first_column}{row_number}", [values])
+
+    def request(self, uri, method="POST", body=None, headers=None, **kwargs):
+        # The URI of a fake request is its API method id and the body its parameters, see FakeRequest
+        params = json.loads(body)
+        with self._lock:
+            self.requests[uri] += 1
+            error = self._reject(uri)
+            delay = self.latency * self._random.uniform(0.5, 1.5)
+            if error is None:
+                status, result = self._handle(uri, params)
+            else:
+                status, result = error
+        content = json.dumps(result).encode()
+        if self.bytes_per_second:
+            delay += len(content) / self.bytes_per_second
+        time.sleep(delay)
+        return httplib2.Response({"status": str(status)}), content
+
+    def _handle(self, uri, params):
+        handler = getattr(self, _HANDLERS.get(uri, ""), None)
+        if handler is None:
+            return 400, {"error": {"code": 400, "message": f"The fake Sheets API does not implement {uri}", "status": "INVALID_ARGUMENT"}}
+        try:
+            return 200, handler(**params)
+        except (KeyError, ValueError, AttributeError) as e:
+            return 400, {"error": {"code": 400, "message": f"Unable to parse range or request: {e}", "status": "INVALID_ARGUMENT"}}
+
+    def _reject(self, uri):
+        if self._random.random() < self.error_rate:
+            return 429, {"error": {"code": 429, "message": "Injected quota error", "status": "RESOURCE_EXHAUSTED"}}
+        if self.quota_per_minute and not uri.startswith("drive."):  # Drive has a quota of its own
+            now = time.monotonic()
+            recent = self._recent["read" if uri in READ_METHODS else "write"]
+            while recent and recent[0] <= now - 60:
+                recent.popleft()
+            if len(recent) >= self.quota_per_minute:
+                return 429, {"error": {"code": 429, "message": "Quota exceeded for quota metric 'Requests per minute per user'", "status": "RESOURCE_EXHAUSTED"}}
+            recent.append(now)
+        return None
+
+    def _cells(self, spreadsheet_id, range_name):
+        title, first_row, last_row, first_column, last_column = _parse_range(range_name)
+        return self.tab(spreadsheet_id, title), first_row, last_row, first_column, last_column
+
+    def _read(self, spreadsheet_id, range_name):
+        rows, first_row, last_row, first_column, last_column = self._cells(spreadsheet_id, range_name)
+        values = []
+        for row in rows[first_row - 1:last_row]:
+            cells = row[first_column:None if last_column is None else last_column + 1]
+            while cells and cells[-1] == "":
+                cells = cells[:-1]
+            values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        value_range = {"range": range_name, "majorDimension": "ROWS"}
+        if values:
+            value_range["values"] = values
+        return value_range
+
+    def _write(self, spreadsheet_id, range_name, values):
+        rows, first_row, _, first_column, _ = self._cells(spreadsheet_id, range_name)
+        self._versions[spreadsheet_id] += 1
+        for offset, values_row in enumerate(values):
+            row_index = first_row - 1 + offset
+            while len(rows) <= row_index:
+                rows.append([])
+            row = rows[row_index]
+            end = first_column + len(values_row)
+            if len(row) < end:
+                row.extend([""] * (end - len(row)))
+            for i, value in enumerate(values_row):
+                if value is not None:  # null leaves the cell as it is
+                    row[first_column + i] = str(value)
+        last_column = first_column + max((len(values_row) for values_row in values), default=1) - 1
+        return f"{range_name.rpartition('!')[0] or range_name}!{column_letter(first_column)}{first_row}:{column_letter(last_column)}{first_row + len(values) - 1}"
+
+    def _values_get(self, spreadsheetId, range, **_):
+        return self._read(spreadsheetId, range)
+
+    def _values_batchGet(self, spreadsheetId, ranges, **_):
+        return {"spreadsheetId": spreadsheetId, "valueRanges": [self._read(spreadsheetId, range_name) for range_name in ranges]}
+
+    def _values_update(self, spreadsheetId, range, body, **_):
+        return {"spreadsheetId": spreadsheetId, "updatedRange": self._write(spreadsheetId, range, body["values"])}
+
+    def _values_batchUpdate(self, spreadsheetId, body, **_):
+        responses = [{"updatedRange": self._write(spreadsheetId, data["range"], data["values"])} for data in body["data"]]
+        return {"spreadsheetId": spreadsheetId, "totalUpdatedRows": len(responses), "responses": responses}
+
+    def _values_append(self, spreadsheetId, range, body, insertDataOption="OVERWRITE", **_):
+        # Like Sheets, finds the first table (block of non-empty rows) in the range and writes right below it
+        rows, first_row, last_row, first_column, last_column = self._cells(spreadsheetId, range)
+        title = _parse_range(range)[0]
+        last_row = len(rows) if last_row is None else last_row
+
+        def empty(row_number):
+            row = rows[row_number - 1] if row_number <= len(rows) else []
+            return not any(row[first_column:None if last_column is None else last_column + 1])
+
+        row_number = first_row
+        while row_number <= last_row and empty(row_number):
+            row_number += 1
+        if row_number > last_row:
+            row_number = first_row  # No table yet, it starts at the top of the range
+        while row_number <= last_row and not empty(row_number):
+            row_number += 1
+        if insertDataOption == "INSERT_ROWS":
+            rows[row_number - 1:row_number - 1] = [[] for _ in body["values"]]
+        cell = f"{column_letter(first_column)}{row_number}"
+        return {"spreadsheetId": spreadsheetId, "updates": {"updatedRange": self._write(spreadsheetId, f"'{title}'!{cell}", body["values"])}}
+
+    def _values_clear(self, spreadsheetId, range, **_):
+        rows, first_row, last_row, first_column, last_column = self._cells(spreadsheetId, range)
+        self._versions[spreadsheetId] += 1
+        for row in rows[first_row - 1:last_row]:
+            # `range` is the request parameter here, not the builtin
+            end = len(row) if last_column is None else min(len(row), last_column + 1)
+            row[first_column:end] = [""] * max(0, end - first_column)
+        return {"spreadsheetId": spreadsheetId, "clearedRange": range}
+
+    def _spreadsheets_get(self, spreadsheetId, fields=None, **_):
+        # Tabs get their position as sheetId; `fields` is accepted but the response is always the trimmed one
+        return {"sheets": [{"properties": {"sheetId": i, "title": title}} for i, title in enumerate(self._spreadsheets[spreadsheetId])]}
+
+    def _spreadsheets_batchUpdate(self, spreadsheetId, body, **_):
+        titles = list(self._spreadsheets[spreadsheetId])
+        self._versions[spreadsheetId] += 1
+        for request in body["requests"]:
+            deletion = request["deleteDimension"]["range"]
+            if deletion["dimension"] != "ROWS":
+                raise ValueError("The fake Sheets API only deletes rows")
+            del self.tab(spreadsheetId, titles[deletion["sheetId"]])[deletion["startIndex"]:deletion["endIndex"]]
+        return {"spreadsheetId": spreadsheetId, "replies": [{} for _ in body["requests"]]}
+
+    def _files_get(self, fileId, fields=None, **_):
+        # Drive reports the version as a string, like every other int64 field
+        return {"version": str(self._versions[fileId])}
+
+
+class FakeRequest:
+    # Mirrors googleapiclient's HttpRequest: a method id plus parameters, sent when executed
+    def __init__(self, method_id, params):
+        self.methodId = method_id
+        self.params = params
+
+    def execute(self, http=None, num_retries=0):
+        response, content = http.request(self.methodId, method="POST", body=json.dumps(self.params))
+        if response.status >= 300:
+            raise HttpError(response, content, uri=self.methodId)
+        return json.loads(content)
+
+
+class _FakeResource:
+    def __init__(self, path):
+        self._path = path
+
+    def values(self):
+        return _FakeResource(self._path + ".values")
+
+    def __getattr__(self, name):
+        return lambda **params: FakeRequest(f"{self._path}.{name}", params)
+
+
+class FakeSheetsService:
+    # Stands in for build('sheets', 'v4') and build('drive', 'v3'); requests are executed against a FakeSheetsServer by FakeSheetsGateway
+    def spreadsheets(self):
+        return _FakeResource("sheets.spreadsheets")
+
+    def files(self):
+        return _FakeResource("drive.files")
+
+
+class FakeSheetsGateway(SheetsGateway):
+    """SheetsGateway that sends every request to a FakeSheetsServer instead of Google."""
+
+    def __init__(self, server, **kwargs):
+        super().__init__(lambda api: (FakeSheetsService(), None), **kwargs)
+        self.server = server
+
+    def _http(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = _MeteredHttp(self.server)
+        return http
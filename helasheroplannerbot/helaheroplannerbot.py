@@ -1,94 +1,249 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import asyncio
+import logging
+import os
+import socket
+import time
+
+import config
+from hero_catalog import HERO_LIST_PAGE_SIZE, RARITY_ORDER, HeroCatalog, hero_list_text
+from lru_cache import LRUCache
+from metrics import metrics
+from paginator import PaginatedView
+from progression_costs import HERO_MAXED, next_unlock_level, relic_requirements, requirements, roster_requirements, xp_and_oath_requirements
+from roster_store import RosterStore
+from sheets_writer import SheetsWriter
+from shared_store import SharedStoreBackend
+from startup import DEGRADED, READY, Readiness, defer, sync_command_tree
+from storage import ROSTER_INPUT_FIELDS, DuplicateRosterRowError, create_storage_backend
+
+log = logging.getLogger("helaheroplannerbot")
+
+# Shared components, built by create_app(). Importing this module connects to nothing; the command callbacks
+# below use these names once the app has been created.
+storage = None
+hero_catalog = None
+roster = None
+sheets_writer = None  # Only in sharded mode
+bot = None
+
+# Slash commands defined in this module, added to the bot's command tree by create_app()
+COMMANDS = []
+
+def slash_command(**kwargs):
+    def decorator(func):
+        command = discord.app_commands.command(**kwargs)(func)
+        COMMANDS.append(command)
+        return command
+    return decorator
+
+class HelaBot(commands.Bot):
+    async def setup_hook(self):
+        # Runs once per process before the gateway connects. Warm-up runs in the background and commands
+        # arriving in the meantime are queued by readiness.gate
+        self.warm_up_task = asyncio.create_task(_warm_up())
+        _start_background_jobs()
+
+        if config.METRICS_PORT:
+            try:
+                await metrics.start_server(config.METRICS_HOST, config.METRICS_PORT, readiness=readiness)
+            except OSError:
+                log.exception("Could not start the metrics endpoint")
 
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-
-SERVICE_ACCOUNT_FILE = "hela-hero-planner-256ecb561827.json"
-SPREADSHEET_ID = '15ewV9pkz0TyzLxQQSb8KnYYeAskxDODqQA8mxwgWAwk' #contains Master Tab tab as well as User Hero Data tab
-SPREADSHEET_ID_HERO_DATA = '1IEL1FVbCFNXqCUMfQQX8kQOIek-_J-Q9Z9EpGz-2lyA'  #contains Hero Data General tab
-
-# Enable necessary intents 
-intents = discord.Intents.default()
-intents.members = True 
-intents.message_content = True
-
-bot = commands.Bot(command_prefix='!', intents=intents)
-
-creds = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=['https://www.googleapis.com/auth/spreadsheets'])
-service = build('sheets', 'v4', credentials=creds)
-
-@bot.event
-async def on_ready():
-    print(f'Logged in as {bot.user.name} (ID: {bot.user.id})')
-    print('------')
+        # The command tree is global, so of several shard processes only the one running shard 0 syncs it
+        if config.SHARD_IDS is not None and 0 not in config.SHARD_IDS:
+            return
+        try:
+            await sync_command_tree(self.tree, config.COMMAND_TREE_HASH_FILE, force=config.FORCE_COMMAND_SYNC)
+        except Exception:
+            log.exception("An error occurred while syncing the command tree")
+
+    async def on_ready(self):
+        # Fires again after every reconnect; the one-time startup work lives in setup_hook
+        log.info('Logged in as %s (ID: %s)', self.user.name, self.user.id)
+
+    async def close(self):
+        # Write out any roster changes still waiting in the write-behind queue before shutting down
+        try:
+            await storage.flush()
+        except Exception:
+            log.exception("An error occurred while flushing pending roster writes on shutdown")
+        storage.close()
+        if sheets_writer is not None:
+            try:
+                await sheets_writer.close()
+            except Exception:
+                log.exception("An error occurred while handing over the Sheets writer on shutdown")
+        await metrics.stop_server()
+        await super().close()
+
+class ShardedHelaBot(HelaBot, commands.AutoShardedBot):
+    async def on_shard_ready(self, shard_id):
+        log.info("Shard %s ready", shard_id)
+
+def create_app(storage_backend=None):
+    """Builds the bot and the components its commands share, from the settings in config.
+
+    Nothing connects until the bot is started: the Sheets client is built on
+    the first Sheets request. Pass `storage_backend` to use a backend other
+    than the one config selects.
+
+    With config.SHARD_COUNT set, the commands read and write the shared
+    store instead, and a SheetsWriter keeps it in step with `storage_backend`
+    (or the configured backend) whenever this process holds the writer lease.
+    """
+    global storage, hero_catalog, roster, sheets_writer, bot
+
+    if config.SHARD_COUNT:
+        origin = f"{socket.gethostname()}:{os.getpid()}"
+        storage = SharedStoreBackend(config.SHARED_STORE_FILE, origin)
+        sheets_writer = SheetsWriter(
+            SharedStoreBackend(config.SHARED_STORE_FILE, origin),
+            storage_backend or create_storage_backend(config),
+            holder=origin,
+            lease_ttl=config.SHEETS_WRITER_LEASE,
+            catalog_ttl=config.HERO_CATALOG_TTL,
+            sync_interval=config.ROSTER_SYNC_INTERVAL,
+            compaction_interval=config.ROSTER_COMPACTION_INTERVAL,
+        )
+    else:
+        storage = storage_backend or create_storage_backend(config)
+        sheets_writer = None
+    hero_catalog = HeroCatalog(storage, ttl=config.HERO_CATALOG_TTL)
+
+    # 'User Hero Data' is indexed per user in memory; storage is only touched for writes.
+    # Only the columns the commands read are loaded: the inputs, plus the stored next unlock level when
+    # derived columns are written eagerly, or every column when the refresh job has to diff them.
+    if not config.LAZY_DERIVED_COLUMNS:
+        roster_fields = ROSTER_INPUT_FIELDS + ("next_unlock",)
+    elif config.DERIVED_COLUMNS_REFRESH_INTERVAL > 0:
+        roster_fields = None
+    else:
+        roster_fields = ROSTER_INPUT_FIELDS
+    roster = RosterStore(storage, fields=roster_fields)
+
+    # Enable necessary intents
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+
+    if config.SHARD_COUNT:
+        bot = ShardedHelaBot(command_prefix='!', intents=intents, shard_count=config.SHARD_COUNT, shard_ids=config.SHARD_IDS)
+    else:
+        bot = HelaBot(command_prefix='!', intents=intents)
+    for command in COMMANDS:
+        bot.tree.add_command(command)
+    return bot
+
+# Startup state; commands that need the hero catalog or the roster wait for warm-up through readiness.gate
+readiness = Readiness(queue_timeout=config.STARTUP_QUEUE_TIMEOUT)
+metrics.register_gauge("hela_ready", "1 once startup warm-up has finished successfully.", lambda: int(readiness.ready))
+metrics.register_gauge("hela_startup_queued_commands", "Commands waiting for startup warm-up to finish.", lambda: readiness.queued)
+
+# Loads the hero catalog and the roster index side by side, then lets the queued commands run
+async def _warm_up():
+    readiness.start()
+    started = time.perf_counter()
+    catalog_result, roster_result = await asyncio.gather(hero_catalog.ensure_fresh(), roster.ensure_loaded(), return_exceptions=True)
+
+    failed = False
+    if isinstance(catalog_result, Exception):
+        log.error("An error occurred while loading the hero catalog", exc_info=catalog_result)
+        failed = True
+    elif config.WARM_HERO_INFO_CACHE:
+        _warm_hero_info_cache()
+    if isinstance(roster_result, Exception):
+        log.error("An error occurred while loading the user hero data", exc_info=roster_result)
+        failed = True
+
+    readiness.finish(DEGRADED if failed else READY)
+    log.info("Warm-up finished in %.1fs, bot is %s", time.perf_counter() - started, readiness.state)
+
+def _start_background_jobs():
+    if config.LAZY_DERIVED_COLUMNS and config.DERIVED_COLUMNS_REFRESH_INTERVAL > 0 and not refresh_derived_columns.is_running():
+        refresh_derived_columns.change_interval(seconds=config.DERIVED_COLUMNS_REFRESH_INTERVAL)
+        refresh_derived_columns.start()
+
+    # Sharded, the Sheets writer compacts the spreadsheet; the shared store deletes rows outright
+    if config.ROSTER_COMPACTION_INTERVAL > 0 and sheets_writer is None and not compact_roster.is_running():
+        compact_roster.change_interval(seconds=config.ROSTER_COMPACTION_INTERVAL)
+        compact_roster.start()
+
+    # Sharded, the spreadsheet sync is the Sheets writer's job and every process follows the shared store instead
+    sync_interval = config.SHARED_STORE_SYNC_INTERVAL if sheets_writer is not None else config.ROSTER_SYNC_INTERVAL
+    if sync_interval > 0 and not sync_roster.is_running():
+        sync_roster.change_interval(seconds=sync_interval)
+        sync_roster.start()
+
+    if sheets_writer is not None and not run_sheets_writer.is_running():
+        run_sheets_writer.change_interval(seconds=config.ROSTER_WRITE_FLUSH_INTERVAL)
+        run_sheets_writer.start()
+
+    if config.METRICS_LOG_INTERVAL > 0 and not log_metrics_summary.is_running():
+        log_metrics_summary.change_interval(seconds=config.METRICS_LOG_INTERVAL)
+        log_metrics_summary.start()
 
-    await bot.tree.sync() # Sync globally 
 
 # hero_list command as a slash command
-@bot.tree.command(name="hero_list", description="Display the list of heroes")
+@slash_command(name="hero_list", description="Display the list of heroes")
+@metrics.instrument
+@readiness.gate
 async def hero_list(interaction: discord.Interaction): 
-    await interaction.response.defer() 
+    await defer(interaction) 
 
     # Wrap the entire command logic in an asyncio.wait_for block
     try:
         await asyncio.wait_for(asyncio.create_task(_hero_list_logic(interaction)), timeout=60) 
     except asyncio.TimeoutError:
+        metrics.record_timeout()
         await interaction.followup.send("Request timed out. The command is taking too long to complete.")
 
+# Rendered /hero_list pages are the same for everyone, so every view shares them until the hero catalog changes
+_hero_list_cache = {"version": None, "pages": {}}
+
+def _hero_list_page_cache():
+    if _hero_list_cache["version"] != hero_catalog.version:
+        _hero_list_cache["pages"] = {}
+        _hero_list_cache["version"] = hero_catalog.version
+    return _hero_list_cache["pages"]
+
+def _render_hero_list_page(entries, page_index, page_count):
+    title = "Hero List" if page_count == 1 else f"Hero List ({page_index + 1}/{page_count})"
+    return discord.Embed(title=title, description=hero_list_text(entries))
+
 # Helper function to encapsulate the hero_list logic
 async def _hero_list_logic(interaction):
-    range_name = 'Master Tab!A2:E' # Fetch both hero names (column A) and rarities (column E) 
-
     try:
-        print("Fetching data from Google Sheets...")
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=range_name).execute()
-        values = result.get('values', [])
-        print("Data fetched successfully!")
-
-         # Organize heroes by rarity
-        heroes_by_rarity = {}
-        for row in values:
-            if not row:
-                break
-            name, rarity = row[0], row[4]
-            heroes_by_rarity.setdefault(rarity, []).append(name)
-
-        rarity_order = ["Common", "Fine", "Exquisite", "Epic"]
-
-        if not any(heroes_by_rarity.values()):
-            print("No heroes found")
+        await hero_catalog.ensure_fresh()
+
+        if not hero_catalog.numbered_heroes:
+            log.debug("No heroes found")
             await interaction.followup.send('No heroes found in the sheet.') # ... (Handle no heroes found)
         else:
-            output = ""
-            index = 1 # Initialize the index counter
-
-            for rarity in rarity_order:
-                if rarity in heroes_by_rarity:
-                    emoji = {'Epic': '🟠', 'Exquisite': '🟣', 'Fine': '🔵', 'Common': '🟢'}.get(rarity)
-                    hero_list_with_emoji = [f"{emoji} {index + i}. {name}" for i, name in enumerate(heroes_by_rarity[rarity])]
-                    output += f"**{rarity} Heroes**\n" 
-                    output += "\n".join(hero_list_with_emoji) + "\n\n"
-                    index += len(heroes_by_rarity[rarity]) # Increment the index based on the number of heroes in this rarity
-
-            print("Sending hero list...")
-
-             # Create an embed with all heroes in a single field
-            embed = discord.Embed(title="Hero List", description=output)
+            log.debug("Sending hero list...")
 
             try:
-                await interaction.followup.send(embed=embed) 
-                print("Hero list sent!")
+                rarity_filters = {rarity: (lambda entry, rarity=rarity: entry[2] == rarity) for rarity in RARITY_ORDER}
+                view = PaginatedView(
+                    hero_catalog.hero_list_entries,
+                    _render_hero_list_page,
+                    per_page=HERO_LIST_PAGE_SIZE,
+                    filters={"Rarity": rarity_filters},
+                    page_cache=_hero_list_page_cache(),
+                )
+                await view.send(interaction)
+                log.debug("Hero list sent!")
             except discord.errors.Forbidden:
                 await interaction.followup.send("I don't have permission to send embeds here. Please enable the 'Embed Links' permission or try this command in a different channel.")
 
     except Exception as e:
-        print(f"An error occurred: {e}")
+        log.exception("An error occurred")
         await interaction.followup.send(f'An error occurred: {e}') 
 
 # New command: all_hero_statistics with a 60-second timeout
-@bot.tree.command(name="all_hero_statistics", description="Provides a link to the hero statistics sheet")
+@slash_command(name="all_hero_statistics", description="Provides a link to the hero statistics sheet")
+@metrics.instrument
 async def all_hero_statistics(interaction: discord.Interaction):
     await interaction.response.defer() # Acknowledge the command immediately
 
@@ -96,12 +251,13 @@ async def all_hero_statistics(interaction: discord.Interaction):
     try:
         await asyncio.wait_for(asyncio.create_task(_all_hero_statistics_logic(interaction)), timeout=60)
     except asyncio.TimeoutError:
+        metrics.record_timeout()
         await interaction.followup.send("Request timed out. The command is taking too long to complete.")
 
 # Helper function to encapsulate the all_hero_statistics logic
 async def _all_hero_statistics_logic(interaction):
     try:
-        print("Preparing to send hero statistics link...")
+        log.debug("Preparing to send hero statistics link...")
         spreadsheet_url = "https://docs.google.com/spreadsheets/d/1IEL1FVbCFNXqCUMfQQX8kQOIek-_J-Q9Z9EpGz-2lyA/edit?usp=sharing" # Replace with your actual spreadsheet URL
         filter_view_guide_url = "https://support.google.com/docs/answer/3540681?hl=en" # Link to Google's filter view guide
 
@@ -117,162 +273,122 @@ async def _all_hero_statistics_logic(interaction):
              f"Access the sheet: [Hela's Hero Planner Information Sheet]({spreadsheet_url})"
          )
 
-        print("Sending hero statistics link...")
+        log.debug("Sending hero statistics link...")
         await interaction.followup.send(message)
-        print("Hero statistics link sent successfully!")
+        log.debug("Hero statistics link sent successfully!")
 
-    except Exception as e:
-        print(f"An error occurred while sending the hero statistics link: {e}")
+    except Exception:
+        log.exception("An error occurred while sending the hero statistics link")
         await interaction.followup.send("An error occurred while processing your request. Please try again later.")
 
-# Autocomplete function for hero_number_or_name
+# Autocomplete function for hero names (shared by hero_info, add_hero and the roster commands)
 async def autocomplete_hero_info(interaction: discord.Interaction, current: str) -> list[discord.app_commands.Choice[str]]:
-    if len(current) < 3:
+    # Suggestions come from the in-memory name index, so no keystroke ever waits on Google Sheets
+    if not hero_catalog.loaded:
         return []
 
     try:
-        # Fetch all hero names from the spreadsheet 
-        hero_names_range = 'Hero Data General!A2:A' 
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID_HERO_DATA, range=hero_names_range).execute()
-        all_hero_names = [row[0] for row in result.get('values', []) if row]
-
-    except Exception as e:
-        print(f"An error occurred while fetching hero names for autocomplete: {e}")
+        await hero_catalog.ensure_fresh() # Never blocks once loaded, a stale catalog is refreshed in the background
+        matching_names = hero_catalog.name_index.search(current)
+    except Exception:
+        log.exception("An error occurred while searching hero names for autocomplete")
         return []  # Return an empty list if there's an error
 
-    # Filter hero names based on the current input
-    matching_heroes = [
-        discord.app_commands.Choice(name=name, value=name)
-        for name in all_hero_names if current.lower() in name.lower()
-    ]
-
-    # Limit the number of suggestions to 25 (Discord's limit)
-    return matching_heroes[:25]
+    # search() already limits the number of suggestions to 25 (Discord's limit)
+    return [discord.app_commands.Choice(name=name, value=name) for name in matching_names]
 
 # hero_info command as a slash command with user input
-@bot.tree.command(name="hero_info", description="Fetch information for a specific hero by name or assigned number from hero_list")
+@slash_command(name="hero_info", description="Fetch information for a specific hero by name or assigned number from hero_list")
+@metrics.instrument
+@readiness.gate
 async def hero_info(interaction: discord.Interaction, hero_number_or_name: str):
-    await interaction.response.defer() 
+    await defer(interaction) 
 
     try:
         await asyncio.wait_for(asyncio.create_task(_process_hero_selection(interaction, hero_number_or_name)), timeout=60)
     except asyncio.TimeoutError:
+        metrics.record_timeout()
         await interaction.followup.send("Request timed out. Processing hero information is taking too long.")
 
 # Attach the autocomplete function to the hero_info command parameter
 hero_info.autocomplete("hero_number_or_name")(autocomplete_hero_info)
 
+# Rendered hero_info embeds, keyed by (hero name, hero catalog version) so a catalog reload never serves old data
+hero_info_cache = LRUCache(maxsize=config.HERO_INFO_CACHE_SIZE)
+metrics.register_cache("hero_info", hero_info_cache)
+
+# Helper function to create the hero_info embed, formatting header text as bold and combining Council/March info
+def _render_hero_embed(hero, headers):
+    hero_row = hero.cells
+    embed = discord.Embed(title=f"{hero.name} Information")
+    field_value = "" 
+    council_or_march_value = None 
+    for i in range(len(headers)):
+        if i < len(hero_row) and hero_row[i]: 
+            if "council or march" in headers[i].lower():
+                council_or_march_value = hero_row[i]  # Store the value
+            elif headers[i].lower() == "signature skill":
+                if council_or_march_value:  # Check if we have a value to combine
+                    field_value += f"**{headers[i]}**: {council_or_march_value} - {hero_row[i]}\n"
+                    council_or_march_value = None  # Reset after combining
+                else:
+                    field_value += f"**{headers[i]}**: {hero_row[i]}\n"  # Display as is if no value to combine
+            elif headers[i].lower().startswith("level") and council_or_march_value:
+                field_value += f"**{headers[i]}**: {council_or_march_value} - {hero_row[i]}\n"
+                council_or_march_value = None  # Reset after combining
+            else:
+                field_value += f"**{headers[i]}**: {hero_row[i]}\n"
+
+    embed.add_field(name="\u200b", value=field_value, inline=False)
+    return embed
+
+# Helper function to get a hero's embed from the cache, rendering it on a miss
+def _hero_info_embed(hero):
+    key = (hero.name, hero_catalog.version)
+    embed = hero_info_cache.get(key)
+    if embed is None:
+        embed = _render_hero_embed(hero, hero_catalog.headers)
+        hero_info_cache.put(key, embed)
+    return embed
+
+# Helper function to render every hero's embed ahead of the first /hero_info
+def _warm_hero_info_cache():
+    hero_info_cache.clear() # Entries for older catalog versions can never be hit again
+    for hero in hero_catalog.heroes[:hero_info_cache.maxsize]:
+        hero_info_cache.put((hero.name, hero_catalog.version), _render_hero_embed(hero, hero_catalog.headers))
+    log.info("Hero info cache warmed with %d heroes", len(hero_info_cache))
+
 # Helper function to handle hero selection and subsequent actions
 async def _process_hero_selection(interaction, hero_number_or_name):
     try:
-        print(f"User provided {hero_number_or_name}. Fetching hero information...")
-
-        # Fetch all data from the 'Hero Data General' tab
-        data_range = 'Hero Data General!A1:ZZ' 
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID_HERO_DATA, range=data_range).execute()
-        values = result.get('values', [])
-        print(f"Data fetched successfully!")
-
-        # Find the row for the selected hero
-        headers = values[0]
-        hero_row = None
-
-        if hero_number_or_name.isdigit():
-            hero_number = int(hero_number_or_name)
-
-            # Fetch hero names and their assigned numbers from the 'Master Tab'
-            master_tab_range = 'Master Tab!A2:E'
-            master_tab_result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=master_tab_range).execute()
-            master_tab_values = master_tab_result.get('values', [])
-
-            # Organize heroes by rarity and assign numbers
-            heroes_by_rarity = {}
-            for i, row in enumerate(master_tab_values):
-                if not row:
-                    break
-                name, rarity = row[0], row[4]
-                heroes_by_rarity.setdefault(rarity, []).append(name)
-
-            rarity_order = ["Common", "Fine", "Exquisite", "Epic"]
-            index = 1
-
-            for rarity in rarity_order:
-                if rarity in heroes_by_rarity:
-                    for name in heroes_by_rarity[rarity]:
-                        if index == hero_number:
-                            hero_row = next((row for row in values if row and row[0] == name), None)
-                            break # Stop searching once the hero is found
-                        index += 1
-                    if hero_row: # If the hero was found, break out of the outer loop as well
-                        break
+        log.debug("User provided %s. Fetching hero information...", hero_number_or_name)
 
-        else:
-            hero_row = next((row for row in values if row and row[0] == hero_number_or_name), None)
-
-        if hero_row:
-            # Create the embed with hero information, formatting header text as bold and combining Council/March info
-            print(f"Creating embed for {hero_row[0]}...")
-            embed = discord.Embed(title=f"{hero_row[0]} Information")
-            field_value = "" 
-            council_or_march_value = None 
-            for i in range(len(headers)):
-                if i < len(hero_row) and hero_row[i]: 
-                    if "council or march" in headers[i].lower():
-                        council_or_march_value = hero_row[i]  # Store the value
-                    elif headers[i].lower() == "signature skill":
-                        if council_or_march_value:  # Check if we have a value to combine
-                            field_value += f"**{headers[i]}**: {council_or_march_value} - {hero_row[i]}\n"
-                            council_or_march_value = None  # Reset after combining
-                        else:
-                            field_value += f"**{headers[i]}**: {hero_row[i]}\n"  # Display as is if no value to combine
-                    elif headers[i].lower().startswith("level") and council_or_march_value:
-                        field_value += f"**{headers[i]}**: {council_or_march_value} - {hero_row[i]}\n"
-                        council_or_march_value = None  # Reset after combining
-                    else:
-                        field_value += f"**{headers[i]}**: {hero_row[i]}\n"
-
-            embed.add_field(name="\u200b", value=field_value, inline=False)
-            print(f"Embed created successfully for {hero_row[0]}!")
-
-            print(f"Sending information for {hero_row[0]}...")
+        # All data from the 'Hero Data General' tab comes from the hero catalog
+        await hero_catalog.ensure_fresh()
+
+        # Find the row for the selected hero by its /hero_list number or its name
+        hero = hero_catalog.resolve_hero(hero_number_or_name)
+
+        if hero:
+            embed = _hero_info_embed(hero)
+
+            log.debug("Sending information for %s...", hero.name)
             await interaction.followup.send(embed=embed)
-            print(f"Information for {hero_row[0]} sent successfully!")
+            log.debug("Information for %s sent successfully!", hero.name)
 
         else:
-            print(f"Hero with identifier {hero_number_or_name} not found.")
+            log.debug("Hero with identifier %s not found.", hero_number_or_name)
             await interaction.followup.send(f"Hero with identifier {hero_number_or_name} not found in the sheet.")
 
-    except Exception as e:
-        print(f"An error occurred while processing hero information: {e}")
+    except Exception:
+        log.exception("An error occurred while processing hero information")
         await interaction.followup.send("An error occurred while processing your request. Please try again later.")
 
-# Autocomplete function for hero_number_or_name (used in both hero_info and add_hero)
-async def autocomplete_hero_info(interaction: discord.Interaction, current: str) -> list[discord.app_commands.Choice[str]]:
-    if len(current) < 3:
-        return []
-
-    try:
-        # Fetch all hero names from the spreadsheet 
-        hero_names_range = 'Hero Data General!A2:A' 
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID_HERO_DATA, range=hero_names_range).execute()
-        all_hero_names = [row[0] for row in result.get('values', []) if row]
-
-    except Exception as e:
-        print(f"An error occurred while fetching hero names for autocomplete: {e}")
-        return []  # Return an empty list if there's an error
-
-    # Filter hero names based on the current input
-    matching_heroes = [
-        discord.app_commands.Choice(name=name, value=name)
-        for name in all_hero_names if current.lower() in name.lower()
-    ]
-
-    # Limit the number of suggestions to 25 (Discord's limit)
-    return matching_heroes[:25]
-
-@bot.tree.command(name="add_hero", description="Add a hero to your tracking list")
+@slash_command(name="add_hero", description="Add a hero to your tracking list")
+@metrics.instrument
+@readiness.gate
 async def add_hero(interaction: discord.Interaction, hero_name: str):
-    await interaction.response.defer()
+    await defer(interaction)
 
     try:
         # Wrap the potentially long-running parts in an asyncio.wait_for block
@@ -280,366 +396,244 @@ async def add_hero(interaction: discord.Interaction, hero_name: str):
             user_id = str(interaction.user.id)
 
             # Check if the hero exists in the 'Hero Data General' sheet
-            hero_data_range = 'Hero Data General!A2:A' 
-            result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID_HERO_DATA, range=hero_data_range).execute()
-            hero_names = [row[0] for row in result.get('values', []) if row]
+            await hero_catalog.ensure_fresh()
 
-            if hero_name not in hero_names:
+            if hero_catalog.find_hero(hero_name) is None:
                 await interaction.followup.send(f"Hero '{hero_name}' not found in the database. Please double-check the spelling or use the autocomplete feature for suggestions.")
                 return
 
-            print(f"Hero {hero_name} exists. Checking if already added...")
+            log.debug("Hero %s exists. Checking if already added...", hero_name)
 
-            # Fetch all data from the 'User Hero Data' sheet
-            user_hero_data_range = 'User Hero Data!A2:B' 
-            result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=user_hero_data_range).execute() 
-            user_data = result.get('values', [])
-            print(f"Fetched user data: {user_data}")
-
-            # Iterate through the rows and check for duplicates
-            for row in user_data:
-                print(f"Checking row: {row}")
-                if row and row[0] == user_id and row[1].strip() == hero_name:
+            await roster.ensure_loaded()
+            async with roster.transaction(user_id) as user_roster:
+                # Check the user's roster for duplicates
+                if user_roster.get_entry(hero_name) is not None:
                     raise Exception(f"Hero '{hero_name}' is already in your tracking list.")
 
-            print(f"Adding hero {hero_name} for user {user_id}...")
+                log.debug("Adding hero %s for user %s...", hero_name, user_id)
 
-            # Insert hero data into the 'User Hero Data' sheet
-            values = [[user_id, hero_name]] 
-            body = {'values': values}
-            result = service.spreadsheets().values().append(
-                spreadsheetId=SPREADSHEET_ID,
-                range='User Hero Data',
-                valueInputOption='RAW',
-                body=body
-            ).execute()
+                # Insert hero data into the 'User Hero Data' sheet
+                await user_roster.add(hero_name)
 
-            print(f"Hero {hero_name} added successfully for user {user_id}.")
+            log.info("Hero %s added successfully for user %s.", hero_name, user_id)
             await interaction.followup.send(f"Hero '{hero_name}' added to your tracking list!")
 
     except asyncio.TimeoutError:
+
+        metrics.record_timeout()
         await interaction.followup.send("The request timed out. Adding the hero is taking too long. Please try again later.")
+    except DuplicateRosterRowError:
+        # Added from somewhere the roster index hasn't caught up with yet
+        await interaction.followup.send(f"You already have '{hero_name}' in your tracking list. You can only add each hero once.")
     except Exception as e:
         if "already in your tracking list" in str(e):
             await interaction.followup.send(f"You already have '{hero_name}' in your tracking list. You can only add each hero once.")
         else:
-            print(f"An unexpected error occurred while adding the hero: {e}")
+            log.exception("An unexpected error occurred while adding the hero")
             await interaction.followup.send("An unexpected error occurred while adding the hero. Please try again later or contact the Hela if the issue persists.")
 
 # Attach the autocomplete function to the add_hero command parameter
 add_hero.autocomplete("hero_name")(autocomplete_hero_info)
 
-@bot.tree.command(name="my_heroes", description="Display the list of heroes you have added")
+MY_HEROES_PAGE_SIZE = 25
+
+# Progress of a roster entry towards its ultimate goal, for the roster filter menus
+def _goal_progress(entry):
+    if not entry.ultimate_goal_level or not entry.current_level:
+        return "No goal set"
+    return "Goal reached" if entry.current_level >= entry.ultimate_goal_level else "In progress"
+
+PROGRESS_OPTIONS = ["In progress", "Goal reached", "No goal set"]
+
+# Rarity and progress filter menus for views over roster entries
+def _roster_filters():
+    return {
+        "Rarity": {rarity: (lambda entry, rarity=rarity: hero_catalog.rarity_of(entry.hero_name) == rarity) for rarity in RARITY_ORDER},
+        "Progress": {progress: (lambda entry, progress=progress: _goal_progress(entry) == progress) for progress in PROGRESS_OPTIONS},
+    }
+
+@slash_command(name="my_heroes", description="Display the list of heroes you have added")
+@metrics.instrument
+@readiness.gate
 async def my_heroes(interaction: discord.Interaction):
-    await interaction.response.defer() 
+    await defer(interaction) 
 
     user_id = str(interaction.user.id) 
 
     try:
-        # Fetch user's heroes from 'User Hero Data' sheet
-        user_hero_data_range = 'User Hero Data!A2:B'
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=user_hero_data_range).execute()
-        user_data = result.get('values', [])
-
-        user_heroes = [row[1] for row in user_data if row and row[0] == user_id]
+        # Get user's heroes from the 'User Hero Data' index
+        await roster.ensure_loaded()
+        user_heroes = roster.get_roster(user_id)
+        await hero_catalog.ensure_fresh()
 
         if not user_heroes:
             await interaction.followup.send("You haven't added any heroes yet!") 
             return
 
-        embed = discord.Embed(title=f"{interaction.user.name}'s Heroes") 
-
-        # Format hero information for the embed, removing bold formatting and extra lines
-        hero_list = "\n".join(user_heroes)  
-        embed.add_field(name="Heroes", value=hero_list, inline=False)
+        def render_page(page_heroes, page_index, page_count):
+            title = f"{interaction.user.name}'s Heroes"
+            if page_count > 1:
+                title += f" (Page {page_index + 1}/{page_count})"
+            embed = discord.Embed(title=title)
+            # Format hero information for the embed, removing bold formatting and extra lines
+            if page_heroes:
+                embed.add_field(name="Heroes", value="\n".join(entry.hero_name for entry in page_heroes), inline=False)
+            return embed
 
-        await interaction.followup.send(embed=embed) 
+        view = PaginatedView(user_heroes, render_page, per_page=MY_HEROES_PAGE_SIZE, filters=_roster_filters(), owner_id=interaction.user.id)
+        await view.send(interaction)
 
-    except Exception as e: 
-        print(f"An error occurred while fetching user heroes: {e}")
+    except Exception: 
+        log.exception("An error occurred while fetching user heroes")
         await interaction.followup.send("An error occurred while fetching your heroes. Please try again later.") 
 
-@bot.tree.command(name="remove_hero", description="Remove a hero from your tracking list")
+@slash_command(name="remove_hero", description="Remove a hero from your tracking list")
+@metrics.instrument
+@readiness.gate
 async def remove_hero(interaction: discord.Interaction, hero_name: str):
-    await interaction.response.defer()
+    await defer(interaction)
 
     user_id = str(interaction.user.id)
 
     try:
-        print(f"Attempting to remove hero '{hero_name}' for user {user_id}")
-
-        # Fetch user's heroes from 'User Hero Data' sheet
-        user_hero_data_range = 'User Hero Data!A2:B'
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=user_hero_data_range).execute()
-        user_data = result.get('values', [])
-
-        print(f"Fetched user data: {user_data}")
-
-        # Find the row index to delete
-        row_index_to_delete = None
-        for i, row in enumerate(user_data):
-            if row and row[0] == user_id and row[1].strip() == hero_name:
-                row_index_to_delete = i + 2  # +2 to account for header row and 0-based indexing
-                break
-
-        if row_index_to_delete:
-            print(f"Found hero to delete at row index {row_index_to_delete}")
-
-            # --- Place the code block to print sheet properties here ---
-            spreadsheet = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-            sheets = spreadsheet.get('sheets', '')
-            for sheet in sheets:  
-
-                print(f"Sheet Name: {sheet['properties']['title']}, Sheet ID: {sheet['properties']['sheetId']}")
-            # --- End of code block ---
-
-            # Delete the row
-            requests = [{
-                "deleteDimension": {
-                    "range": {
-                        "sheetId": 1156414171,  # Assuming 'User Hero Data' is the second sheet
-                        "dimension": "ROWS",
-                        "startIndex": row_index_to_delete - 1,
-                        "endIndex": row_index_to_delete,
-                    }
-                }
-            }]
-
-            body = {'requests': requests}
-            service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=body).execute()
-
-            print(f"Hero '{hero_name}' removed successfully for user {user_id}")
+        log.debug("Attempting to remove hero '%s' for user %s", hero_name, user_id)
+
+        # Remove the hero from the user's roster; the check and the removal happen under the user's lock
+        await roster.ensure_loaded()
+
+        if await roster.remove(user_id, hero_name):
+            log.info("Hero '%s' removed successfully for user %s", hero_name, user_id)
             await interaction.followup.send(f"Hero '{hero_name}' removed from your tracking list!")
         else:
-            print(f"Hero '{hero_name}' not found in user's list")
+            log.debug("Hero '%s' not found in user's list", hero_name)
             await interaction.followup.send(f"Hero '{hero_name}' not found in your tracking list.")
 
-    except Exception as e:
-        print(f"An error occurred while removing the hero: {e}")
+    except Exception:
+        log.exception("An error occurred while removing the hero")
         await interaction.followup.send("An error occurred while removing the hero. Please try again later.")
 
 # Attach the autocomplete function to the remove_hero command parameter (reuse the existing one)
 remove_hero.autocomplete("hero_name")(autocomplete_hero_info)
 
-@bot.tree.command(name="manage_hero", description="Update the current level of a tracked hero")
+@slash_command(name="manage_hero", description="Update the current level of a tracked hero")
+@metrics.instrument
+@readiness.gate
 async def manage_hero(interaction: discord.Interaction, hero_name: str, current_level: int = None,current_relics: int = None, next_goal_level: int = None, ultimate_goal_level: int = None):
-    global existing_hero_data
-
-    await interaction.response.defer()
+    await defer(interaction)
 
     try:
-        # 1. Fetch existing hero data from 'User Hero Data'
-        user_hero_data_range = 'User Hero Data!A2:P' 
-        print(f"Fetching existing hero data for {hero_name} from {user_hero_data_range}...") 
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=user_hero_data_range).execute()
-        user_data = result.get('values', [])
-        print(f"User data fetched: {user_data}") 
+        # 1. Look up the user's roster in the 'User Hero Data' index
+        log.debug("Looking up existing hero data for %s...", hero_name) 
+        await roster.ensure_loaded()
 
         # 2. Find the row to update, matching both user_id and hero_name
         user_id = str(interaction.user.id) 
-        row_to_update = next(
-            (i + 2 for i, row in enumerate(user_data) if row and row[0] == user_id and row[1] == hero_name),
-            None
-        )
-        print(f"Row to update: {row_to_update}") 
 
-        if row_to_update is None:
-            raise ValueError(f"{hero_name} was not found in your tracking list. Add the hero first using the 'add_hero' command.")
-        
-        # 3. Fetch existing hero data (to get current level, relics, and next goal level)
-        existing_hero_data = next((row for row in user_data if row and row[0] == str(interaction.user.id) and row[1] == hero_name), None)
-
-        # 4. Fetch hero's max level from 'Hero Data General' sheet 
-        max_level_range = f'Hero Data General!A2:C'
-        print(f"4. Fetching all hero data (including max level) from {max_level_range}...")  
-        result = service.spreadsheets().values().get(
-            spreadsheetId=SPREADSHEET_ID_HERO_DATA, 
-            range=max_level_range
-        ).execute()
-        hero_data = result.get('values', [])
-        print(f"Hero data fetched: {hero_data}")
-
-        # 5. Find the row containing the hero's data and extract max_level
-        hero_row = next((row for row in hero_data if row and row[0] == hero_name), None)
-        if hero_row is None:
-            raise ValueError(f"{hero_name} was not found in the hero database. (This should not happen, please contact Hela)") 
-
-        max_level = int(hero_row[2])
-        print(f"Max level for {hero_name}: {max_level}")
-
-        # 6. Get current level, relics, and goals from existing data ONLY if not provided in input
-        if current_level is None or current_relics is None:  # Fetch from sheet only if not provided
-            existing_hero_data = next((row for row in user_data if row and row[0] == str(interaction.user.id) and row[1] == hero_name), None)
-            if current_level is None:
-                current_level = int(existing_hero_data[2]) if len(existing_hero_data) > 2 and existing_hero_data[2] else 0
-            if current_relics is None:
-                current_relics = int(existing_hero_data[3]) if len(existing_hero_data) > 3 and existing_hero_data[3] else 0
-
-        # 7. Get next_goal_level and ultimate_goal_level from existing data ONLY if not provided in input
-        if next_goal_level is None or ultimate_goal_level is None: # Fetch from sheet only if not provided
-            existing_hero_data = next((row for row in user_data if row and row[0] == str(interaction.user.id) and row[1] == hero_name), None)
-            if next_goal_level is None:
-                next_goal_level = int(existing_hero_data[4]) if len(existing_hero_data) > 4 and existing_hero_data[4] else None
-            if ultimate_goal_level is None:
-                ultimate_goal_level = int(existing_hero_data[5]) if len(existing_hero_data) > 5 and existing_hero_data[5] else None
-
-        # 8. Input validation for current_level (if provided)
-        if current_level is not None and not (0 <= current_level <= max_level):
-            raise ValueError(f"You have entered an invalid current level value for {hero_name} Please enter a value between 0 and {max_level}.")
+        # The user's lock is held from reading the row to writing it, so the user's other commands can't interleave
+        async with roster.transaction(user_id) as user_roster:
+            # 3. Fetch existing hero data (to get current level, relics, and next goal level)
+            existing_hero_data = user_roster.get_entry(hero_name)
+
+            if existing_hero_data is None:
+                raise ValueError(f"{hero_name} was not found in your tracking list. Add the hero first using the 'add_hero' command.")
+
+            # 4. Get the hero's 'Hero Data General' row (including max level) from the hero catalog
+            await hero_catalog.ensure_fresh()
+
+            # 5. Find the row containing the hero's data and extract max_level
+            hero = hero_catalog.find_hero(hero_name)
+            if hero is None or hero.max_level is None:
+                raise ValueError(f"{hero_name} was not found in the hero database. (This should not happen, please contact Hela)") 
+
+            max_level = hero.max_level
+            log.debug("Max level for %s: %s", hero_name, max_level)
+
+            # 6. Get current level, relics, and goals from existing data ONLY if not provided in input
+            if current_level is None or current_relics is None:  # Fetch from sheet only if not provided
+                if current_level is None:
+                    current_level = existing_hero_data.current_level or 0
+                if current_relics is None:
+                    current_relics = existing_hero_data.current_relics or 0
+
+            # 7. Get next_goal_level and ultimate_goal_level from existing data ONLY if not provided in input
+            if next_goal_level is None or ultimate_goal_level is None: # Fetch from sheet only if not provided
+                if next_goal_level is None:
+                    next_goal_level = existing_hero_data.next_goal_level or None
+                if ultimate_goal_level is None:
+                    ultimate_goal_level = existing_hero_data.ultimate_goal_level or None
+
+            # 8. Input validation for current_level (if provided)
+            if current_level is not None and not (0 <= current_level <= max_level):
+                raise ValueError(f"You have entered an invalid current level value for {hero_name} Please enter a value between 0 and {max_level}.")
         
-        # 9.Additional check: current_level should not be higher than next_goal_level (if provided)
-        if next_goal_level is not None and current_level > next_goal_level:
-            raise ValueError(f"Current level cannot be higher than the next goal level.")
+            # 9.Additional check: current_level should not be higher than next_goal_level (if provided)
+            if next_goal_level is not None and current_level > next_goal_level:
+                raise ValueError(f"Current level cannot be higher than the next goal level.")
         
-        # 10. Input validation for current_relics (if provided)
-        if current_relics is not None and current_relics < 0:
-            raise ValueError("Current relics cannot be negative.")
+            # 10. Input validation for current_relics (if provided)
+            if current_relics is not None and current_relics < 0:
+                raise ValueError("Current relics cannot be negative.")
         
-        # 11. Input validation for next_goal_level (if provided)
-        if next_goal_level is not None:
-            # Get the current level, either from the provided input or the existing data
-            current_level_for_goal_check = current_level if current_level is not None else \
-                (int(existing_hero_data[2]) if len(existing_hero_data) > 2 and existing_hero_data[2] else 0)
+            # 11. Input validation for next_goal_level (if provided)
+            if next_goal_level is not None:
+                # Get the current level, either from the provided input or the existing data
+                current_level_for_goal_check = current_level if current_level is not None else (existing_hero_data.current_level or 0)
 
-            # Handle the case where current_level_for_goal_check is None
-            if current_level_for_goal_check is None:
-                current_level_for_goal_check = 0  # Set to 0 if not available
+                # Handle the case where current_level_for_goal_check is None
+                if current_level_for_goal_check is None:
+                    current_level_for_goal_check = 0  # Set to 0 if not available
 
-            if not (current_level_for_goal_check <= next_goal_level <= max_level):
-                raise ValueError(f"Invalid next goal level value. Please enter a value between the current level you have for this hero ({current_level_for_goal_check}) and the max level for this hero ({max_level}) or leave it blank.")
+                if not (current_level_for_goal_check <= next_goal_level <= max_level):
+                    raise ValueError(f"Invalid next goal level value. Please enter a value between the current level you have for this hero ({current_level_for_goal_check}) and the max level for this hero ({max_level}) or leave it blank.")
             
-            # Additional check: next_goal_level should not be higher than ultimate_goal_level (if provided)
-            if ultimate_goal_level is not None and next_goal_level > ultimate_goal_level:
-                raise ValueError(f"Next goal level cannot be higher than the ultimate goal level.")
+                # Additional check: next_goal_level should not be higher than ultimate_goal_level (if provided)
+                if ultimate_goal_level is not None and next_goal_level > ultimate_goal_level:
+                    raise ValueError(f"Next goal level cannot be higher than the ultimate goal level.")
             
-        # 12. Input validation for ultimate_goal_level (if provided)
-        if ultimate_goal_level is not None:
-            # Get the next_goal_level, either from the provided input or the existing data
-            next_goal_level_for_check = next_goal_level if next_goal_level is not None else \
-                (int(existing_hero_data[4]) if len(existing_hero_data) > 4 and existing_hero_data[4] else 0)
+            # 12. Input validation for ultimate_goal_level (if provided)
+            if ultimate_goal_level is not None:
+                # Get the next_goal_level, either from the provided input or the existing data
+                next_goal_level_for_check = next_goal_level if next_goal_level is not None else (existing_hero_data.next_goal_level or 0)
 
-            # If next_goal_level is also not available, use current_level
-            if next_goal_level_for_check is None or next_goal_level_for_check == 0:
-                next_goal_level_for_check = current_level if current_level is not None else \
-                    (int(existing_hero_data[2]) if len(existing_hero_data) > 2 and existing_hero_data[2] else 0)
+                # If next_goal_level is also not available, use current_level
+                if next_goal_level_for_check is None or next_goal_level_for_check == 0:
+                    next_goal_level_for_check = current_level if current_level is not None else (existing_hero_data.current_level or 0)
 
-            if not (next_goal_level_for_check <= ultimate_goal_level <= max_level):
-                raise ValueError(f"Invalid ultimate goal level value. Please enter a value between the next goal level ({next_goal_level_for_check}) and the max level for this hero ({max_level}) or leave it blank.")
+                if not (next_goal_level_for_check <= ultimate_goal_level <= max_level):
+                    raise ValueError(f"Invalid ultimate goal level value. Please enter a value between the next goal level ({next_goal_level_for_check}) and the max level for this hero ({max_level}) or leave it blank.")
             
-            # Additional check: current_level should not be higher than ultimate_goal_level
-            if current_level is not None and current_level > ultimate_goal_level:
-                raise ValueError(f"Current level cannot be higher than the ultimate goal level.")
-        # 13. Calculate relic requirements
-        relic_milestones = [1, 10, 20, 30, 40, 50, 60]
-        relic_costs = [500, 6100, 13000, 54000, 80000, 100000, 120000]
-
-        # 14.Next unlock level
-        next_unlock = next((level for level in relic_milestones if level > current_level and level <= max_level), "Hero Already Maxed")
-        if next_unlock == "Hero Already Maxed":
-            relics_to_next_unlock = "Hero Already Maxed"
-        else:
-            relics_to_next_unlock = relic_costs[relic_milestones.index(next_unlock)] - current_relics
-            if relics_to_next_unlock < 0:
-                relics_to_next_unlock = "You already have enough relics for the next unlock level"
-
-        # 15.Next goal level
-        if next_goal_level is None:
-            relics_to_next_goal = "No next goal level has been set"
-        elif current_level >= next_goal_level:
-            relics_to_next_goal = "Current level is higher than next goal level, please adjust using /manage_hero"
-        else:
-            # Find milestones within the range [current_level, next_goal_level]
-            milestones_in_range = [level for level in relic_milestones if current_level < level <= next_goal_level]
-
-            # Calculate the relic cost for each milestone in the range
-            total_relic_cost = sum(relic_costs[relic_milestones.index(level)] for level in milestones_in_range)
-
-            relics_to_next_goal = total_relic_cost - current_relics
-            if relics_to_next_goal < 0:
-                relics_to_next_goal = "You already have enough relics for the next goal level"
-
-        # 16.Ultimate goal level
-        if ultimate_goal_level is None:
-            relics_to_ultimate_goal = "No ultimate goal level has been set"
-        elif current_level >= ultimate_goal_level:
-            relics_to_ultimate_goal = "Current level is higher than ultimate goal level, please adjust using /manage_hero"
-        else:
-            # Find milestones within the range [current_level, ultimate_goal_level]
-            milestones_in_range = [level for level in relic_milestones if current_level < level <= ultimate_goal_level]
-
-            # Calculate the relic cost for each milestone in the range
-            total_relic_cost = sum(relic_costs[relic_milestones.index(level)] for level in milestones_in_range)
-
-            relics_to_ultimate_goal = total_relic_cost - current_relics
-            if relics_to_ultimate_goal < 0:
-                relics_to_ultimate_goal = "You already have enough relics for the ultimate goal level"
-
-        # 17. Define XP and oath milestones and costs
-        oath_milestones = [10, 20, 30, 40, 50, 60]
-        oath_costs = [28000, 62000, 250000, 580000, 940000, 1700000]
-
-        xp_milestones = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60]
-        xp_costs = [1800, 2000, 2400, 2600, 2900, 3200, 3600, 4100, 4500, 3600, 4000, 4500, 5000, 5600, 6300, 7000, 7900, 8800, 9900, 14000, 16000, 18000, 20000, 22000, 25000, 28000, 31000, 35000, 39000, 31000, 35000, 39000, 44000, 49000, 55000, 62000, 69000, 78000, 87000, 49000, 55000, 62000, 69000, 78000, 87000, 98000, 110000, 120000, 140000, 85000, 95000, 110000, 120000, 130000, 150000, 170000, 190000, 210000, 240000]
-
-        # 18. Calculate XP and oath requirements
-        def calculate_cost(current_level, target_level, milestones, costs):
-            if current_level >= target_level:
-                return "Current level is higher than the target level"
-            elif target_level == 1:  # Special case for level 1, no oaths needed
-                return 0
-            elif target_level == "Hero Already Maxed": # Handle the max level case
-                return "Hero Already Maxed"
-            else:
-                milestones_in_range = [level for level in milestones if current_level < level <= target_level]
-                total_cost = sum(costs[milestones.index(level)] for level in milestones_in_range)
-                return total_cost
-
-        # XP and oaths to next unlock
-        if next_unlock == "Hero Already Maxed":
-            xp_to_next_unlock = "Hero Already Maxed"
-            oaths_to_next_unlock = "Hero Already Maxed"
-        else:
-            xp_to_next_unlock = calculate_cost(current_level, int(next_unlock), xp_milestones, xp_costs)
-            oaths_to_next_unlock = calculate_cost(current_level, int(next_unlock), oath_milestones, oath_costs)
-
-        # XP and oaths to next goal
-        xp_to_next_goal = calculate_cost(current_level, next_goal_level, xp_milestones, xp_costs) if next_goal_level else "No next goal level has been set"
-        oaths_to_next_goal = calculate_cost(current_level, next_goal_level, oath_milestones, oath_costs) if next_goal_level else "No next goal level has been set"
-
-        # XP and oaths to ultimate goal
-        xp_to_ultimate_goal = calculate_cost(current_level, ultimate_goal_level, xp_milestones, xp_costs) if ultimate_goal_level else "No ultimate goal level has been set"
-        oaths_to_ultimate_goal = calculate_cost(current_level, ultimate_goal_level, oath_milestones, oath_costs) if ultimate_goal_level else "No ultimate goal level has been set"
-
-
-        # 17. Prepare the data to be updated
-        values_to_update = [
-            current_level if current_level is not None else (int(existing_hero_data[2]) if len(existing_hero_data) > 2 and existing_hero_data[2] else 0),
-            current_relics if current_relics is not None else (int(existing_hero_data[3]) if len(existing_hero_data) > 3 and existing_hero_data[3] else 0),
-            next_goal_level,  # Use the value from input or existing_hero_data
-            ultimate_goal_level,  # Use the value from input or existing_hero_data
-            next_unlock,
-            relics_to_next_unlock,
-            relics_to_next_goal,
-            relics_to_ultimate_goal,
-            xp_to_next_unlock,
-            oaths_to_next_unlock,
-            xp_to_next_goal,
-            oaths_to_next_goal,
-            xp_to_ultimate_goal,
-            oaths_to_ultimate_goal
-        ]
-
-
-        # 20. Update the spreadsheet (columns C to P)
-        range_to_update = f'User Hero Data!C{row_to_update}:P{row_to_update}'
-        body = {'values': [values_to_update]}
-        print(f"13. Updating spreadsheet at range {range_to_update} with values: {values_to_update}")
-        service.spreadsheets().values().update(
-            spreadsheetId=SPREADSHEET_ID,
-            range=range_to_update,
-            valueInputOption='RAW',
-            body=body
-        ).execute()
+                # Additional check: current_level should not be higher than ultimate_goal_level
+                if current_level is not None and current_level > ultimate_goal_level:
+                    raise ValueError(f"Current level cannot be higher than the ultimate goal level.")
+            # 13. Calculate relic, XP and oath requirements from the shared cost tables
+            (next_unlock, relics_to_next_unlock, relics_to_next_goal, relics_to_ultimate_goal,
+             xp_to_next_unlock, oaths_to_next_unlock, xp_to_next_goal, oaths_to_next_goal,
+             xp_to_ultimate_goal, oaths_to_ultimate_goal) = requirements(current_level, current_relics, max_level, next_goal_level, ultimate_goal_level)
+
+            # 17. Prepare the data to be updated
+            values_to_update = [
+                current_level if current_level is not None else (existing_hero_data.current_level or 0),
+                current_relics if current_relics is not None else (existing_hero_data.current_relics or 0),
+                next_goal_level,  # Use the value from input or existing_hero_data
+                ultimate_goal_level,  # Use the value from input or existing_hero_data
+                next_unlock,
+                relics_to_next_unlock,
+                relics_to_next_goal,
+                relics_to_ultimate_goal,
+                xp_to_next_unlock,
+                oaths_to_next_unlock,
+                xp_to_next_goal,
+                oaths_to_next_goal,
+                xp_to_ultimate_goal,
+                oaths_to_ultimate_goal
+            ]
+
+
+            # 20. Update the spreadsheet (columns C to P, or only the inputs in C to F when derived values are computed lazily)
+            if config.LAZY_DERIVED_COLUMNS:
+                values_to_update = values_to_update[:4]
+            log.debug("13. Updating spreadsheet from column C with values: %s", values_to_update)
+            await user_roster.update(hero_name, 'C', values_to_update)
 
         # 21. Construct the success message based on which fields were updated
         updated_fields = []
@@ -662,50 +656,40 @@ async def manage_hero(interaction: discord.Interaction, hero_name: str, current_
 
     except ValueError as e:
         await interaction.edit_original_response(content=str(e))
-    except Exception as e:
-        print(f"An error occurred while updating hero data: {e}")
+    except Exception:
+        log.exception("An error occurred while updating hero data")
         await interaction.edit_original_response(content="An error occurred while updating hero data. Please try again later.")
 
 # 22.Attach the autocomplete function to the manage_hero command parameter 
 manage_hero.autocomplete("hero_name")(autocomplete_hero_info)
 
-@bot.tree.command(name="my_heroes_with_input_information", description="Display a list of your tracked heroes with the information you have entered for them")
+@slash_command(name="my_heroes_with_input_information", description="Display a list of your tracked heroes with the information you have entered for them")
+@metrics.instrument
+@readiness.gate
 async def my_heroes_with_input_information(interaction: discord.Interaction):
-    await interaction.response.defer()
+    await defer(interaction)
 
     user_id = str(interaction.user.id)
 
     try:
-        # Fetch user's heroes with additional data from 'User Hero Data' sheet
-        user_hero_data_range = 'User Hero Data!A2:F'  # Include columns C to F for level, relics, and goals
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=user_hero_data_range).execute()
-        user_data = result.get('values', [])
-
-        user_heroes_data = [row for row in user_data if row and row[0] == user_id]
+        # Get user's heroes with additional data (columns C to F for level, relics, and goals) from the 'User Hero Data' index
+        await roster.ensure_loaded()
+        user_heroes_data = roster.get_roster(user_id)
+        await hero_catalog.ensure_fresh()
 
         if not user_heroes_data:
             await interaction.followup.send("You haven't added any heroes yet!")
             return
 
-        # Paginate the hero data
-        heroes_per_page = 10  
-        current_page = 0
-        total_pages = (len(user_heroes_data) + heroes_per_page - 1) // heroes_per_page 
+        def render_page(page_heroes_data, page_index, page_count):
+            embed = discord.Embed(title=f"{interaction.user.name}'s Hero Overview (Page {page_index + 1}/{page_count})")
 
-        def create_embed(page_num):
-            start_idx = page_num * heroes_per_page
-            end_idx = min(start_idx + heroes_per_page, len(user_heroes_data))
-            page_heroes_data = user_heroes_data[start_idx:end_idx]
-
-            embed = discord.Embed(title=f"{interaction.user.name}'s Hero Overview (Page {page_num + 1}/{total_pages})")
-
-            for hero_data in page_heroes_data:
-                hero_name = hero_data[1]
-                hero_name_with_underline = f"__{hero_name}__"
-                current_level = hero_data[2] if len(hero_data) > 2 and hero_data[2] else "N/A"
-                current_relics = hero_data[3] if len(hero_data) > 3 and hero_data[3] else "N/A"
-                next_goal_level = hero_data[4] if len(hero_data) > 4 and hero_data[4] else "N/A"
-                ultimate_goal_level = hero_data[5] if len(hero_data) > 5 and hero_data[5] else "N/A"
+            for entry in page_heroes_data:
+                hero_name_with_underline = f"__{entry.hero_name}__"
+                current_level = entry.current_level if entry.current_level is not None else "N/A"
+                current_relics = entry.current_relics if entry.current_relics is not None else "N/A"
+                next_goal_level = entry.next_goal_level if entry.next_goal_level is not None else "N/A"
+                ultimate_goal_level = entry.ultimate_goal_level if entry.ultimate_goal_level is not None else "N/A"
 
                 hero_info = (
                     f"**Current Level:** {current_level}\n"
@@ -717,158 +701,64 @@ async def my_heroes_with_input_information(interaction: discord.Interaction):
                 embed.add_field(name=hero_name_with_underline, value=hero_info, inline=False)
             return embed
 
-        # Create the initial embed
-        embed = create_embed(current_page)
+        # Pages are rendered as they are first shown and reused after that
+        view = PaginatedView(user_heroes_data, render_page, per_page=10, filters=_roster_filters(), owner_id=interaction.user.id)
+        await view.send(interaction)
 
-        # Create buttons for navigation
-        previous_button = discord.ui.Button(label="Previous", style=discord.ButtonStyle.blurple, disabled=True) 
-        next_button = discord.ui.Button(label="Next", style=discord.ButtonStyle.blurple, disabled=total_pages == 1) 
+    except Exception:
+        log.exception("An error occurred while fetching user heroes")
+        await interaction.followup.send("An error occurred while fetching your heroes. Please try again later.")
 
-        # View to hold the buttons
-        view = discord.ui.View()
-        view.add_item(previous_button)
-        view.add_item(next_button)
+@slash_command(name="calculate_relics_needed", description="Calculate relics needed for various goals for a tracked hero")
+@metrics.instrument
+@readiness.gate
+async def calculate_relics_needed(interaction: discord.Interaction, hero_name: str):
+    await defer(interaction)
 
-        # Button callback functions
-        async def previous_callback(interaction):
-            nonlocal current_page
-            current_page -= 1
-            await interaction.response.edit_message(embed=create_embed(current_page), view=update_view())
+    try:
+        # 1. Look up the user's roster in the 'User Hero Data' index
+        log.debug("1. Looking up existing hero data for %s...", hero_name)
+        await roster.ensure_loaded()
 
-        async def next_callback(interaction):
-            nonlocal current_page
-            current_page += 1
-            await interaction.response.edit_message(embed=create_embed(current_page), view=update_view())
+        # 2. Find the row to update, matching both user_id and hero_name
+        user_id = str(interaction.user.id)
 
-        # Function to update button states based on current_page
-        def update_view():
-            previous_button.disabled = current_page == 0
-            next_button.disabled = current_page == total_pages - 1
-            return view
+        async with roster.transaction(user_id) as user_roster:
+            # 3. Fetch existing hero data (to get current level, relics, and goals)
+            existing_hero_data = user_roster.get_entry(hero_name)
 
-        # Assign callbacks to the buttons
-        previous_button.callback = previous_callback
-        next_button.callback = next_callback
+            if existing_hero_data is None:
+                raise ValueError(f"2. Hero '{hero_name}' was not found in your tracking list. Add the hero first using the 'add_hero' command.")
 
-        # Send the initial embed with the buttons
-        await interaction.followup.send(embed=embed, view=view)
+            # 4. Get the hero's 'Hero Data General' row (including max level) from the hero catalog
+            await hero_catalog.ensure_fresh()
 
-    except Exception as e:
-        print(f"An error occurred while fetching user heroes: {e}")
-        await interaction.followup.send("An error occurred while fetching your heroes. Please try again later.")
+            # 5. Find the row containing the hero's data and extract max_level
+            hero = hero_catalog.find_hero(hero_name)
+            if hero is None or hero.max_level is None:
+                raise ValueError(f"5. Hero '{hero_name}' was not found in the hero database. (This should not happen, please contact Hela)") 
 
-@bot.tree.command(name="calculate_relics_needed", description="Calculate relics needed for various goals for a tracked hero")
-async def calculate_relics_needed(interaction: discord.Interaction, hero_name: str):
-    await interaction.response.defer()
+            max_level = hero.max_level
+            log.debug("5. Max level for %s: %s", hero_name, max_level)
 
-    try:
-        # 1. Fetch existing hero data from 'User Hero Data'
-        user_hero_data_range = 'User Hero Data!A2:J'  # Include columns up to J for calculations
-        print(f"1. Fetching existing hero data for {hero_name} from {user_hero_data_range}...")
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=user_hero_data_range).execute()
-        user_data = result.get('values', [])
-        print(f"1. User data fetched: {user_data}")
+            # 6. Get current level, relics, and goals from existing data or defaults
+            current_level = existing_hero_data.current_level or 0
+            current_relics = existing_hero_data.current_relics or 0
 
-        # 2. Find the row to update, matching both user_id and hero_name
-        user_id = str(interaction.user.id)
-        row_to_update = next(
-            (i + 2 for i, row in enumerate(user_data) if row and row[0] == user_id and row[1] == hero_name),
-            None
-        )
-        print(f"2. Row to update: {row_to_update}")
-
-        if row_to_update is None:
-            raise ValueError(f"2. Hero '{hero_name}' was not found in your tracking list. Add the hero first using the 'add_hero' command.")
-
-        # 3. Fetch existing hero data (to get current level, relics, and goals)
-        existing_hero_data = next((row for row in user_data if row and row[0] == str(interaction.user.id) and row[1] == hero_name), None)
-
-        # 4. Fetch hero's max level from 'Hero Data General' sheet 
-        max_level_range = f'Hero Data General!A2:C'
-        print(f"4. Fetching all hero data (including max level) from {max_level_range}...")  
-        result = service.spreadsheets().values().get(
-            spreadsheetId=SPREADSHEET_ID_HERO_DATA, 
-            range=max_level_range
-        ).execute()
-        hero_data = result.get('values', [])
-        print(f"4. Hero data fetched: {hero_data}")
-
-        # 5. Find the row containing the hero's data and extract max_level
-        hero_row = next((row for row in hero_data if row and row[0] == hero_name), None)
-        if hero_row is None:
-            raise ValueError(f"5. Hero '{hero_name}' was not found in the hero database. (This should not happen, please contact Hela)") 
-
-        max_level = int(hero_row[2])
-        print(f"5. Max level for {hero_name}: {max_level}")
-
-        # 6. Get current level, relics, and goals from existing data or defaults
-        current_level = int(existing_hero_data[2]) if len(existing_hero_data) > 2 and existing_hero_data[2] else 0
-        current_relics = int(existing_hero_data[3]) if len(existing_hero_data) > 3 and existing_hero_data[3] else 0
-        
-        # Handle empty strings as None for goal levels
-        next_goal_level = int(existing_hero_data[4]) if len(existing_hero_data) > 4 and existing_hero_data[4] else None
-        if next_goal_level == 0:  # Treat 0 as not set
-            next_goal_level = None
-
-        ultimate_goal_level = int(existing_hero_data[5]) if len(existing_hero_data) > 5 and existing_hero_data[5] else None
-        if ultimate_goal_level == 0:
-            ultimate_goal_level = None
-
-        # 7. Calculate relic requirements
-        relic_milestones = [1, 10, 20, 30, 40, 50, 60]
-        relic_costs = [500, 6100, 13000, 54000, 80000, 100000, 120000]
-
-        # Next unlock level (no changes here)
-        next_unlock = next((level for level in relic_milestones if level > current_level and level <= max_level), "Hero Already Maxed")
-        if next_unlock == "Hero Already Maxed":
-            relics_to_next_unlock = "Hero Already Maxed"
-        else:
-            relics_to_next_unlock = relic_costs[relic_milestones.index(next_unlock)] - current_relics
-            if relics_to_next_unlock < 0:
-                relics_to_next_unlock = "You already have enough relics for the next unlock level"
-
-        # Next goal level (modified to handle non-milestone goal levels)
-        if next_goal_level is None:
-            relics_to_next_goal = "No next goal level has been set"
-        elif current_level >= next_goal_level:
-            relics_to_next_goal = "Current level is higher than next goal level, please adjust using /manage_hero"
-        else:
-            # Find milestones within the range [current_level, next_goal_level]
-            milestones_in_range = [level for level in relic_milestones if current_level < level <= next_goal_level]
-
-            # Calculate the relic cost for each milestone in the range
-            total_relic_cost = sum(relic_costs[relic_milestones.index(level)] for level in milestones_in_range)
+            # Blank and 0 goal levels count as not set
+            next_goal_level = existing_hero_data.next_goal_level or None
+            ultimate_goal_level = existing_hero_data.ultimate_goal_level or None
 
-            relics_to_next_goal = total_relic_cost - current_relics
-            if relics_to_next_goal < 0:
-                relics_to_next_goal = "You already have enough relics for the next goal level"
+            # 7. Calculate relic requirements from the shared cost tables
+            next_unlock, relics_to_next_unlock, relics_to_next_goal, relics_to_ultimate_goal = relic_requirements(
+                current_level, current_relics, max_level, next_goal_level, ultimate_goal_level
+            )
 
-        # Ultimate goal level (modified similarly to next_goal_level)
-        if ultimate_goal_level is None:
-            relics_to_ultimate_goal = "No ultimate goal level has been set"
-        elif current_level >= ultimate_goal_level:
-            relics_to_ultimate_goal = "Current level is higher than ultimate goal level, please adjust using /manage_hero"
-        else:
-            # Find milestones within the range [current_level, ultimate_goal_level]
-            milestones_in_range = [level for level in relic_milestones if current_level < level <= ultimate_goal_level]
-
-            # Calculate the relic cost for each milestone in the range
-            total_relic_cost = sum(relic_costs[relic_milestones.index(level)] for level in milestones_in_range)
-
-            relics_to_ultimate_goal = total_relic_cost - current_relics
-            if relics_to_ultimate_goal < 0:
-                relics_to_ultimate_goal = "You already have enough relics for the ultimate goal level"
-
-        # 8. Update calculated values in the spreadsheet (columns G to J)
-        range_to_update = f'User Hero Data!G{row_to_update}:J{row_to_update}'
-        values_to_update = [[next_unlock, relics_to_next_unlock, relics_to_next_goal, relics_to_ultimate_goal]]
-        print(f"8. Updating spreadsheet at range {range_to_update} with values: {values_to_update}")
-        service.spreadsheets().values().update(
-            spreadsheetId=SPREADSHEET_ID,
-            range=range_to_update,
-            valueInputOption='RAW',
-            body={'values': values_to_update}
-        ).execute()
+            # 8. Update calculated values in the spreadsheet (columns G to J), unless they are computed lazily
+            if not config.LAZY_DERIVED_COLUMNS:
+                values_to_update = [next_unlock, relics_to_next_unlock, relics_to_next_goal, relics_to_ultimate_goal]
+                log.debug("8. Updating spreadsheet columns G to J with values: %s", values_to_update)
+                await user_roster.update(hero_name, 'G', values_to_update)
 
         # 9. Create the embed with hero information, formatting each item on a new line and with a colon separator
         embed = discord.Embed(title=f"{hero_name} Information")
@@ -891,13 +781,33 @@ async def calculate_relics_needed(interaction: discord.Interaction, hero_name: s
 
     except ValueError as e:
         await interaction.edit_original_response(content=str(e))
-    except Exception as e:
-        print(f"An error occurred while processing hero information: {e}")
+    except Exception:
+        log.exception("An error occurred while processing hero information")
 
 # Attach the autocomplete function to the calculate_relics_needed command parameter
 calculate_relics_needed.autocomplete("hero_name")(autocomplete_hero_info)
 
-@bot.tree.command(name="help", description="Display all bot commands and their descriptions")
+@slash_command(name="reload_heroes", description="Reload the hero catalog from the spreadsheet (admin only)")
+@discord.app_commands.default_permissions(administrator=True)
+@metrics.instrument
+async def reload_heroes(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+
+    try:
+        await storage.refresh_catalog()
+        await hero_catalog.load()
+        if config.WARM_HERO_INFO_CACHE:
+            _warm_hero_info_cache()
+        await interaction.followup.send(
+            f"Hero catalog reloaded: {len(hero_catalog.heroes)} heroes (version {hero_catalog.version}).\n"
+            f"Hero info cache: {hero_info_cache.hits} hits, {hero_info_cache.misses} misses ({hero_info_cache.hit_rate:.0%} hit rate)."
+        )
+    except Exception:
+        log.exception("An error occurred while reloading the hero catalog")
+        await interaction.followup.send("An error occurred while reloading the hero catalog. The previous data is still in use.")
+
+@slash_command(name="help", description="Display all bot commands and their descriptions")
+@metrics.instrument
 async def help_command(interaction: discord.Interaction):
     embed = discord.Embed(title="Hela's Hero Planner Bot Commands", description="Here are the available commands:")
 
@@ -906,94 +816,59 @@ async def help_command(interaction: discord.Interaction):
 
     await interaction.response.send_message(embed=embed)
 
-@bot.tree.command(name="calculate_xp_and_oaths_needed", description="Calculate XP and oaths needed for various goals for a tracked hero")
+@slash_command(name="calculate_xp_and_oaths_needed", description="Calculate XP and oaths needed for various goals for a tracked hero")
+@metrics.instrument
+@readiness.gate
 async def calculate_xp_and_oaths_needed(interaction: discord.Interaction, hero_name: str):
-    await interaction.response.defer()
+    await defer(interaction)
 
     try:
-        # 1. Fetch existing hero data from 'User Hero Data'
-        user_hero_data_range = 'User Hero Data!A2:P'  # Include columns up to P for calculations
-        print(f"1. Fetching existing hero data for {hero_name} from {user_hero_data_range}...")
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=user_hero_data_range).execute()
-        user_data = result.get('values', [])
-        print(f"1. User data fetched: {user_data}")
+        # 1. Look up the user's roster in the 'User Hero Data' index
+        log.debug("1. Looking up existing hero data for %s...", hero_name)
+        await roster.ensure_loaded()
 
         # 2. Find the row to update, matching both user_id and hero_name
         user_id = str(interaction.user.id)
-        row_to_update = next(
-            (i + 2 for i, row in enumerate(user_data) if row and row[0] == user_id and row[1] == hero_name),
-            None
-        )
-        print(f"2. Row to update: {row_to_update}")
-
-        if row_to_update is None:
-            raise ValueError(f"2. Hero '{hero_name}' was not found in your tracking list. Add the hero first using the 'add_hero' command.")
-
-        # 3. Fetch existing hero data (to get current level, relics, and goals)
-        existing_hero_data = next((row for row in user_data if row and row[0] == str(interaction.user.id) and row[1] == hero_name), None)
-
-        # 4. Get current level, relics, next unlock level, and goals from existing data or defaults
-        current_level = int(existing_hero_data[2]) if len(existing_hero_data) > 2 and existing_hero_data[2] else 0
-        current_relics = int(existing_hero_data[3]) if len(existing_hero_data) > 3 and existing_hero_data[3] else 0
-        next_unlock = existing_hero_data[6] if len(existing_hero_data) > 6 and existing_hero_data[6] else None 
-
-        # Handle empty strings as None for goal levels
-        next_goal_level = int(existing_hero_data[4]) if len(existing_hero_data) > 4 and existing_hero_data[4] else None
-        if next_goal_level == 0:  # Treat 0 as not set
-            next_goal_level = None
-
-        ultimate_goal_level = int(existing_hero_data[5]) if len(existing_hero_data) > 5 and existing_hero_data[5] else None
-        if ultimate_goal_level == 0:
-            ultimate_goal_level = None
-
-        # 5. Define XP and oath milestones and costs
-        oath_milestones = [10, 20, 30, 40, 50, 60]
-        oath_costs = [28000, 62000, 250000, 580000, 940000, 1700000]
 
-        xp_milestones = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60]
-        xp_costs = [1800, 2000, 2400, 2600, 2900, 3200, 3600, 4100, 4500, 3600, 4000, 4500, 5000, 5600, 6300, 7000, 7900, 8800, 9900, 14000, 16000, 18000, 20000, 22000, 25000, 28000, 31000, 35000, 39000, 31000, 35000, 39000, 44000, 49000, 55000, 62000, 69000, 78000, 87000, 49000, 55000, 62000, 69000, 78000, 87000, 98000, 110000, 120000, 140000, 85000, 95000, 110000, 120000, 130000, 150000, 170000, 190000, 210000, 240000]
-
-        # 6. Calculate XP and oath requirements
-        def calculate_cost(current_level, target_level, milestones, costs):
-            if current_level >= target_level:
-                return "Current level is higher than the target level"
-            elif target_level == 1:  # Special case for level 1, no oaths needed
-                return 0
-            else:
-                milestones_in_range = [level for level in milestones if current_level < level <= target_level]
-                total_cost = sum(costs[milestones.index(level)] for level in milestones_in_range)
-                return total_cost
-
-        # XP and oaths to next unlock
-        if next_unlock == "Hero Already Maxed":
-            xp_to_next_unlock = "Hero Already Maxed"
-            oaths_to_next_unlock = "Hero Already Maxed"
-        else:
-            xp_to_next_unlock = calculate_cost(current_level, int(next_unlock), xp_milestones, xp_costs)
-            oaths_to_next_unlock = calculate_cost(current_level, int(next_unlock), oath_milestones, oath_costs)
-
-        # XP and oaths to next goal
-        xp_to_next_goal = calculate_cost(current_level, next_goal_level, xp_milestones, xp_costs) if next_goal_level else "No next goal level has been set"
-        oaths_to_next_goal = calculate_cost(current_level, next_goal_level, oath_milestones, oath_costs) if next_goal_level else "No next goal level has been set"
-
-        # XP and oaths to ultimate goal
-        xp_to_ultimate_goal = calculate_cost(current_level, ultimate_goal_level, xp_milestones, xp_costs) if ultimate_goal_level else "No ultimate goal level has been set"
-        oaths_to_ultimate_goal = calculate_cost(current_level, ultimate_goal_level, oath_milestones, oath_costs) if ultimate_goal_level else "No ultimate goal level has been set"
-
-        # 7. Update calculated values in the spreadsheet (columns K to P)
-        range_to_update = f'User Hero Data!K{row_to_update}:P{row_to_update}'
-        values_to_update = [[
-            xp_to_next_unlock, oaths_to_next_unlock, 
-            xp_to_next_goal, oaths_to_next_goal, 
-            xp_to_ultimate_goal, oaths_to_ultimate_goal
-        ]]
-        print(f"7. Updating spreadsheet at range {range_to_update} with values: {values_to_update}")
-        service.spreadsheets().values().update(
-            spreadsheetId=SPREADSHEET_ID,
-            range=range_to_update,
-            valueInputOption='RAW',
-            body={'values': values_to_update}
-        ).execute()
+        async with roster.transaction(user_id) as user_roster:
+            # 3. Fetch existing hero data (to get current level, relics, and goals)
+            existing_hero_data = user_roster.get_entry(hero_name)
+
+            if existing_hero_data is None:
+                raise ValueError(f"2. Hero '{hero_name}' was not found in your tracking list. Add the hero first using the 'add_hero' command.")
+
+            # 4. Get current level, relics, next unlock level, and goals from existing data or defaults
+            current_level = existing_hero_data.current_level or 0
+            current_relics = existing_hero_data.current_relics or 0
+            next_unlock = existing_hero_data.next_unlock
+
+            # Blank and 0 goal levels count as not set
+            next_goal_level = existing_hero_data.next_goal_level or None
+            ultimate_goal_level = existing_hero_data.ultimate_goal_level or None
+
+            # In lazy mode column G is not kept up to date, and a hero whose relics were never calculated has no value
+            # there yet, so the next unlock level is computed from the hero's max level
+            if config.LAZY_DERIVED_COLUMNS or next_unlock is None:
+                await hero_catalog.ensure_fresh()
+                hero = hero_catalog.find_hero(hero_name)
+                if hero is None or hero.max_level is None:
+                    raise ValueError(f"Hero '{hero_name}' was not found in the hero database. (This should not happen, please contact Hela)")
+                next_unlock = next_unlock_level(current_level, hero.max_level)
+
+            # 5. Calculate XP and oath requirements from the shared cost tables
+            (xp_to_next_unlock, oaths_to_next_unlock,
+             xp_to_next_goal, oaths_to_next_goal,
+             xp_to_ultimate_goal, oaths_to_ultimate_goal) = xp_and_oath_requirements(current_level, next_unlock, next_goal_level, ultimate_goal_level)
+
+            # 7. Update calculated values in the spreadsheet (columns K to P), unless they are computed lazily
+            if not config.LAZY_DERIVED_COLUMNS:
+                values_to_update = [
+                    xp_to_next_unlock, oaths_to_next_unlock, 
+                    xp_to_next_goal, oaths_to_next_goal, 
+                    xp_to_ultimate_goal, oaths_to_ultimate_goal
+                ]
+                log.debug("7. Updating spreadsheet columns K to P with values: %s", values_to_update)
+                await user_roster.update(hero_name, 'K', values_to_update)
 
         # 8. Create the embed with hero information
         embed = discord.Embed(title=f"{hero_name} Requirements")
@@ -1018,10 +893,176 @@ async def calculate_xp_and_oaths_needed(interaction: discord.Interaction, hero_n
 
     except ValueError as e:
         await interaction.edit_original_response(content=str(e))
-    except Exception as e:
-        print(f"An error occurred while processing hero information: {e}")
+    except Exception:
+        log.exception("An error occurred while processing hero information")
 
 # Attach the autocomplete function to the calculate_xp_and_oaths_needed command parameter
 calculate_xp_and_oaths_needed.autocomplete("hero_name")(autocomplete_hero_info)
 
-bot.run("MTI3OTgwMTc1MDY1NTg2NDgzMg.GwwLJ7.srhVj6BNTPN_odUdSUdi-ki-jJksKv7vf095K4")
+# Helper to read the inputs for the cost model from a roster entry (blank or 0 goals count as not set)
+def _requirement_inputs(entry, max_level):
+    return entry.current_level or 0, entry.current_relics or 0, max_level, entry.next_goal_level or None, entry.ultimate_goal_level or None
+
+# Background job for lazy mode: recompute the derived columns G to P for everyone and write the changed rows in bulk
+@tasks.loop(seconds=3600)
+async def refresh_derived_columns():
+    # Sharded, every process would compute the same rows; the one holding the Sheets writer lease does it for all of them
+    if sheets_writer is not None and not sheets_writer.is_writer:
+        return
+    try:
+        await hero_catalog.ensure_fresh()
+        await roster.ensure_loaded()
+
+        # The rows are read without any lock, so each row's version is noted and rows written in the meantime are skipped
+        changed_rows = {}
+        versions = {}
+        for user_id, hero_name, entry in roster.entries():
+            hero = hero_catalog.find_hero(hero_name)
+            if hero is None or hero.max_level is None:
+                continue
+            values = tuple(requirements(*_requirement_inputs(entry, hero.max_level)))
+            if values != entry.derived_values():
+                changed_rows[(user_id, hero_name)] = list(values)
+                versions[(user_id, hero_name)] = roster.version(user_id, hero_name)
+
+        skipped = []
+        if changed_rows:
+            skipped = await roster.update_rows('G', changed_rows, expected_versions=versions)
+        log.info("Derived columns refreshed, %d rows changed, %d skipped because they were edited meanwhile", len(changed_rows) - len(skipped), len(skipped))
+    except Exception:
+        log.exception("An error occurred while refreshing the derived columns")
+
+# Periodically removes the blank rows that /remove_hero leaves behind
+@tasks.loop(seconds=6 * 60 * 60)
+async def compact_roster():
+    try:
+        await roster.compact()
+    except Exception:
+        log.exception("An error occurred while compacting the user hero data")
+
+# Periodically picks up rows that were edited directly in the spreadsheet
+@tasks.loop(seconds=300)
+async def sync_roster():
+    try:
+        await roster.sync()
+        await hero_catalog.sync()
+    except Exception:
+        log.exception("An error occurred while syncing the user hero data")
+
+# Sharded mode: pushes this process's roster changes to Sheets and pulls spreadsheet edits, while it holds the writer lease
+@tasks.loop(seconds=2)
+async def run_sheets_writer():
+    try:
+        await sheets_writer.step()
+    except Exception:
+        log.exception("An error occurred in the Sheets writer")
+
+# Periodic one-line-per-command metrics summary in the log, alongside (or instead of) the /metrics endpoint
+@tasks.loop(seconds=900)
+async def log_metrics_summary():
+    metrics.log_summary()
+
+# Requirements fields (relics, XP, oaths) shown for each goal in /plan_all
+PLAN_GOALS = {
+    "next_unlock": ("Next Unlock", "relics_to_next_unlock", "xp_to_next_unlock", "oaths_to_next_unlock"),
+    "next_goal": ("Next Goal", "relics_to_next_goal", "xp_to_next_goal", "oaths_to_next_goal"),
+    "ultimate_goal": ("Ultimate Goal", "relics_to_ultimate_goal", "xp_to_ultimate_goal", "oaths_to_ultimate_goal"),
+}
+
+# Heroes per /plan_all page, which keeps a page's table inside Discord's 1024 character field limit
+PLAN_ALL_PAGE_SIZE = 15
+
+# Helper to shorten a requirement value for the /plan_all table
+def _plan_cell(value):
+    if isinstance(value, int):
+        return f"{value:,}"
+    if value == HERO_MAXED:
+        return "max"
+    if value.startswith("You already have enough"):
+        return "0"
+    return "-" # No goal set, or the goal is below the current level
+
+@slash_command(name="plan_all", description="Calculate relics, XP and oaths needed for all of your tracked heroes at once")
+@discord.app_commands.describe(goal="Which goal the per-hero table shows (totals are shown for every goal)")
+@discord.app_commands.choices(goal=[
+    discord.app_commands.Choice(name="Next unlock", value="next_unlock"),
+    discord.app_commands.Choice(name="Next goal", value="next_goal"),
+    discord.app_commands.Choice(name="Ultimate goal", value="ultimate_goal"),
+])
+@metrics.instrument
+@readiness.gate
+async def plan_all(interaction: discord.Interaction, goal: str = "ultimate_goal"):
+    await defer(interaction)
+
+    user_id = str(interaction.user.id)
+
+    try:
+        # 1. Load the user's whole roster and the hero catalog once
+        await roster.ensure_loaded()
+        await hero_catalog.ensure_fresh()
+        async with roster.transaction(user_id) as user_roster:
+            user_heroes_data = user_roster.get_roster()
+
+            if not user_heroes_data:
+                await interaction.followup.send("You haven't added any heroes yet!")
+                return
+
+            # 2. Collect every hero's inputs, skipping heroes that are no longer in the hero database
+            hero_names = []
+            hero_inputs = []
+            missing_heroes = []
+            for entry in user_heroes_data:
+                hero = hero_catalog.find_hero(entry.hero_name)
+                if hero is None or hero.max_level is None:
+                    missing_heroes.append(entry.hero_name)
+                    continue
+
+                hero_names.append(entry.hero_name)
+                hero_inputs.append(_requirement_inputs(entry, hero.max_level))
+
+            # 3. Compute the requirements of the whole roster in one pass
+            results = roster_requirements(hero_inputs)
+
+            # 4. Write all derived values (columns G to P) back in a single batch, unless they are computed lazily
+            if not config.LAZY_DERIVED_COLUMNS:
+                await user_roster.update_many('G', {name: list(result) for name, result in zip(hero_names, results)})
+
+        # 5. Totals for every goal
+        totals = []
+        for label, relics_field, xp_field, oaths_field in PLAN_GOALS.values():
+            relics, xp, oaths = (
+                sum(value for value in (getattr(result, field) for result in results) if isinstance(value, int))
+                for field in (relics_field, xp_field, oaths_field)
+            )
+            totals.append(f"**{label}:** {relics:,} relics, {xp:,} XP, {oaths:,} oaths")
+
+        # 6. Per-hero table for the selected goal, paged so that no message gets near Discord's 6000 character limit
+        label, relics_field, xp_field, oaths_field = PLAN_GOALS[goal]
+        table_lines = [
+            f"{name[:16]:<16} {current_level:>3} {_plan_cell(getattr(result, relics_field)):>9} "
+            f"{_plan_cell(getattr(result, xp_field)):>10} {_plan_cell(getattr(result, oaths_field)):>10}"
+            for name, (current_level, *_), result in zip(hero_names, hero_inputs, results)
+        ]
+        footer = f"Not in the hero database: {', '.join(missing_heroes)}" if missing_heroes else None
+
+        def render_page(page_lines, page_index, page_count):
+            title = f"{interaction.user.name}'s Roster Plan"
+            if page_count > 1:
+                title += f" (Page {page_index + 1}/{page_count})"
+            embed = discord.Embed(title=title, description="\n".join(totals))
+            table = "\n".join([f"{'Hero':<16} {'Lvl':>3} {'Relics':>9} {'XP':>10} {'Oaths':>10}"] + page_lines)
+            embed.add_field(name=f"Needed for {label}", value=f"```\n{table}\n```", inline=False)
+            if footer:
+                embed.set_footer(text=footer if len(footer) <= 2048 else footer[:2045] + "...")
+            return embed
+
+        if not table_lines:
+            await interaction.followup.send(embed=render_page([], 0, 1))
+            return
+        view = PaginatedView(table_lines, render_page, per_page=PLAN_ALL_PAGE_SIZE, owner_id=interaction.user.id)
+        await view.send(interaction)
+
+    except Exception:
+        log.exception("An error occurred while planning the roster")
+        await interaction.followup.send("An error occurred while planning your roster. Please try again later.")
+
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+
+from hero_search import HeroNameIndex
+from metrics import current_command
+from records import HeroRecord
+from sheet_schema import SheetSchema
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL = 6 * 60 * 60  # The hero catalog only changes with game patches, so a few hours is plenty
+
+RARITY_ORDER = ["Common", "Fine", "Exquisite", "Epic"]
+RARITY_EMOJIS = {'Epic': '🟠', 'Exquisite': '🟣', 'Fine': '🔵', 'Common': '🟢'}
+HERO_LIST_PAGE_SIZE = 50  # Heroes per /hero_list page, comfortably inside Discord's 4096 character embed description
+MASTER_FIELDS = ("name", "rarity")  # The only Master Tab columns the bot reads
+HERO_DATA_COLUMNS = ("name", None, "max_level")  # Default 'Hero Data General' layout, before the header row is read
+
+
+def build_hero_list(master_rows):
+    """Numbers the Master Tab heroes in rarity order for /hero_list.
+
+    Returns (numbered_heroes, entries): numbered_heroes[i] is the hero shown
+    as number i + 1, and entries holds the matching (number, name, rarity)
+    tuples.
+    """
+    heroes_by_rarity = {}
+    for row in master_rows:
+        name, rarity = row[0], row[4]
+        heroes_by_rarity.setdefault(rarity, []).append(name)
+
+    numbered_heroes = []
+    entries = []
+    for rarity in RARITY_ORDER:
+        for name in heroes_by_rarity.get(rarity, []):
+            numbered_heroes.append(name)
+            entries.append((len(numbered_heroes), name, rarity))
+    return numbered_heroes, entries
+
+
+def hero_list_text(entries):
+    # Renders (number, name, rarity) entries as /hero_list lines, with a heading wherever the rarity changes
+    lines = []
+    current_rarity = None
+    for number, name, rarity in entries:
+        if rarity != current_rarity:
+            if lines:
+                lines.append("")
+            lines.append(f"**{rarity} Heroes**")
+            current_rarity = rarity
+        lines.append(f"{RARITY_EMOJIS[rarity]} {number}. {name}")
+    return "\n".join(lines)
+
+
+class HeroCatalog:
+    """Process-wide, in-memory copy of the static hero data.
+
+    Holds the 'Master Tab' rows and the 'Hero Data General' header and heroes
+    (as HeroRecord objects) so commands can read them without a storage
+    round-trip. The data is
+    reloaded once it is older than `ttl` seconds, or on demand via `load()`.
+    """
+
+    def __init__(self, storage, ttl=DEFAULT_TTL):
+        self._storage = storage
+        self.ttl = ttl
+
+        self.master_rows = []
+        self.headers = []
+        self.heroes = []  # HeroRecord for every 'Hero Data General' row
+        self.hero_names = []
+        self._heroes_by_name = {}
+        self.name_index = HeroNameIndex([])
+        self.numbered_heroes = []  # Hero names in /hero_list order, number n is numbered_heroes[n - 1]
+        self.hero_list_entries = []  # (number, name, rarity) for every /hero_list line
+        self._rarities = {}  # Hero name -> Master Tab rarity
+        self.version = 0  # Bumped on every successful load so derived caches know when to rebuild
+        self.loaded_at = None
+        self._revision = None  # Storage revision of the loaded data, for backends that report one
+
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def is_stale(self):
+        return not self.loaded or time.monotonic() - self.loaded_at > self.ttl
+
+    async def load(self):
+        async with self._lock:
+            await self._load()
+
+    async def _load(self):
+        log.debug("Loading hero catalog...")
+        revision = await self._storage.catalog_revision()
+        master_values, hero_values = await self._storage.load_catalog(MASTER_FIELDS)
+
+        # The Master Tab list ends at the first empty row
+        master_rows = []
+        for row in master_values:
+            if not row:
+                break
+            master_rows.append(row)
+
+        self.master_rows = master_rows
+        self.numbered_heroes, self.hero_list_entries = build_hero_list(master_rows)
+        self._rarities = {row[0]: row[4] for row in master_rows if len(row) > 4}
+        self.headers = hero_values[0] if hero_values else []
+        schema = SheetSchema('Hero Data General', HERO_DATA_COLUMNS)
+        schema.resolve(self.headers)
+        self.heroes = [HeroRecord(row, schema) for row in hero_values[1:] if row]
+        self.hero_names = [hero.name for hero in self.heroes]
+        self._heroes_by_name = {}
+        for hero in self.heroes:
+            self._heroes_by_name.setdefault(hero.name, hero)  # The first row wins, like the old linear scans
+        self.name_index = HeroNameIndex(self.hero_names)
+        self.version += 1
+        self.loaded_at = time.monotonic()
+        self._revision = revision
+        log.info("Hero catalog loaded: %d master rows, %d hero rows (version %d)", len(self.master_rows), len(self.heroes), self.version)
+
+        invalid = [hero.name for hero in self.heroes if hero.max_level is None]
+        if invalid:
+            log.warning("No valid max level in 'Hero Data General' for %d heroes, they can't be planned: %s", len(invalid), ', '.join(invalid))
+
+    async def ensure_fresh(self):
+        # First use has to wait for the data; after that stale data is served while a reload runs in the background
+        if not self.loaded:
+            async with self._lock:
+                if not self.loaded:  # Callers that queued behind the first load use its result instead of loading again
+                    await self._load()
+        elif self.is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def sync(self):
+        # Reloads as soon as the stored catalog changes, for backends that report a catalog revision; the TTL covers the rest
+        if not self.loaded:
+            return
+        revision = await self._storage.catalog_revision()
+        if revision is not None and revision != self._revision:
+            await self.load()
+
+    async def _background_refresh(self):
+        current_command.set("background")
+        try:
+            await self.load()
+        except Exception:
+            log.exception("An error occurred while refreshing the hero catalog, keeping the previous data")
+
+    def find_hero(self, hero_name):
+        return self._heroes_by_name.get(hero_name)
+
+    def rarity_of(self, hero_name):
+        return self._rarities.get(hero_name)
+
+    def resolve_hero(self, hero_number_or_name):
+        # A number is the hero's position in /hero_list, anything else is an exact hero name
+        if hero_number_or_name.isdigit():
+            hero_number = int(hero_number_or_name)
+            if not 1 <= hero_number <= len(self.numbered_heroes):
+                return None
+            hero_number_or_name = self.numbered_heroes[hero_number - 1]
+        return self._heroes_by_name.get(hero_number_or_name)
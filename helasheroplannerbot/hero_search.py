@@ -0,0 +1,84 @@
+import difflib
+from bisect import bisect_left
+
+MAX_SUGGESTIONS = 25  # Discord's autocomplete limit
+FUZZY_CUTOFF = 0.6
+
+
+class HeroNameIndex:
+    """Precomputed search index over hero names for autocomplete.
+
+    Built once per hero catalog load. Lookups never touch the network and rank
+    results as: exact match, name prefix, word prefix, substring, then fuzzy
+    matches for typos.
+    """
+
+    def __init__(self, names):
+        self._names = list(dict.fromkeys(names))  # Drop duplicates, keep sheet order
+        self._lower = [name.lower() for name in self._names]
+        self._ids_by_lower = {}
+        for i, lower in enumerate(self._lower):
+            self._ids_by_lower.setdefault(lower, i)
+
+        # Sorted (lowercased name, id) pairs for prefix lookups with bisect
+        self._sorted = sorted((lower, i) for i, lower in enumerate(self._lower))
+
+        # Sorted (name suffix starting at a word, id) pairs so "drag" also finds "Red Dragon"
+        words = []
+        for i, lower in enumerate(self._lower):
+            for pos in range(1, len(lower)):
+                if lower[pos - 1] == " " and lower[pos] != " ":
+                    words.append((lower[pos:], i))
+        self._words = sorted(words)
+
+        # Trigram -> ids of names containing it, for substring lookups
+        self._trigrams = {}
+        for i, lower in enumerate(self._lower):
+            for pos in range(len(lower) - 2):
+                self._trigrams.setdefault(lower[pos:pos + 3], set()).add(i)
+
+    def __len__(self):
+        return len(self._names)
+
+    @staticmethod
+    def _prefix_ids(entries, prefix):
+        start = bisect_left(entries, (prefix,))
+        for key, i in entries[start:]:
+            if not key.startswith(prefix):
+                break
+            yield i
+
+    def _substring_ids(self, query):
+        if len(query) < 3:
+            candidates = range(len(self._lower))
+        else:
+            grams = [self._trigrams.get(query[pos:pos + 3], set()) for pos in range(len(query) - 2)]
+            candidates = set.intersection(*grams)
+        matches = [(self._lower[i].find(query), self._lower[i], i) for i in candidates if query in self._lower[i]]
+        return [i for _, _, i in sorted(matches)]
+
+    def search(self, query, limit=MAX_SUGGESTIONS, fuzzy=True):
+        query = query.strip().lower()
+        if not query:
+            return [self._names[i] for _, i in self._sorted[:limit]]
+
+        ranked = []
+        seen = set()
+
+        def take(ids):
+            for i in ids:
+                if len(ranked) >= limit:
+                    return
+                if i not in seen:
+                    seen.add(i)
+                    ranked.append(i)
+
+        take(self._prefix_ids(self._sorted, query))  # The exact match sorts first among the prefix matches
+        take(self._prefix_ids(self._words, query))
+        take(self._substring_ids(query))
+
+        if fuzzy and len(ranked) < limit:
+            close = difflib.get_close_matches(query, self._lower, n=limit, cutoff=FUZZY_CUTOFF)
+            take(self._ids_by_lower[lower] for lower in close)
+
+        return [self._names[i] for i in ranked]
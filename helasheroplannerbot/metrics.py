@@ -0,0 +1,187 @@
+import bisect
+import contextvars
+import functools
+import logging
+import time
+from collections import Counter, defaultdict
+
+log = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets, the last bucket is +Inf
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Name of the slash command the current task is serving; Sheets calls made outside a command count as "background"
+current_command = contextvars.ContextVar("current_command", default="background")
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus semantics (cumulative `le` buckets, sum and count)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation; good enough for a log summary
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Process-wide counters for the bot: command latency, Sheets traffic, cache hit rates and timeouts.
+
+    Everything is plain in-memory bookkeeping on the event loop thread. The
+    numbers are exposed as Prometheus text by `render()` (served by
+    `start_server()`) and as a compact log line per command by `log_summary()`.
+    """
+
+    def __init__(self):
+        self.command_latency = defaultdict(Histogram)  # command -> seconds from invocation to return
+        self.command_errors = Counter()  # command -> unhandled exceptions
+        self.timeouts = Counter()  # command -> commands or Sheets calls that hit their timeout
+        self.sheets_calls = Counter()  # (command, API method, outcome) -> calls
+        self.sheets_bytes = Counter()  # command -> response bytes received from Google
+        self.coalesced_reads = Counter()  # command -> reads served by joining an identical read already in flight
+        self._caches = {}  # name -> object with `hits` and `misses`
+        self._gauges = {}  # metric name -> (help text, function returning the current value)
+        self.server = None  # aiohttp runner of the /metrics endpoint, once started
+
+    def register_cache(self, name, cache):
+        self._caches[name] = cache
+
+    def register_gauge(self, name, help_text, read):
+        self._gauges[name] = (help_text, read)
+
+    def instrument(self, func):
+        """Decorator for slash command callbacks: times the command and attributes its Sheets calls to it."""
+        @functools.wraps(func)
+        async def wrapper(interaction, *args, **kwargs):
+            name = interaction.command.qualified_name if interaction.command else func.__name__
+            token = current_command.set(name)
+            started = time.perf_counter()
+            try:
+                return await func(interaction, *args, **kwargs)
+            except Exception:
+                self.command_errors[name] += 1
+                raise
+            finally:
+                self.command_latency[name].observe(time.perf_counter() - started)
+                current_command.reset(token)
+        return wrapper
+
+    def record_timeout(self, command=None):
+        self.timeouts[command or current_command.get()] += 1
+
+    def record_sheets_call(self, method, bytes_received=0, outcome="ok"):
+        command = current_command.get()
+        self.sheets_calls[(command, method, outcome)] += 1
+        self.sheets_bytes[command] += bytes_received
+        if outcome == "timeout":
+            self.timeouts[command] += 1
+
+    def record_coalesced_read(self):
+        self.coalesced_reads[current_command.get()] += 1
+
+    def _calls_by_command(self):
+        calls = Counter()
+        for (command, _, _), count in self.sheets_calls.items():
+            calls[command] += count
+        return calls
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP hela_command_latency_seconds Time from slash command invocation to completion.",
+            "# TYPE hela_command_latency_seconds histogram",
+        ]
+        for command, histogram in sorted(self.command_latency.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'hela_command_latency_seconds_bucket{{command="{command}",le="{le}"}} {cumulative}')
+            lines.append(f'hela_command_latency_seconds_sum{{command="{command}"}} {histogram.sum:.6f}')
+            lines.append(f'hela_command_latency_seconds_count{{command="{command}"}} {histogram.count}')
+
+        lines += ["# HELP hela_command_errors_total Slash commands that raised an unhandled exception.", "# TYPE hela_command_errors_total counter"]
+        lines += [f'hela_command_errors_total{{command="{command}"}} {count}' for command, count in sorted(self.command_errors.items())]
+
+        lines += ["# HELP hela_timeouts_total Commands and Sheets calls that hit their timeout.", "# TYPE hela_timeouts_total counter"]
+        lines += [f'hela_timeouts_total{{command="{command}"}} {count}' for command, count in sorted(self.timeouts.items())]
+
+        lines += ["# HELP hela_sheets_calls_total Google Sheets API calls by command, method and outcome.", "# TYPE hela_sheets_calls_total counter"]
+        lines += [
+            f'hela_sheets_calls_total{{command="{command}",method="{method}",outcome="{outcome}"}} {count}'
+            for (command, method, outcome), count in sorted(self.sheets_calls.items())
+        ]
+
+        lines += ["# HELP hela_sheets_response_bytes_total Bytes received from the Google Sheets API by command.", "# TYPE hela_sheets_response_bytes_total counter"]
+        lines += [f'hela_sheets_response_bytes_total{{command="{command}"}} {count}' for command, count in sorted(self.sheets_bytes.items())]
+
+        lines += ["# HELP hela_sheets_coalesced_reads_total Sheets reads that shared an identical read already in flight.", "# TYPE hela_sheets_coalesced_reads_total counter"]
+        lines += [f'hela_sheets_coalesced_reads_total{{command="{command}"}} {count}' for command, count in sorted(self.coalesced_reads.items())]
+
+        lines += ["# HELP hela_cache_lookups_total Cache lookups by cache and result.", "# TYPE hela_cache_lookups_total counter"]
+        for name, cache in sorted(self._caches.items()):
+            lines.append(f'hela_cache_lookups_total{{cache="{name}",result="hit"}} {cache.hits}')
+            lines.append(f'hela_cache_lookups_total{{cache="{name}",result="miss"}} {cache.misses}')
+        for name, (help_text, read) in sorted(self._gauges.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {read()}"]
+        return "\n".join(lines) + "\n"
+
+    def log_summary(self):
+        calls = self._calls_by_command()
+        for command, histogram in sorted(self.command_latency.items()):
+            log.info(
+                "command=%s count=%d p50=%.2fs p95=%.2fs p99=%.2fs errors=%d timeouts=%d sheets_calls=%d sheets_bytes=%d coalesced_reads=%d",
+                command, histogram.count, histogram.quantile(0.5), histogram.quantile(0.95), histogram.quantile(0.99),
+                self.command_errors[command], self.timeouts[command], calls[command], self.sheets_bytes[command], self.coalesced_reads[command],
+            )
+        if calls["background"]:
+            log.info("command=background sheets_calls=%d sheets_bytes=%d timeouts=%d", calls["background"], self.sheets_bytes["background"], self.timeouts["background"])
+        for name, cache in sorted(self._caches.items()):
+            lookups = cache.hits + cache.misses
+            log.info("cache=%s hits=%d misses=%d hit_rate=%.1f%%", name, cache.hits, cache.misses, 100 * cache.hits / lookups if lookups else 0.0)
+
+    async def start_server(self, host, port, readiness=None):
+        # aiohttp ships with discord.py, so the endpoint needs no extra dependency
+        from aiohttp import web
+
+        async def handle_metrics(request):
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+        async def handle_ready(request):
+            # 200 once warm-up has finished, 503 before that (or if it failed), for deploy health checks
+            return web.Response(text=readiness.state, status=200 if readiness.ready else 503)
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        if readiness is not None:
+            app.router.add_get("/ready", handle_ready)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        self.server = runner
+        log.info("Serving metrics on http://%s:%d/metrics", host, port)
+
+    async def stop_server(self):
+        if self.server is not None:
+            await self.server.cleanup()
+            self.server = None
+
+
+metrics = Metrics()
@@ -0,0 +1,55 @@
+"""One-shot copy of the hero catalog and user hero data between storage backends.
+
+Usage:
+    python migrate_storage.py sheets sqlite   # import the spreadsheets into the SQLite database
+    python migrate_storage.py sqlite sheets   # export the SQLite database back to the spreadsheets
+
+The target's existing catalog and roster data are replaced.
+"""
+import argparse
+import asyncio
+import types
+
+import config
+from storage import create_storage_backend
+
+BACKENDS = ("sheets", "sqlite")
+
+
+def _backend_for(name):
+    settings = {key: value for key, value in vars(config).items() if key.isupper()}
+    settings["STORAGE_BACKEND"] = name
+    return create_storage_backend(types.SimpleNamespace(**settings))
+
+
+async def migrate(source_name, target_name):
+    source = _backend_for(source_name)
+    target = _backend_for(target_name)
+    try:
+        master_values, hero_values = await source.load_catalog()
+        roster_rows = [row for _, row in await source.load_roster()]
+        print(f"Read {len(master_values)} Master Tab rows, {max(len(hero_values) - 1, 0)} heroes and {len(roster_rows)} roster rows from {source_name}")
+
+        await target.replace_catalog(master_values, hero_values)
+        await target.replace_roster(roster_rows)
+        await target.flush()
+        print(f"Wrote the hero catalog and user hero data to {target_name}")
+    finally:
+        source.close()
+        target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the hero catalog and user hero data between storage backends")
+    parser.add_argument("source", choices=BACKENDS)
+    parser.add_argument("target", choices=BACKENDS)
+    args = parser.parse_args()
+
+    if args.source == args.target:
+        parser.error("source and target must be different backends")
+
+    asyncio.run(migrate(args.source, args.target))
+
+
+if __name__ == "__main__":
+    main()
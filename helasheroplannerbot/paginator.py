@@ -0,0 +1,136 @@
+import discord
+
+ALL = "All"
+DEFAULT_TIMEOUT = 180
+
+
+class PaginatedView(discord.ui.View):
+    """Previous/Next/Go to page controls, plus optional filter menus, for a list shown one page per message edit.
+
+    Pages are rendered on demand by `render_page(entries, page_index,
+    page_count)` and kept for the view's lifetime, so flipping back to a page
+    reuses the embed and the same view is edited in place. `filters` maps a
+    menu name to {option label: predicate(entry)}. Pass `page_cache` to share
+    rendered pages between views of the same data. When the view times out
+    its controls are removed and its entries and pages are released.
+    """
+
+    def __init__(self, entries, render_page, per_page=10, filters=None, owner_id=None, page_cache=None, timeout=DEFAULT_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self._entries = entries
+        self._visible = entries
+        self._render_page = render_page
+        self._per_page = per_page
+        self._filters = filters or {}
+        self._selected = {name: ALL for name in self._filters}
+        self._owner_id = owner_id
+        self._pages = {} if page_cache is None else page_cache
+        self.page = 0
+        self.message = None
+
+        for row, (name, options) in enumerate(self._filters.items(), start=1):
+            self.add_item(_FilterSelect(name, list(options), row))
+        self._update_buttons()
+
+    @property
+    def page_count(self):
+        return max(1, -(-len(self._visible) // self._per_page))
+
+    def current_embed(self):
+        key = (tuple(self._selected.values()), self.page)
+        embed = self._pages.get(key)
+        if embed is None:
+            start = self.page * self._per_page
+            embed = self._render_page(self._visible[start:start + self._per_page], self.page, self.page_count)
+            if not self._visible:
+                embed.description = "Nothing matches the selected filters."
+            active = [value for value in self._selected.values() if value != ALL]
+            if active:
+                embed.set_footer(text=f"Filtered by {', '.join(active)}")
+            self._pages[key] = embed
+        return embed
+
+    async def send(self, interaction):
+        # Sends the first page as a followup; a single page with nothing to filter needs no controls
+        if self.page_count == 1 and not self._filters:
+            self.stop()
+            await interaction.followup.send(embed=self.current_embed())
+            return
+        self.message = await interaction.followup.send(embed=self.current_embed(), view=self, wait=True)
+
+    async def interaction_check(self, interaction):
+        if self._owner_id is not None and interaction.user.id != self._owner_id:
+            await interaction.response.send_message("Only the person who ran this command can use these buttons.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.blurple, row=0)
+    async def previous_button(self, interaction, button):
+        await self.show_page(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.blurple, row=0)
+    async def next_button(self, interaction, button):
+        await self.show_page(interaction, self.page + 1)
+
+    @discord.ui.button(label="Go to page", style=discord.ButtonStyle.grey, row=0)
+    async def jump_button(self, interaction, button):
+        await interaction.response.send_modal(_JumpModal(self))
+
+    async def show_page(self, interaction, page):
+        self.page = min(max(page, 0), self.page_count - 1)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.current_embed(), view=self)
+
+    async def set_filter(self, interaction, name, value):
+        self._selected[name] = value
+        self._visible = [
+            entry for entry in self._entries
+            if all(selected == ALL or self._filters[filter_name][selected](entry) for filter_name, selected in self._selected.items())
+        ]
+        await self.show_page(interaction, 0)
+
+    def _update_buttons(self):
+        self.previous_button.disabled = self.page == 0
+        self.next_button.disabled = self.page >= self.page_count - 1
+        self.jump_button.disabled = self.page_count == 1
+
+    async def on_timeout(self):
+        # Remove the dead controls, then drop every reference so the entries and rendered pages can be freed
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+        self.message = None
+        self._entries = self._visible = []
+        self._pages = {}
+
+
+class _FilterSelect(discord.ui.Select):
+    def __init__(self, name, option_labels, row):
+        options = [discord.SelectOption(label=f"{name}: {label}", value=label, default=label == ALL) for label in [ALL] + option_labels]
+        super().__init__(placeholder=name, options=options, row=row)
+        self._name = name
+
+    async def callback(self, interaction):
+        value = self.values[0]
+        for option in self.options:
+            option.default = option.value == value
+        await self.view.set_filter(interaction, self._name, value)
+
+
+class _JumpModal(discord.ui.Modal, title="Go to page"):
+    page_number = discord.ui.TextInput(label="Page number", max_length=6)
+
+    def __init__(self, paginator):
+        super().__init__()
+        self.paginator = paginator
+        self.page_number.placeholder = f"1-{paginator.page_count}"
+
+    async def on_submit(self, interaction):
+        try:
+            page = int(self.page_number.value)
+        except ValueError:
+            await interaction.response.send_message(f"'{self.page_number.value}' is not a page number.", ephemeral=True)
+            return
+        await self.paginator.show_page(interaction, page - 1)
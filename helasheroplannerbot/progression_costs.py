@@ -0,0 +1,161 @@
+from collections import namedtuple
+
+MAX_TABLE_LEVEL = 60  # Highest level any hero can reach
+
+# Relics are paid once per unlock milestone
+RELIC_MILESTONES = [1, 10, 20, 30, 40, 50, 60]
+RELIC_COSTS = [500, 6100, 13000, 54000, 80000, 100000, 120000]
+
+OATH_MILESTONES = [10, 20, 30, 40, 50, 60]
+OATH_COSTS = [28000, 62000, 250000, 580000, 940000, 1700000]
+
+XP_MILESTONES = list(range(2, 61))
+XP_COSTS = [1800, 2000, 2400, 2600, 2900, 3200, 3600, 4100, 4500, 3600, 4000, 4500, 5000, 5600, 6300, 7000, 7900, 8800, 9900, 14000, 16000, 18000, 20000, 22000, 25000, 28000, 31000, 35000, 39000, 31000, 35000, 39000, 44000, 49000, 55000, 62000, 69000, 78000, 87000, 49000, 55000, 62000, 69000, 78000, 87000, 98000, 110000, 120000, 140000, 85000, 95000, 110000, 120000, 130000, 150000, 170000, 190000, 210000, 240000]
+
+HERO_MAXED = "Hero Already Maxed"
+NO_NEXT_GOAL = "No next goal level has been set"
+NO_ULTIMATE_GOAL = "No ultimate goal level has been set"
+TARGET_BELOW_CURRENT = "Current level is higher than the target level"
+
+# Values for columns G to P of 'User Hero Data', in column order
+Requirements = namedtuple("Requirements", [
+    "next_unlock",
+    "relics_to_next_unlock",
+    "relics_to_next_goal",
+    "relics_to_ultimate_goal",
+    "xp_to_next_unlock",
+    "oaths_to_next_unlock",
+    "xp_to_next_goal",
+    "oaths_to_next_goal",
+    "xp_to_ultimate_goal",
+    "oaths_to_ultimate_goal",
+])
+
+
+def _cumulative(milestones, costs):
+    # table[level] is the total cost of every milestone up to and including `level`
+    cost_at = dict(zip(milestones, costs))
+    table = [0] * (MAX_TABLE_LEVEL + 1)
+    for level in range(1, MAX_TABLE_LEVEL + 1):
+        table[level] = table[level - 1] + cost_at.get(level, 0)
+    return table
+
+
+def _next_milestones(milestones):
+    # table[level] is the first milestone above `level`, or None past the last one
+    table = [None] * (MAX_TABLE_LEVEL + 1)
+    upcoming = None
+    for level in range(MAX_TABLE_LEVEL, -1, -1):
+        table[level] = upcoming
+        if level in milestones:
+            upcoming = level
+    return table
+
+
+RELIC_TABLE = _cumulative(RELIC_MILESTONES, RELIC_COSTS)
+XP_TABLE = _cumulative(XP_MILESTONES, XP_COSTS)
+OATH_TABLE = _cumulative(OATH_MILESTONES, OATH_COSTS)
+
+_RELIC_COST_AT = dict(zip(RELIC_MILESTONES, RELIC_COSTS))
+_NEXT_RELIC_MILESTONE = _next_milestones(set(RELIC_MILESTONES))
+
+
+def _clamp(level):
+    return min(max(level, 0), MAX_TABLE_LEVEL)
+
+
+def cost_between(table, from_level, to_level):
+    """Total cost of the milestones in (from_level, to_level] from a cumulative table."""
+    if to_level <= from_level:
+        return 0
+    return table[_clamp(to_level)] - table[_clamp(from_level)]
+
+
+def next_unlock_level(current_level, max_level):
+    """The next relic milestone above current_level that the hero can reach, or HERO_MAXED."""
+    upcoming = _NEXT_RELIC_MILESTONE[_clamp(current_level)] if current_level < MAX_TABLE_LEVEL else None
+    if upcoming is None or upcoming > max_level:
+        return HERO_MAXED
+    return upcoming
+
+
+def _relics_to_goal(current_level, current_relics, goal_level, unset_message, goal_name):
+    if goal_level is None:
+        return unset_message
+    if current_level >= goal_level:
+        return f"Current level is higher than {goal_name} level, please adjust using /manage_hero"
+    needed = cost_between(RELIC_TABLE, current_level, goal_level) - current_relics
+    if needed < 0:
+        return f"You already have enough relics for the {goal_name} level"
+    return needed
+
+
+def relic_requirements(current_level, current_relics, max_level, next_goal_level, ultimate_goal_level):
+    """Returns (next_unlock, relics_to_next_unlock, relics_to_next_goal, relics_to_ultimate_goal)."""
+    next_unlock = next_unlock_level(current_level, max_level)
+    if next_unlock == HERO_MAXED:
+        relics_to_next_unlock = HERO_MAXED
+    else:
+        relics_to_next_unlock = _RELIC_COST_AT[next_unlock] - current_relics
+        if relics_to_next_unlock < 0:
+            relics_to_next_unlock = "You already have enough relics for the next unlock level"
+
+    relics_to_next_goal = _relics_to_goal(current_level, current_relics, next_goal_level, NO_NEXT_GOAL, "next goal")
+    relics_to_ultimate_goal = _relics_to_goal(current_level, current_relics, ultimate_goal_level, NO_ULTIMATE_GOAL, "ultimate goal")
+    return next_unlock, relics_to_next_unlock, relics_to_next_goal, relics_to_ultimate_goal
+
+
+def _level_cost(table, current_level, target_level):
+    if current_level >= target_level:
+        return TARGET_BELOW_CURRENT
+    if target_level == 1:  # Special case for level 1, no oaths needed
+        return 0
+    return cost_between(table, current_level, target_level)
+
+
+def xp_and_oath_requirements(current_level, next_unlock, next_goal_level, ultimate_goal_level):
+    """Returns the XP and oaths needed for the next unlock, next goal and ultimate goal, in that order."""
+    if next_unlock == HERO_MAXED:
+        xp_to_next_unlock = oaths_to_next_unlock = HERO_MAXED
+    else:
+        xp_to_next_unlock = _level_cost(XP_TABLE, current_level, int(next_unlock))
+        oaths_to_next_unlock = _level_cost(OATH_TABLE, current_level, int(next_unlock))
+
+    if next_goal_level:
+        xp_to_next_goal = _level_cost(XP_TABLE, current_level, next_goal_level)
+        oaths_to_next_goal = _level_cost(OATH_TABLE, current_level, next_goal_level)
+    else:
+        xp_to_next_goal = oaths_to_next_goal = NO_NEXT_GOAL
+
+    if ultimate_goal_level:
+        xp_to_ultimate_goal = _level_cost(XP_TABLE, current_level, ultimate_goal_level)
+        oaths_to_ultimate_goal = _level_cost(OATH_TABLE, current_level, ultimate_goal_level)
+    else:
+        xp_to_ultimate_goal = oaths_to_ultimate_goal = NO_ULTIMATE_GOAL
+
+    return xp_to_next_unlock, oaths_to_next_unlock, xp_to_next_goal, oaths_to_next_goal, xp_to_ultimate_goal, oaths_to_ultimate_goal
+
+
+def requirements(current_level, current_relics, max_level, next_goal_level, ultimate_goal_level):
+    """All derived values (columns G to P) for one hero."""
+    relics = relic_requirements(current_level, current_relics, max_level, next_goal_level, ultimate_goal_level)
+    xp_and_oaths = xp_and_oath_requirements(current_level, relics[0], next_goal_level, ultimate_goal_level)
+    return Requirements(*relics, *xp_and_oaths)
+
+
+def roster_requirements(heroes):
+    """Batch entry point: derived values for a whole roster in one pass.
+
+    `heroes` is an iterable of (current_level, current_relics, max_level,
+    next_goal_level, ultimate_goal_level) tuples; the result is a list of
+    Requirements in the same order. Heroes with the same inputs (common for
+    untouched and maxed heroes) share one computed, immutable result.
+    """
+    computed = {}
+    results = []
+    for hero in heroes:
+        result = computed.get(hero)
+        if result is None:
+            result = computed[hero] = requirements(*hero)
+        results.append(result)
+    return results
@@ -0,0 +1,86 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+# Lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+DEFAULT_BURST = 5  # Calls let through at once after an idle period
+
+
+class TokenBucket:
+    """Async token bucket that refills at a fixed rate and serves waiters by priority.
+
+    `acquire()` returns immediately while tokens are left; otherwise callers
+    queue up and are released one token at a time as the bucket refills,
+    interactive callers ahead of background ones and first come, first served
+    within a priority.
+
+    A full bucket holds `burst` tokens and then refills at `per_minute -
+    burst + 1` tokens a minute, so no 60 second window ever sees more than
+    `per_minute` calls, not even one starting right after an idle period.
+    `per_minute` <= 0 means unlimited.
+    """
+
+    def __init__(self, per_minute, burst=DEFAULT_BURST):
+        self.unlimited = per_minute <= 0
+        self.capacity = max(1, min(burst, per_minute))
+        self.rate = (per_minute - self.capacity + 1) / 60
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._waiters = []  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+        self._wakeup = None
+
+    @property
+    def waiting(self):
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority=INTERACTIVE):
+        if self.unlimited:
+            return
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A token handed over just before the cancellation goes back to the bucket
+            if future.done() and not future.cancelled():
+                self._tokens += 1
+                self._release()
+            raise
+
+    def _schedule(self):
+        if self._wakeup is None:
+            delay = max(0.0, (1 - self._tokens) / self.rate)
+            self._wakeup = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._release()
+
+    def _release(self):
+        self._refill()
+        while self._waiters and self._tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # Cancelled while waiting
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self._waiters:
+            self._schedule()
@@ -0,0 +1,76 @@
+import sys
+
+from storage import ROSTER_COLUMNS, ROSTER_DERIVED_FIELDS, ROSTER_INPUT_FIELDS
+
+
+def parse_int(cell):
+    # Sheet cells are text; blank and non-numeric cells read as None
+    try:
+        return int(cell)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_derived(cell):
+    # Derived columns hold a number, or a message such as "Hero Already Maxed" in place of one
+    if cell is None or cell == "":
+        return None
+    value = parse_int(cell)
+    return cell if value is None else value
+
+
+_PARSERS = {name: parse_int for name in ROSTER_INPUT_FIELDS} | {name: parse_derived for name in ROSTER_DERIVED_FIELDS}
+
+
+class RosterEntry:
+    """One hero on a user's roster, parsed once from its 'User Hero Data' row.
+
+    There is one attribute per roster column. The inputs are ints, or None
+    when the cell is blank or not a number; the derived values are ints, the
+    message stored instead of a number, or None. Columns that were not
+    loaded read as None.
+    """
+
+    __slots__ = ROSTER_COLUMNS
+
+    def __init__(self, user_id, hero_name):
+        # Ids and hero names repeat on thousands of rows, so every entry shares one string object for each
+        self.user_id = sys.intern(user_id)
+        self.hero_name = sys.intern(hero_name)
+        for name in ROSTER_COLUMNS[2:]:
+            setattr(self, name, None)
+
+    @classmethod
+    def from_row(cls, row):
+        entry = cls(row[0], row[1].strip())
+        entry.set(2, row[2:])
+        return entry
+
+    def set(self, first_index, values):
+        # Stores consecutive column values (cell text or the values a command writes), starting at column index `first_index`
+        for name, value in zip(ROSTER_COLUMNS[first_index:], values):
+            setattr(self, name, _PARSERS[name](value))
+
+    def to_row(self):
+        # Back to cell text in column order, blank for None
+        return ["" if getattr(self, name) is None else str(getattr(self, name)) for name in ROSTER_COLUMNS]
+
+    def derived_values(self):
+        return tuple(getattr(self, name) for name in ROSTER_DERIVED_FIELDS)
+
+
+class HeroRecord:
+    """One 'Hero Data General' row: every cell as text for /hero_info, plus the parsed fields the calculations use.
+
+    The fields are found through `schema`, the tab's SheetSchema resolved
+    from its header row. `max_level` is None when the sheet has no valid
+    number for it.
+    """
+
+    __slots__ = ("name", "max_level", "cells")
+
+    def __init__(self, cells, schema):
+        self.cells = tuple(cells)
+        self.name = cells[schema.column("name")]
+        max_level_column = schema.column("max_level")
+        self.max_level = parse_int(cells[max_level_column]) if len(cells) > max_level_column else None
@@ -0,0 +1,395 @@
+import asyncio
+import contextlib
+import logging
+
+from records import RosterEntry
+from storage import ROSTER_INPUT_FIELDS, ROSTER_KEY_FIELDS, column_index
+
+log = logging.getLogger(__name__)
+
+SYNC_RELOAD_SHARE = 0.25  # When more of the rows than this changed, sync() reloads the roster instead of fetching rows one run at a time
+
+
+class _LayoutGate:
+    """Lets any number of per-user operations run together, or one operation that reloads the row keys alone."""
+
+    def __init__(self):
+        self._active = 0
+        self._exclusive = False
+        self._changed = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def shared(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self._exclusive)
+            self._active += 1
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self._active -= 1
+                self._changed.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def exclusive(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self._exclusive)
+            self._exclusive = True  # New shared holders wait from here on, so the exclusive one cannot starve
+            await self._changed.wait_for(lambda: self._active == 0)
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self._exclusive = False
+                self._changed.notify_all()
+
+
+class RosterTransaction:
+    """A user's roster while that user's lock is held, for read-modify-write commands.
+
+    Everything read through the transaction stays current until it ends,
+    because every other write to this user's rows waits for the lock.
+    """
+
+    def __init__(self, store, user_id):
+        self._store = store
+        self.user_id = user_id
+
+    def get_roster(self):
+        return self._store.get_roster(self.user_id)
+
+    def get_entry(self, hero_name):
+        return self._store.get_entry(self.user_id, hero_name)
+
+    async def add(self, hero_name):
+        await self._store._add(self.user_id, hero_name)
+
+    async def update(self, hero_name, first_column, values):
+        # Writes `values` into consecutive columns of the hero's row, starting at column letter `first_column`
+        await self._store._update_rows(first_column, {(self.user_id, hero_name): values})
+
+    async def update_many(self, first_column, values_by_hero):
+        # Same as update() for several of the user's heroes at once, written to storage as one batch
+        await self._store._update_rows(first_column, {(self.user_id, hero_name): values for hero_name, values in values_by_hero.items()})
+
+    async def remove(self, hero_name):
+        return await self._store._remove(self.user_id, hero_name)
+
+
+class RosterStore:
+    """In-memory index of the user hero rosters ('User Hero Data').
+
+    Rows are parsed into RosterEntry objects once when loaded and kept per
+    user, keyed by hero name, so per-user commands only touch the caller's
+    roster instead of scanning every user's rows. Reads are served from
+    memory; writes go to the storage backend first and are then mirrored
+    into the index.
+
+    Writes are serialized per user: `transaction(user_id)` holds that user's
+    lock, so one user's commands apply in order while different users' writes
+    run in parallel. When other processes write the same storage (sharded
+    mode), the backend's `lock_users()` extends the lock to them and the
+    user's rows are re-read from storage before the transaction starts. Every row also carries a version that changes with each
+    write, which lets work done outside the lock (the derived column refresh)
+    skip rows that changed underneath it instead of overwriting them.
+
+    Edits made directly in storage (e.g. in the spreadsheet) are picked up
+    by `sync()`, which patches just the rows that changed into the index.
+
+    `fields` limits which roster columns are loaded (the key columns are
+    always included); None loads every column.
+    """
+
+    def __init__(self, storage, fields=None):
+        self._storage = storage
+        self._fields = None if fields is None else ROSTER_KEY_FIELDS + tuple(field for field in fields if field not in ROSTER_KEY_FIELDS)
+
+        self._rows = {}  # user_id -> {hero_name: RosterEntry}, in storage order
+        self._row_keys = {}  # (user_id, hero_name) -> backend row key
+        self._versions = {}  # (user_id, hero_name) -> write counter of the row
+        self._next_version = 0
+        self._layout = 0  # Goes up with every full load, which makes a sync that overlapped it discard its result
+        self._revision = None  # Storage revision the index was last synced with
+        self.loaded = False
+
+        self._user_locks = {}  # user_id -> asyncio.Lock
+        # Loading and compaction replace every row key, so they wait until no user operation is running
+        self._gate = _LayoutGate()
+
+    async def load(self):
+        async with self._gate.exclusive():
+            await self._load()
+
+    async def _load(self):
+        log.debug("Loading user hero data...")
+        revision = await self._storage.roster_revision()  # Read first, so a change made during the load still differs from it
+        stored_rows = await self._storage.load_roster(self._fields)
+
+        rows = {}
+        row_keys = {}
+        for row_key, row in stored_rows:
+            if len(row) < 2 or not row[0]:
+                continue
+            entry = RosterEntry.from_row(row)
+            rows.setdefault(entry.user_id, {})[entry.hero_name] = entry
+            row_keys[(entry.user_id, entry.hero_name)] = row_key
+
+        self._rows = rows
+        self._row_keys = row_keys
+        self._versions = {key: self._bump() for key in row_keys}
+        self._layout += 1
+        self._revision = revision
+        self.loaded = True
+        log.info("User hero data loaded: %d rows for %d users", len(row_keys), len(rows))
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            async with self._gate.exclusive():
+                if not self.loaded:  # Callers that queued behind the first load use its result instead of loading again
+                    await self._load()
+
+    def _bump(self):
+        # Versions come from one counter, so a removed and re-added hero never gets its old version back
+        self._next_version += 1
+        return self._next_version
+
+    def get_roster(self, user_id):
+        return list(self._rows.get(user_id, {}).values())
+
+    def get_entry(self, user_id, hero_name):
+        return self._rows.get(user_id, {}).get(hero_name)
+
+    def version(self, user_id, hero_name):
+        return self._versions.get((user_id, hero_name))
+
+    def entries(self):
+        # Every (user_id, hero_name, RosterEntry) in the index
+        for user_id, heroes in self._rows.items():
+            for hero_name, entry in heroes.items():
+                yield user_id, hero_name, entry
+
+    def _user_lock(self, user_id):
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = self._user_locks[user_id] = asyncio.Lock()
+        return lock
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, user_id):
+        async with self._gate.shared(), self._user_lock(user_id), self._storage.lock_users([user_id]) as stored_rows:
+            if stored_rows is not None:
+                self._refresh_users([user_id], stored_rows)
+            yield RosterTransaction(self, user_id)
+
+    async def add(self, user_id, hero_name):
+        async with self.transaction(user_id) as roster:
+            await roster.add(hero_name)
+
+    async def update(self, user_id, hero_name, first_column, values):
+        async with self.transaction(user_id) as roster:
+            await roster.update(hero_name, first_column, values)
+
+    async def update_many(self, user_id, first_column, values_by_hero):
+        async with self.transaction(user_id) as roster:
+            await roster.update_many(first_column, values_by_hero)
+
+    async def remove(self, user_id, hero_name):
+        async with self.transaction(user_id) as roster:
+            return await roster.remove(hero_name)
+
+    async def update_rows(self, first_column, values_by_key, expected_versions=None):
+        """Batch update across users, keyed by (user_id, hero_name).
+
+        With `expected_versions` ({key: version}), rows that were written or
+        removed since those versions were read are left alone; their keys are
+        returned. Without it a missing row raises KeyError.
+        """
+        user_ids = sorted({user_id for user_id, _ in values_by_key})
+        async with contextlib.AsyncExitStack() as stack:
+            await stack.enter_async_context(self._gate.shared())
+            for user_id in user_ids:  # Always locked in the same order, so two batches cannot deadlock
+                await stack.enter_async_context(self._user_lock(user_id))
+            stored_rows = await stack.enter_async_context(self._storage.lock_users(user_ids))
+            if stored_rows is not None:
+                self._refresh_users(user_ids, stored_rows)
+
+            stale = []
+            if expected_versions is not None:
+                stale = [key for key in values_by_key if self._versions.get(key) != expected_versions.get(key)]
+                values_by_key = {key: values for key, values in values_by_key.items() if key not in stale}
+            await self._update_rows(first_column, values_by_key)
+            return stale
+
+    def _refresh_users(self, user_ids, stored_rows):
+        # Brings these users' index entries in line with storage; callers hold the users' locks. Unchanged rows keep their version
+        stored = {}
+        for row_key, row in stored_rows:
+            entry = RosterEntry.from_row(row)
+            stored[(entry.user_id, entry.hero_name)] = (row_key, entry)
+        for user_id in user_ids:
+            for hero_name in list(self._rows.get(user_id, {})):
+                if (user_id, hero_name) not in stored:
+                    self._drop(user_id, hero_name)
+        for key, (row_key, entry) in stored.items():
+            indexed = self.get_entry(*key)
+            if indexed is not None and self._row_keys[key] == row_key and indexed.to_row() == entry.to_row():
+                continue
+            self._rows.setdefault(entry.user_id, {})[entry.hero_name] = entry
+            self._row_keys[key] = row_key
+            self._versions[key] = self._bump()
+
+    def _drop(self, user_id, hero_name):
+        del self._rows[user_id][hero_name]
+        if not self._rows[user_id]:
+            del self._rows[user_id]
+        del self._row_keys[(user_id, hero_name)]
+        del self._versions[(user_id, hero_name)]
+
+    async def _add(self, user_id, hero_name):
+        row_key = await self._storage.append_roster_row([user_id, hero_name])
+        # A row cleared in storage can be reused before a sync notices; the hero indexed there is gone
+        for key in [key for key, existing in self._row_keys.items() if existing == row_key]:
+            self._drop(*key)
+
+        self._rows.setdefault(user_id, {})[hero_name] = RosterEntry(user_id, hero_name)
+        self._row_keys[(user_id, hero_name)] = row_key
+        self._versions[(user_id, hero_name)] = self._bump()
+
+    async def _update_rows(self, first_column, values_by_key):
+        # Callers hold the locks of every user in `values_by_key`
+        updates = []
+        for (user_id, hero_name), values in values_by_key.items():
+            row_key = self._row_keys.get((user_id, hero_name))
+            if row_key is None:
+                raise KeyError(f"{hero_name} is not tracked by user {user_id}")
+            updates.append((row_key, values))
+        if not updates:
+            return
+
+        await self._storage.update_roster_rows(first_column, updates)
+        for (user_id, hero_name), values in values_by_key.items():
+            self._rows[user_id][hero_name].set(column_index(first_column), values)
+            self._versions[(user_id, hero_name)] = self._bump()
+
+    async def _remove(self, user_id, hero_name):
+        row_key = self._row_keys.get((user_id, hero_name))
+        if row_key is None:
+            return False
+
+        await self._storage.delete_roster_row(row_key)
+        self._drop(user_id, hero_name)
+        return True
+
+    async def sync(self):
+        """Brings the index up to date with rows edited directly in storage.
+
+        Nothing is read when the backend's revision is unchanged since the
+        last sync. A backend with a change log names the changed rows
+        itself. Otherwise only the key and input columns are scanned, and
+        the rows whose inputs differ from the index, or that were added or
+        cleared, are fetched in full and patched in. The derived columns are
+        only ever written by the bot, so they are not scanned.
+
+        No lock is held while storage is read. Rows the bot writes in the
+        meantime keep the bot's values, which are newer. If rows were
+        inserted or moved between others, their row keys no longer match the
+        index, and the whole roster is reloaded instead.
+
+        Returns the (user_id, hero_name) keys that changed, or None after a
+        full reload.
+        """
+        if not self.loaded:
+            return set()  # The first load reads every row anyway
+        revision = await self._storage.roster_revision()
+        if revision is not None and revision == self._revision:
+            return set()
+
+        # Versions are noted before storage is read (and its pending writes flushed), so any later write shows up as a new version
+        layout = self._layout
+        versions = dict(self._versions)
+        changes = None if self._revision is None else await self._storage.roster_changes(self._revision)
+        if changes is not None:
+            revision, fetched, removed = changes
+            rekey = True
+        else:
+            scan_fields = ROSTER_KEY_FIELDS + tuple(field for field in ROSTER_INPUT_FIELDS if self._fields is None or field in self._fields)
+            scanned = await self._storage.load_roster(scan_fields)
+
+            changed, removed, moved = self._diff(scanned, scan_fields)
+            if moved or len(changed) + len(removed) > SYNC_RELOAD_SHARE * max(len(scanned), 1):
+                if moved:
+                    log.info("User hero data changed in storage (rows were inserted or moved), reloading it")
+                else:
+                    log.info("User hero data changed in storage (%d rows), reloading it", len(changed) + len(removed))
+                await self.load()
+                return None
+            fetched = await self._storage.load_roster_rows(changed) if changed else []
+            rekey = False
+
+        async with self._gate.exclusive():
+            if self._layout != layout:
+                return None  # Reloaded or compacted meanwhile, which read every row anyway
+            patched = self._patch(fetched, removed, versions, rekey)
+        self._revision = revision
+        log.log(logging.INFO if patched else logging.DEBUG, "User hero data synced, %d rows changed in storage", len(patched))
+        return patched
+
+    def _diff(self, scanned, fields):
+        # Compares scanned rows with the index: (row keys to fetch, index keys to drop, whether rows moved)
+        scanned_keys = {row_key: (row[0], row[1].strip()) for row_key, row in scanned if len(row) >= 2}
+        indexed = {row_key: key for key, row_key in self._row_keys.items()}
+        changed = []
+        for row_key, row in scanned:
+            key = scanned_keys.get(row_key)
+            if key is None:
+                continue
+            indexed_key = indexed.pop(row_key, None)
+            if indexed_key is None:
+                other_row_key = self._row_keys.get(key)
+                if other_row_key is None:
+                    changed.append(row_key)
+                elif scanned_keys.get(other_row_key) != key:
+                    return [], [], True
+                # Otherwise it's a second row for the same hero, which the index already has at the other row
+            elif indexed_key != key:
+                return [], [], True
+            else:
+                entry = self.get_entry(*key)
+                scanned_entry = RosterEntry.from_row(row)
+                if any(getattr(entry, field) != getattr(scanned_entry, field) for field in fields[len(ROSTER_KEY_FIELDS):]):
+                    changed.append(row_key)
+        # Whatever is left was cleared in storage, or added by the bot after the scan (those are kept by _patch)
+        return changed, list(indexed.values()), False
+
+    def _patch(self, fetched, removed, versions, rekey=False):
+        """Applies fetched rows and removed keys to the index; runs under the exclusive gate.
+
+        A row only changes when the bot hasn't written it since `versions`
+        was noted. A fetched row found under a different row key than the
+        index has is a second copy of the hero and is skipped, unless `rekey`
+        says the rows were looked up by hero (a change log), in which case the
+        row was removed and added again and its new row key replaces the old.
+        """
+        patched = set()
+        for row_key, row in fetched:
+            entry = RosterEntry.from_row(row)
+            key = (entry.user_id, entry.hero_name)
+            if self._versions.get(key) != versions.get(key) or (not rekey and self._row_keys.get(key, row_key) != row_key):
+                continue
+            self._rows.setdefault(entry.user_id, {})[entry.hero_name] = entry
+            self._row_keys[key] = row_key
+            self._versions[key] = self._bump()
+            patched.add(key)
+        for user_id, hero_name in removed:
+            key = (user_id, hero_name)
+            if key not in self._versions or self._versions[key] != versions.get(key):
+                continue
+            self._drop(user_id, hero_name)
+            patched.add(key)
+        return patched
+
+    async def compact(self):
+        # Lets the backend reclaim deleted rows, then re-reads the row keys if that moved any
+        async with self._gate.exclusive():
+            if await self._storage.compact_roster():
+                await self._load()
@@ -0,0 +1,358 @@
+import asyncio
+import contextlib
+import logging
+import time
+
+from sqlite_storage import MAX_QUERY_PARAMETERS, SqliteBackend, _cell
+from storage import ROSTER_COLUMNS
+
+log = logging.getLogger(__name__)
+
+SHEETS_ORIGIN = "sheets"  # Origin of the changes the Sheets writer copies in from the spreadsheet
+CHANGE_LOG_RETENTION = 60 * 60  # Seconds that pushed change log entries are kept for shards catching up
+SEED_POLL_INTERVAL = 1.0  # Seconds between checks whether the Sheets writer has filled a new shared store
+CATALOG_REFRESH_TIMEOUT = 60  # Seconds /reload_heroes waits for the Sheets writer to copy the catalog
+USER_LOCK_TTL = 30  # Seconds a process that died mid-command can keep the other shards from writing that user's rows
+USER_LOCK_POLL_INTERVAL = 0.05  # Seconds between attempts to lock users another shard is writing
+USER_LOCK_RENEW_INTERVAL = USER_LOCK_TTL / 3  # Seconds between renewals of user locks held for a slow command
+
+SHARED_SCHEMA = """
+-- One entry per roster row write, so every shard can tell which rows the others changed
+CREATE TABLE IF NOT EXISTS roster_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    hero_name TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    changed_at REAL NOT NULL
+);
+
+-- Progress markers (seeded, pushed_seq, pruned_seq, catalog_version, catalog_loaded_at, catalog_reload_requested)
+CREATE TABLE IF NOT EXISTS shared_state (
+    name TEXT PRIMARY KEY,
+    value
+);
+
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def _get_state(connection, name, default=None):
+    row = connection.execute("SELECT value FROM shared_state WHERE name = ?", (name,)).fetchone()
+    return default if row is None else row[0]
+
+
+def _set_state(connection, name, value):
+    connection.execute("INSERT INTO shared_state (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = excluded.value", (name, value))
+
+
+class SharedStoreBackend(SqliteBackend):
+    """SQLite database shared by the processes of a sharded deployment.
+
+    Every shard process reads the hero catalog and the rosters from this
+    file instead of from Google Sheets, and writes its roster changes to it.
+    The database runs in WAL mode, so readers in one process never block on
+    a write in another. Every roster write also lands in a change log, under
+    the `origin` of the process that made it. Shards follow that log to patch
+    their in-memory index (`roster_changes()`), and the Sheets writer (see
+    sheets_writer.py) follows it to push the changes on to the spreadsheet.
+
+    Roster writes are serialized across processes per user: `lock_users()`
+    takes a lease for each user in the store and re-reads their rows, so a
+    shard's read-modify-write always starts from what the others wrote.
+
+    Until the Sheets writer has filled a new store for the first time, the
+    load methods wait for it.
+    """
+
+    def __init__(self, path, origin):
+        super().__init__(path)
+        self.origin = origin
+
+    def _connect(self):
+        if self._connection is None:
+            connection = super()._connect()
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SHARED_SCHEMA)
+        return self._connection
+
+    def _roster_changed(self, connection, row_keys):
+        if not row_keys:
+            return
+        self._log_changes(connection, [
+            tuple(key) for key in connection.execute(
+                f"SELECT user_id, hero_name FROM user_hero_data WHERE id IN ({', '.join('?' for _ in row_keys)})", row_keys,
+            )
+        ], self.origin)
+
+    @staticmethod
+    def _log_changes(connection, keys, origin):
+        now = time.time()
+        connection.executemany(
+            "INSERT INTO roster_changes (user_id, hero_name, origin, changed_at) VALUES (?, ?, ?, ?)",
+            [(user_id, hero_name, origin, now) for user_id, hero_name in keys],
+        )
+
+    def _state(self, name, default=None):
+        return _get_state(self._connect(), name, default)
+
+    async def _wait_until_seeded(self):
+        waiting = False
+        while not await self._run(self._state, "seeded"):
+            if not waiting:
+                log.info("Waiting for the Sheets writer to fill the shared store...")
+                waiting = True
+            await asyncio.sleep(SEED_POLL_INTERVAL)
+
+    # The revisions are read before loading, so they wait for seeding too; otherwise the first copy would count as changes
+
+    async def catalog_revision(self):
+        await self._wait_until_seeded()
+        return await self._run(self._state, "catalog_version", 0)
+
+    async def roster_revision(self):
+        await self._wait_until_seeded()
+        return await self._run(self._roster_revision)
+
+    async def load_catalog(self, master_fields=None):
+        await self._wait_until_seeded()
+        return await super().load_catalog(master_fields)
+
+    async def load_roster(self, fields=None):
+        await self._wait_until_seeded()
+        return await super().load_roster(fields)
+
+    async def replace_catalog(self, master_values, hero_values):
+        raise NotImplementedError("The shared store's catalog is copied in by the Sheets writer")
+
+    async def replace_roster(self, rows):
+        raise NotImplementedError("The shared store's roster is copied in by the Sheets writer")
+
+    def _load_user_rows(self, user_ids):
+        connection = self._connect()
+        user_ids = list(user_ids)
+        rows = []
+        for i in range(0, len(user_ids), MAX_QUERY_PARAMETERS):
+            chunk = user_ids[i:i + MAX_QUERY_PARAMETERS]
+            cursor = connection.execute(
+                f"SELECT id, {', '.join(ROSTER_COLUMNS)} FROM user_hero_data WHERE user_id IN ({', '.join('?' for _ in chunk)}) ORDER BY id",
+                chunk,
+            )
+            rows.extend((row[0], list(row[1:])) for row in cursor)
+        return rows
+
+    @contextlib.asynccontextmanager
+    async def lock_users(self, user_ids):
+        names = [f"user:{user_id}" for user_id in user_ids]
+        while not await self._run(self._acquire_leases, names, self.origin, USER_LOCK_TTL):
+            await asyncio.sleep(USER_LOCK_POLL_INTERVAL)
+        renewal = asyncio.create_task(self._renew_leases(names))
+        try:
+            yield await self._run(self._load_user_rows, user_ids)
+        finally:
+            renewal.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await renewal
+            await self._run(self._release_leases, names, self.origin)
+
+    async def _renew_leases(self, names):
+        # Keeps the user locks from running out while a command waits on a slow storage write
+        while True:
+            await asyncio.sleep(USER_LOCK_RENEW_INTERVAL)
+            if not await self._run(self._acquire_leases, names, self.origin, USER_LOCK_TTL):
+                log.warning("The lock on %d users' roster rows ran out and another shard took it, their writes may interleave", len(names))
+                return
+
+    # Catalog copy
+
+    def _store_catalog(self, master_values, hero_values):
+        self._replace_catalog(master_values, hero_values)
+        connection = self._connection
+        with connection:
+            _set_state(connection, "catalog_version", _get_state(connection, "catalog_version", 0) + 1)
+            _set_state(connection, "catalog_loaded_at", time.time())
+            _set_state(connection, "catalog_reload_requested", 0)
+
+    async def store_catalog(self, master_values, hero_values):
+        # The Sheets writer's copy of the catalog; the version bump makes every shard reload it
+        await self._run(self._store_catalog, master_values, hero_values)
+
+    def _catalog_due(self, ttl):
+        loaded_at = self._state("catalog_loaded_at")
+        return loaded_at is None or time.time() - loaded_at > ttl or bool(self._state("catalog_reload_requested", 0))
+
+    async def catalog_due(self, ttl):
+        # Whether the copy is older than `ttl` seconds or a shard asked for a reload
+        return await self._run(self._catalog_due, ttl)
+
+    def _request_catalog_reload(self):
+        connection = self._connect()
+        with connection:
+            _set_state(connection, "catalog_reload_requested", 1)
+
+    async def refresh_catalog(self):
+        # Asks the Sheets writer, whichever process holds the lease, for a fresh copy and waits until it has been stored
+        version = await self.catalog_revision()
+        await self._run(self._request_catalog_reload)
+        async with asyncio.timeout(CATALOG_REFRESH_TIMEOUT):
+            while await self.catalog_revision() == version:
+                await asyncio.sleep(SEED_POLL_INTERVAL)
+
+    # Change log
+
+    def _roster_revision(self):
+        # The last change log entry ever written; AUTOINCREMENT never hands out a number twice, even after pruning
+        row = self._connect().execute("SELECT seq FROM sqlite_sequence WHERE name = 'roster_changes'").fetchone()
+        return 0 if row is None else row[0]
+
+    def _rows_for_keys(self, keys):
+        # (rows, removed) for (user_id, hero_name) keys: the current row of every key that exists, and the keys that don't
+        connection = self._connect()
+        rows = []
+        removed = []
+        for user_id, hero_name in keys:
+            row = connection.execute(
+                f"SELECT id, {', '.join(ROSTER_COLUMNS)} FROM user_hero_data WHERE user_id = ? AND hero_name = ?", (user_id, hero_name),
+            ).fetchone()
+            if row is None:
+                removed.append((user_id, hero_name))
+            else:
+                rows.append((row[0], list(row[1:])))
+        return rows, removed
+
+    def _roster_changes(self, since):
+        connection = self._connect()
+        if since < _get_state(connection, "pruned_seq", 0):
+            return None
+        entries = connection.execute("SELECT seq, user_id, hero_name, origin FROM roster_changes WHERE seq > ? ORDER BY seq", (since,)).fetchall()
+        revision = entries[-1][0] if entries else since
+        keys = {(user_id, hero_name) for _, user_id, hero_name, origin in entries if origin != self.origin}
+        return (revision, *self._rows_for_keys(keys))
+
+    async def roster_changes(self, since):
+        return await self._run(self._roster_changes, since)
+
+    # Used by the Sheets writer
+
+    def _pending_pushes(self, limit):
+        connection = self._connect()
+        pushed_seq = _get_state(connection, "pushed_seq", 0)
+        entries = connection.execute("SELECT seq, user_id, hero_name, origin FROM roster_changes WHERE seq > ? ORDER BY seq LIMIT ?", (pushed_seq, limit)).fetchall()
+        if not entries:
+            return None, [], []
+        keys = list(dict.fromkeys((user_id, hero_name) for _, user_id, hero_name, origin in entries if origin != SHEETS_ORIGIN))
+        return (entries[-1][0], *self._rows_for_keys(keys))
+
+    async def pending_pushes(self, limit):
+        """Shard changes the Sheets writer hasn't pushed yet, oldest first and at most `limit` log entries.
+
+        Returns (seq, rows, removed) like roster_changes(); pass `seq` to
+        mark_pushed() once the spreadsheet has them. `seq` is None when
+        everything has been pushed.
+        """
+        return await self._run(self._pending_pushes, limit)
+
+    def _mark_pushed(self, seq):
+        connection = self._connect()
+        with connection:
+            _set_state(connection, "pushed_seq", seq)
+
+    async def mark_pushed(self, seq):
+        await self._run(self._mark_pushed, seq)
+
+    def _load_roster_by_key(self):
+        cursor = self._connect().execute(f"SELECT {', '.join(ROSTER_COLUMNS)} FROM user_hero_data")
+        return {(row[0], row[1]): list(row) for row in cursor}
+
+    async def load_roster_by_key(self):
+        # Every stored row keyed by (user_id, hero_name); never waits for seeding, the Sheets writer is the one seeding
+        return await self._run(self._load_roster_by_key)
+
+    def _apply_sheet_rows(self, rows, removed):
+        connection = self._connect()
+        placeholders = ", ".join("?" for _ in ROSTER_COLUMNS)
+        with connection:
+            # Shard writes that haven't reached the spreadsheet yet are newer than what it holds
+            pending = {
+                tuple(key) for key in connection.execute(
+                    "SELECT user_id, hero_name FROM roster_changes WHERE seq > ? AND origin != ?", (_get_state(connection, "pushed_seq", 0), SHEETS_ORIGIN),
+                )
+            }
+            rows = [row for row in rows if (row[0], row[1]) not in pending]
+            removed = [key for key in removed if key not in pending]
+            connection.executemany(
+                f"INSERT INTO user_hero_data ({', '.join(ROSTER_COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(user_id, hero_name) DO UPDATE SET {', '.join(f'{name} = excluded.{name}' for name in ROSTER_COLUMNS[2:])}",
+                [[_cell(value) for value in row] for row in rows],
+            )
+            connection.executemany("DELETE FROM user_hero_data WHERE user_id = ? AND hero_name = ?", removed)
+            self._log_changes(connection, [(row[0], row[1]) for row in rows] + removed, SHEETS_ORIGIN)
+        return len(rows) + len(removed)
+
+    async def apply_sheet_rows(self, rows, removed):
+        """Copies rows from the spreadsheet in, and deletes the (user_id, hero_name) keys in `removed`.
+
+        Rows are full A-P rows. Keys with shard writes still waiting to be
+        pushed are left alone. Returns how many rows were written or deleted.
+        """
+        return await self._run(self._apply_sheet_rows, rows, removed)
+
+    def _mark_seeded(self):
+        connection = self._connect()
+        with connection:
+            _set_state(connection, "seeded", 1)
+
+    async def mark_seeded(self):
+        await self._run(self._mark_seeded)
+
+    def _prune_changes(self):
+        # Drops pushed entries older than CHANGE_LOG_RETENTION; a shard that is further behind reloads instead
+        connection = self._connect()
+        with connection:
+            row = connection.execute(
+                "SELECT MAX(seq) FROM roster_changes WHERE seq <= ? AND changed_at < ?",
+                (_get_state(connection, "pushed_seq", 0), time.time() - CHANGE_LOG_RETENTION),
+            ).fetchone()
+            if row[0] is not None:
+                connection.execute("DELETE FROM roster_changes WHERE seq <= ?", (row[0],))
+                _set_state(connection, "pruned_seq", row[0])
+
+    async def prune_changes(self):
+        await self._run(self._prune_changes)
+
+    def _acquire_leases(self, names, holder, ttl):
+        # All or nothing, so two processes taking overlapping sets of leases can't each end up waiting for the other
+        connection = self._connect()
+        now = time.time()
+        with connection:
+            connection.executemany(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                [(name, holder, now + ttl, now) for name in names],
+            )
+            held = 0
+            for i in range(0, len(names), MAX_QUERY_PARAMETERS):
+                chunk = names[i:i + MAX_QUERY_PARAMETERS]
+                held += connection.execute(
+                    f"SELECT COUNT(*) FROM leases WHERE holder = ? AND name IN ({', '.join('?' for _ in chunk)})", [holder, *chunk],
+                ).fetchone()[0]
+            if held < len(names):
+                connection.rollback()
+                return False
+        return True
+
+    async def acquire_lease(self, name, holder, ttl):
+        # Takes or renews the lease `name` for `ttl` seconds; False while another holder's lease is still running
+        return await self._run(self._acquire_leases, [name], holder, ttl)
+
+    def _release_leases(self, names, holder):
+        connection = self._connect()
+        with connection:
+            connection.executemany("DELETE FROM leases WHERE name = ? AND holder = ?", [(name, holder) for name in names])
+
+    async def release_lease(self, name, holder):
+        await self._run(self._release_leases, [name], holder)
@@ -0,0 +1,67 @@
+from storage import column_letter
+
+
+def normalize_field(name):
+    # "Max Level", "max_level" and " MAX  level " all name the same field
+    return "_".join(name.strip().lower().replace("_", " ").split())
+
+
+class SheetSchema:
+    """Maps named fields of one sheet tab to column positions.
+
+    Starts from the tab's known default layout and is resolved once from the
+    header row, so a renamed or moved column is still found by its header
+    text. `ranges()` turns a set of fields into the fewest A1 column ranges
+    for a `values().batchGet`, and `assemble()` turns the ranges' values back
+    into positional rows.
+    """
+
+    def __init__(self, sheet_name, default_columns, first_data_row=2):
+        self.sheet_name = sheet_name
+        self.first_data_row = first_data_row
+        self._columns = {normalize_field(name): i for i, name in enumerate(default_columns) if name}
+        self.resolved = False
+
+    @property
+    def header_range(self):
+        return f"{self.sheet_name}!{self.first_data_row - 1}:{self.first_data_row - 1}"
+
+    def resolve(self, header_row):
+        for i, header in enumerate(header_row):
+            if header:
+                self._columns[normalize_field(header)] = i
+        self.resolved = True
+
+    def column(self, field):
+        try:
+            return self._columns[normalize_field(field)]
+        except KeyError:
+            raise KeyError(f"'{self.sheet_name}' has no column for field '{field}'") from None
+
+    def column_runs(self, fields):
+        # Runs of adjacent column positions covering every requested field
+        runs = []
+        for index in sorted({self.column(field) for field in fields}):
+            if runs and index == runs[-1][1] + 1:
+                runs[-1][1] = index
+            else:
+                runs.append([index, index])
+        return [tuple(run) for run in runs]
+
+    def ranges(self, runs):
+        return [f"{self.sheet_name}!{column_letter(start)}{self.first_data_row}:{column_letter(end)}" for start, end in runs]
+
+    @staticmethod
+    def assemble(runs, value_ranges):
+        """Rebuilds positional rows from the values of `ranges(runs)`.
+
+        Columns outside the runs are left empty, and a row with no values in
+        any range comes back as [] just like an empty row of a plain read.
+        """
+        width = runs[-1][1] + 1 if runs else 0
+        row_count = max((len(values) for values in value_ranges), default=0)
+        rows = [[""] * width for _ in range(row_count)]
+        for (start, _), values in zip(runs, value_ranges):
+            for i, cells in enumerate(values):
+                rows[i][start:start + len(cells)] = cells
+        return [row if any(row) else [] for row in rows]
@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import google_auth_httplib2
+import httplib2
+from googleapiclient.errors import HttpError
+
+from metrics import current_command, metrics
+from rate_limiter import BACKGROUND, INTERACTIVE, TokenBucket
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8  # Upper bound on Google Sheets requests running at the same time
+DEFAULT_TIMEOUT = 30  # Seconds before a single Sheets call is abandoned
+DEFAULT_READS_PER_MINUTE = 60  # Google's default per-user Sheets quota; the service account is one user
+DEFAULT_WRITES_PER_MINUTE = 60
+DEFAULT_MAX_RETRIES = 5
+MAX_BACKOFF = 32  # Seconds, the ceiling Google suggests for exponential backoff
+
+# Drive metadata reads count against Drive's own, much larger quota, so they are not paced with the Sheets calls
+READ_METHODS = {"sheets.spreadsheets.get", "sheets.spreadsheets.values.get", "sheets.spreadsheets.values.batchGet", "drive.files.get"}
+# Repeating these after a 5xx could apply them twice (a second appended row, a second deleted row); a 429 was never applied
+NON_IDEMPOTENT_METHODS = {"sheets.spreadsheets.values.append", "sheets.spreadsheets.batchUpdate"}
+
+
+class _MeteredHttp:
+    # Wraps a worker thread's http object to count the response bytes it receives
+    def __init__(self, http):
+        self._http = http
+        self.bytes_received = 0
+
+    def request(self, *args, **kwargs):
+        response, content = self._http.request(*args, **kwargs)
+        self.bytes_received += len(content or b"")
+        return response, content
+
+    def __getattr__(self, name):
+        return getattr(self._http, name)
+
+
+class SheetsGateway:
+    """Async front for the Google Sheets API.
+
+    The googleapiclient requests are blocking, so every call is executed on a
+    bounded thread pool and awaited from the event loop. This keeps discord.py
+    heartbeats, autocomplete and other users' commands running while a slow
+    Google round-trip is in flight, and lets per-call timeouts actually fire.
+    Appends and structural updates get no such timeout: the request would
+    keep running on its thread and could still land after the caller gave
+    up, and the caller trying again would apply it twice. They are bounded
+    by the HTTP client's socket timeout instead. Every call is counted in the metrics under the command that made it.
+
+    Calls first take a token from the read or write bucket sized to the
+    project's quota, with slash commands served ahead of background work, so
+    bursts queue up briefly instead of failing. Rate limited (429) and server
+    error (5xx) responses are retried with jittered exponential backoff.
+
+    Identical reads that overlap in time share one request (single-flight):
+    later callers wait for the fetch already in flight and get their own copy
+    of its rows. A write to a spreadsheet detaches the reads in flight for it,
+    so a read issued after a write never receives data fetched before it.
+
+    `connect(api)` returns the (service, credentials) pair for "sheets" or
+    "drive" and is called once per API, on a worker thread, when the first
+    request to it is made, so creating the gateway costs nothing until the
+    bot actually talks to Google.
+    """
+
+    def __init__(self, connect, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT,
+                 reads_per_minute=DEFAULT_READS_PER_MINUTE, writes_per_minute=DEFAULT_WRITES_PER_MINUTE, max_retries=DEFAULT_MAX_RETRIES):
+        self._connect = connect
+        self._connecting = {}  # API -> future of its connect() call
+        self._services = {}  # API -> service
+        self._credentials = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets")
+        self._local = threading.local()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._read_bucket = TokenBucket(reads_per_minute)
+        self._write_bucket = TokenBucket(writes_per_minute)
+        self._drive_bucket = TokenBucket(0)  # Unlimited
+        self._inflight_reads = {}  # (spreadsheet_id, method, ranges) -> task fetching it
+
+    async def _client(self, api):
+        service = self._services.get(api)
+        if service is None:
+            connecting = self._connecting.get(api)
+            if connecting is None:
+                connecting = self._connecting[api] = asyncio.get_running_loop().run_in_executor(self._executor, self._connect, api)
+            try:
+                # Shielded, so a caller that gives up doesn't cancel the connection the others are waiting for
+                service, self._credentials = await asyncio.shield(connecting)
+            except Exception:
+                self._connecting.pop(api, None)  # The next call tries again
+                raise
+            self._services[api] = service
+        return service
+
+    def _http(self):
+        # httplib2 connections are not thread-safe, so every worker thread gets its own authorized one
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = _MeteredHttp(google_auth_httplib2.AuthorizedHttp(self._credentials, http=httplib2.Http(timeout=self.timeout)))
+            self._local.http = http
+        return http
+
+    def _execute(self, request):
+        http = self._http()
+        received_before = http.bytes_received
+        result = request.execute(http=http)
+        return result, http.bytes_received - received_before
+
+    def _should_retry(self, method, error, attempt):
+        if attempt >= self.max_retries:
+            return False
+        status = error.resp.status
+        if status == 429:
+            return True
+        return status >= 500 and method not in NON_IDEMPOTENT_METHODS
+
+    @staticmethod
+    def _backoff(error, attempt):
+        retry_after = error.resp.get('retry-after')
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return min(MAX_BACKOFF, 2 ** attempt) + random.uniform(0, 1)
+
+    async def _run(self, make_request, timeout=None, api="sheets"):
+        request = make_request(await self._client(api))
+        method = request.methodId
+        if api == "drive":
+            bucket = self._drive_bucket
+        else:
+            bucket = self._read_bucket if method in READ_METHODS else self._write_bucket
+        priority = BACKGROUND if current_command.get() == "background" else INTERACTIVE
+        loop = asyncio.get_running_loop()
+        if method in NON_IDEMPOTENT_METHODS:
+            timeout = None  # Only the socket timeout, which ends the request itself
+        else:
+            timeout = timeout or self.timeout
+
+        attempt = 0
+        while True:
+            await bucket.acquire(priority)
+            future = loop.run_in_executor(self._executor, self._execute, request)
+            try:
+                result, bytes_received = await asyncio.wait_for(future, timeout=timeout)
+            except asyncio.TimeoutError:
+                metrics.record_sheets_call(method, outcome="timeout")
+                raise
+            except HttpError as e:
+                if not self._should_retry(method, e, attempt):
+                    metrics.record_sheets_call(method, outcome="error")
+                    raise
+                delay = self._backoff(e, attempt)
+                metrics.record_sheets_call(method, outcome="retried")
+                log.warning("Sheets call %s failed with HTTP %s, retrying in %.1fs (attempt %d of %d)", method, e.resp.status, delay, attempt + 1, self.max_retries)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                metrics.record_sheets_call(method, outcome="error")
+                raise
+            metrics.record_sheets_call(method, bytes_received)
+            return result
+
+    async def _read(self, key, make_request, timeout, api="sheets"):
+        # Returns (result, shared); shared results are also handed to other callers and must not be mutated
+        task = self._inflight_reads.get(key)
+        shared = task is not None
+        if shared:
+            metrics.record_coalesced_read()
+        else:
+            task = asyncio.ensure_future(self._run(make_request, timeout, api))
+            self._inflight_reads[key] = task
+            task.add_done_callback(lambda done: self._read_finished(key, done))
+        # One caller giving up (e.g. its command timing out) must not cancel the fetch for the others
+        return await asyncio.shield(task), shared
+
+    def _read_finished(self, key, task):
+        if self._inflight_reads.get(key) is task:
+            del self._inflight_reads[key]
+        if not task.cancelled():
+            task.exception()  # Marks the error as retrieved even if every caller has gone away
+
+    def _forget_reads(self, spreadsheet_id):
+        for key in [key for key in self._inflight_reads if key[0] == spreadsheet_id]:
+            del self._inflight_reads[key]
+
+    async def _write(self, spreadsheet_id, make_request, timeout):
+        self._forget_reads(spreadsheet_id)
+        return await self._run(make_request, timeout)
+
+    async def get_values(self, spreadsheet_id, range_name, timeout=None):
+        result, shared = await self._read(
+            (spreadsheet_id, 'values.get', range_name),
+            lambda service: service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=range_name),
+            timeout,
+        )
+        values = result.get('values', [])
+        return [list(row) for row in values] if shared else values
+
+    async def batch_get_values(self, spreadsheet_id, ranges, timeout=None):
+        # One request for several ranges; returns each range's values in the order given
+        result, shared = await self._read(
+            (spreadsheet_id, 'values.batchGet', tuple(ranges)),
+            lambda service: service.spreadsheets().values().batchGet(spreadsheetId=spreadsheet_id, ranges=ranges),
+            timeout,
+        )
+        value_ranges = [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+        return [[list(row) for row in values] for values in value_ranges] if shared else value_ranges
+
+    async def update_values(self, spreadsheet_id, range_name, values, timeout=None):
+        return await self._write(
+            spreadsheet_id,
+            lambda service: service.spreadsheets().values().update(
+                spreadsheetId=spreadsheet_id,
+                range=range_name,
+                valueInputOption='RAW',
+                body={'values': values}
+            ),
+            timeout,
+        )
+
+    async def append_values(self, spreadsheet_id, range_name, values, insert_data_option='OVERWRITE', timeout=None):
+        # Sheets writes the rows below the first table it finds in `range_name`; OVERWRITE fills the empty rows there, INSERT_ROWS inserts new ones
+        return await self._write(
+            spreadsheet_id,
+            lambda service: service.spreadsheets().values().append(
+                spreadsheetId=spreadsheet_id,
+                range=range_name,
+                valueInputOption='RAW',
+                insertDataOption=insert_data_option,
+                body={'values': values}
+            ),
+            timeout,
+        )
+
+    async def batch_update_values(self, spreadsheet_id, data, timeout=None):
+        return await self._write(
+            spreadsheet_id,
+            lambda service: service.spreadsheets().values().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={'valueInputOption': 'RAW', 'data': data}
+            ),
+            timeout,
+        )
+
+    async def clear_values(self, spreadsheet_id, range_name, timeout=None):
+        return await self._write(
+            spreadsheet_id,
+            lambda service: service.spreadsheets().values().clear(spreadsheetId=spreadsheet_id, range=range_name, body={}),
+            timeout,
+        )
+
+    async def batch_update(self, spreadsheet_id, requests, timeout=None):
+        return await self._write(
+            spreadsheet_id,
+            lambda service: service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={'requests': requests}),
+            timeout,
+        )
+
+    async def get_spreadsheet(self, spreadsheet_id, fields=None, timeout=None):
+        # `fields` is a partial response mask, e.g. "sheets.properties(sheetId,title)" instead of the whole metadata
+        result, _ = await self._read(
+            (spreadsheet_id, 'get', fields),
+            lambda service: service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields=fields),
+            timeout,
+        )
+        return result
+
+    async def get_file_version(self, file_id, timeout=None):
+        # Drive's version number of the file, which goes up with every change made to it by anyone
+        result, _ = await self._read(
+            (file_id, 'drive.files.get', 'version'),
+            lambda service: service.files().get(fileId=file_id, fields='version'),
+            timeout,
+            api="drive",
+        )
+        return int(result['version'])
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import re
+
+from googleapiclient.errors import HttpError
+
+from sheet_schema import SheetSchema
+from storage import ROSTER_COLUMNS, ROSTER_SHEET, StorageBackend, column_index
+from write_behind import DEFAULT_FLUSH_INTERVAL, WriteBehindQueue
+
+MASTER_TAB_RANGE = 'Master Tab!A2:E'  # Hero names (column A) and rarities (column E)
+HERO_DATA_RANGE = 'Hero Data General!A1:ZZ'  # Header row plus every statistic for every hero
+ROSTER_RANGE = 'User Hero Data!A2:P'
+FIRST_ROSTER_ROW = 2  # Row 1 holds the headers
+MASTER_TAB_COLUMNS = ("name", None, None, None, "rarity")  # Default Master Tab layout, before the header row is read
+MAX_RANGES_PER_READ = 100  # Ranges per batchGet when reading scattered roster rows, which keeps the request URL short
+
+log = logging.getLogger(__name__)
+
+
+def _row_runs(row_numbers):
+    # Runs of adjacent row numbers as [first, last] pairs, in ascending order
+    runs = []
+    for row_number in sorted(row_numbers):
+        if runs and row_number == runs[-1][1] + 1:
+            runs[-1][1] = row_number
+        else:
+            runs.append([row_number, row_number])
+    return runs
+
+
+class SheetsBackend(StorageBackend):
+    """Google Sheets storage, matching the spreadsheet layout the bot has always used.
+
+    Roster row keys are sheet row numbers. Cell updates are staged in a
+    write-behind queue and sent as one batch write per flush window. New rows
+    are appended straight away: people also type rows into the tab directly,
+    so only the Sheets API knows where the roster currently ends. Deleting a row only blanks its cells (a tombstone), so no other
+    row moves and concurrent removals cannot hit the wrong row;
+    `compact_roster()` later removes the blank rows in one structural update.
+
+    The roster revision is the spreadsheet's Drive version number, which
+    needs the Google Drive API to be enabled for the project; without it the
+    backend reports no revision and the roster sync scans on every run.
+    The bot's own roster writes raise the version too, so the version is read
+    before and after each of them; when no one else changed the spreadsheet
+    in between, the version the write produced keeps reporting the revision
+    from before it, and the sync stays on its fast path.
+    It also reports none while writes that Sheets rejected are unaccounted
+    for, so the next sync scans the roster and re-reads those rows.
+    """
+
+    def __init__(self, sheets, spreadsheet_id, hero_data_spreadsheet_id, roster_sheet_id=None, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.sheets = sheets
+        self._spreadsheet_id = spreadsheet_id
+        self._hero_data_spreadsheet_id = hero_data_spreadsheet_id
+        self._roster_sheet_id = roster_sheet_id  # Looked up from the tab title when the roster is first loaded if not given
+        self._tombstones = 0  # Blank roster rows waiting for compaction
+        self._drive_available = True  # Cleared when the Drive API refuses the version lookup
+        self._own_version = None  # (Drive version after the bot's last write, the revision it stands for)
+        self._own_write_lock = asyncio.Lock()
+
+        self._writes = WriteBehindQueue(sheets, spreadsheet_id, ROSTER_SHEET, flush_interval, send=self._send_writes)
+
+        # Column layouts are resolved from the header rows on the first projected read
+        self._master_schema = SheetSchema('Master Tab', MASTER_TAB_COLUMNS)
+        self._roster_schema = SheetSchema(ROSTER_SHEET, ROSTER_COLUMNS, first_data_row=FIRST_ROSTER_ROW)
+
+    async def _get_fields(self, spreadsheet_id, schema, fields):
+        # Reads only the columns holding `fields`, as one batchGet of contiguous column ranges
+        if not schema.resolved:
+            header = await self.sheets.get_values(spreadsheet_id, schema.header_range)
+            schema.resolve(header[0] if header else [])
+        runs = schema.column_runs(fields)
+        value_ranges = await self.sheets.batch_get_values(spreadsheet_id, schema.ranges(runs))
+        return schema.assemble(runs, value_ranges)
+
+    async def load_catalog(self, master_fields=None):
+        if master_fields is None:
+            master_values = self.sheets.get_values(self._spreadsheet_id, MASTER_TAB_RANGE)
+        else:
+            master_values = self._get_fields(self._spreadsheet_id, self._master_schema, master_fields)
+        return await asyncio.gather(
+            master_values,
+            self.sheets.get_values(self._hero_data_spreadsheet_id, HERO_DATA_RANGE),
+        )
+
+    async def replace_catalog(self, master_values, hero_values):
+        await self.sheets.clear_values(self._spreadsheet_id, MASTER_TAB_RANGE)
+        await self.sheets.update_values(self._spreadsheet_id, MASTER_TAB_RANGE, master_values)
+        await self.sheets.clear_values(self._hero_data_spreadsheet_id, HERO_DATA_RANGE)
+        await self.sheets.update_values(self._hero_data_spreadsheet_id, HERO_DATA_RANGE, hero_values)
+
+    async def _resolve_roster_sheet_id(self):
+        spreadsheet = await self.sheets.get_spreadsheet(self._spreadsheet_id, fields="sheets.properties(sheetId,title)")
+        for sheet in spreadsheet.get('sheets', []):
+            if sheet['properties']['title'] == ROSTER_SHEET:
+                self._roster_sheet_id = sheet['properties']['sheetId']
+                return
+        raise RuntimeError(f"The spreadsheet has no '{ROSTER_SHEET}' tab")
+
+    async def load_roster(self, fields=None):
+        await self._writes.flush()
+        self._writes.rejected_rows.clear()  # Read back below
+        if self._roster_sheet_id is None:
+            await self._resolve_roster_sheet_id()
+        if fields is None:
+            values = await self.sheets.get_values(self._spreadsheet_id, ROSTER_RANGE)
+        else:
+            values = await self._get_fields(self._spreadsheet_id, self._roster_schema, fields)
+        self._tombstones = sum(1 for row in values if not row or not row[0])
+        return [(i + FIRST_ROSTER_ROW, row) for i, row in enumerate(values) if row and row[0]]
+
+    async def load_roster_rows(self, row_keys):
+        # Adjacent rows are read as one range, and up to MAX_RANGES_PER_READ ranges share one batchGet
+        await self._writes.flush()
+        runs = _row_runs(row_keys)
+        rows = []
+        for i in range(0, len(runs), MAX_RANGES_PER_READ):
+            chunk = runs[i:i + MAX_RANGES_PER_READ]
+            value_ranges = await self.sheets.batch_get_values(self._spreadsheet_id, [f"{ROSTER_SHEET}!A{first}:P{last}" for first, last in chunk])
+            for (first, _), values in zip(chunk, value_ranges):
+                rows.extend((first + offset, row) for offset, row in enumerate(values) if row and row[0])
+        return rows
+
+    async def _file_version(self):
+        if not self._drive_available:
+            return None
+        try:
+            return await self.sheets.get_file_version(self._spreadsheet_id)
+        except HttpError as e:
+            if e.resp.status not in (403, 404):
+                raise
+            log.warning("Could not read the spreadsheet's Drive version (HTTP %s), so every roster sync scans the sheet. Enable the Google Drive API for the project to skip unchanged scans", e.resp.status)
+            self._drive_available = False
+            return None
+
+    async def _own_write(self, write):
+        # Runs `write()`, noting the version it produced when nothing else changed the spreadsheet meanwhile
+        if not self._drive_available:
+            return await write()
+        async with self._own_write_lock:
+            before = await self._file_version()
+            result = await write()
+            after = await self._file_version()
+        if before is not None and after is not None:
+            own = self._own_version
+            # A version produced by the bot's previous write stands for the revision that one started from
+            self._own_version = (after, own[1] if own is not None and before == own[0] else before)
+        return result
+
+    async def _send_writes(self, data):
+        return await self._own_write(lambda: self.sheets.batch_update_values(self._spreadsheet_id, data))
+
+    async def roster_revision(self):
+        if self._writes.rejected_rows:
+            return None
+        version = await self._file_version()
+        own = self._own_version
+        if own is not None and version == own[0]:
+            return own[1]
+        return version
+
+    async def replace_roster(self, rows):
+        await self._writes.flush()
+        await self.sheets.clear_values(self._spreadsheet_id, ROSTER_RANGE)
+        await self.sheets.update_values(self._spreadsheet_id, ROSTER_RANGE, rows)
+        self._tombstones = 0
+
+    async def append_roster_row(self, row):
+        # Only the roster columns are searched for the end of the table, and the row overwrites empty cells rather
+        # than inserting a row, which would move every row below it. It may land in a gap left by a removed row.
+        result = await self._own_write(lambda: self.sheets.append_values(self._spreadsheet_id, ROSTER_RANGE, [row], insert_data_option='OVERWRITE'))
+
+        # The API reports where the row landed, e.g. "'User Hero Data'!A57:B57"
+        updated_range = result.get('updates', {}).get('updatedRange', '')
+        match = re.search(r'![A-Z]+(\d+)', updated_range)
+        if match is None:
+            raise RuntimeError(f"Could not determine the row of the appended hero from '{updated_range}'")
+        row_number = int(match.group(1))
+        # Writes still staged for a row cleared in the sheet belong to the hero that was there before
+        self._writes.discard_row(row_number)
+        return row_number
+
+    async def update_roster_row(self, row_key, first_column, values):
+        self._writes.stage(row_key, column_index(first_column), values)
+
+    async def delete_roster_row(self, row_key):
+        # Blank the row in place with the next batch; a blank user_id marks it as deleted for every reader
+        self._writes.discard_row(row_key)
+        self._writes.stage(row_key, 0, [""] * len(ROSTER_COLUMNS))
+        self._tombstones += 1
+
+    async def compact_roster(self):
+        if not self._tombstones:
+            return False
+        await self._writes.flush()
+
+        # The key columns are enough to find the blank rows
+        values = await self.sheets.get_values(self._spreadsheet_id, f"{ROSTER_SHEET}!A{FIRST_ROSTER_ROW}:B")
+        blank_rows = [i + FIRST_ROSTER_ROW for i, row in enumerate(values) if not row or not row[0]]
+        if blank_rows:
+            # Runs of adjacent blank rows, deleted bottom-up so earlier deletions don't move later ones
+            runs = _row_runs(blank_rows)
+            requests = [{
+                "deleteDimension": {
+                    "range": {
+                        "sheetId": self._roster_sheet_id,
+                        "dimension": "ROWS",
+                        "startIndex": first - 1,
+                        "endIndex": last,
+                    }
+                }
+            } for first, last in reversed(runs)]
+            await self.sheets.batch_update(self._spreadsheet_id, requests)
+        self._tombstones = 0
+        return True
+
+    async def flush(self):
+        await self._writes.flush()
+
+    def close(self):
+        self.sheets.close()
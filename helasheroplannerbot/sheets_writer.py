@@ -0,0 +1,161 @@
+import logging
+import time
+
+from records import RosterEntry
+from roster_store import RosterStore
+
+log = logging.getLogger(__name__)
+
+WRITER_LEASE = "sheets_writer"
+PUSH_BATCH_SIZE = 500  # Change log entries pushed to the spreadsheet per step
+
+
+class SheetsWriter:
+    """Keeps a shared store and the spreadsheets in step, from the one shard process holding the writer lease.
+
+    Every shard process has one and calls `step()` every few seconds. The
+    first process to take the lease in the shared store becomes the writer;
+    the others do nothing until its lease runs out. That keeps the Sheets
+    API usage of a sharded deployment the same as one process's.
+
+    The writer:
+
+    * pushes the roster changes the shards log in the shared store to the
+      spreadsheet, as one batch write per step
+    * copies edits made directly in the spreadsheet into the shared store,
+      with the incremental roster sync, every `sync_interval` seconds
+    * copies the hero catalog into the shared store every `catalog_ttl`
+      seconds, or when a shard asks for it with /reload_heroes
+    * deletes the blank rows that removals leave in the spreadsheet every
+      `compaction_interval` seconds (0 disables it)
+
+    On taking the lease it loads the spreadsheet's roster, pushes whatever
+    the shards changed while nobody was writing, and then makes the shared
+    store match the spreadsheet. A new store becomes readable for the shards
+    once that first copy is complete.
+
+    `store` must be a SharedStoreBackend with its own connection, so that
+    the rows the writer copies in show up as changes for its own process
+    too. `source` is the backend of the spreadsheets.
+    """
+
+    def __init__(self, store, source, holder, lease_ttl, catalog_ttl, sync_interval, compaction_interval=0):
+        self._store = store
+        self._source = source
+        self.holder = holder
+        self.lease_ttl = lease_ttl
+        self.catalog_ttl = catalog_ttl
+        self.sync_interval = sync_interval
+        self.compaction_interval = compaction_interval
+
+        self._roster = None  # Index of the spreadsheet's roster, while this process is the writer
+        self._synced_at = None
+        self._compacted_at = None
+        self.is_writer = False
+
+    async def step(self):
+        if not await self._hold_lease():
+            return
+        if not self.is_writer:
+            log.info("Process %s is now the Sheets writer", self.holder)
+            await self._take_over()
+            self.is_writer = True
+            if not await self._hold_lease():  # Taking over reads the whole roster, which can outlast the lease
+                return
+
+        await self._push()
+        if self.sync_interval > 0 and time.monotonic() - self._synced_at > self.sync_interval:
+            await self._pull()
+        if await self._store.catalog_due(self.catalog_ttl):
+            await self._copy_catalog()
+        if self.compaction_interval > 0 and time.monotonic() - self._compacted_at > self.compaction_interval:
+            self._compacted_at = time.monotonic()
+            await self._roster.compact()
+        await self._store.prune_changes()
+
+    async def _hold_lease(self):
+        if await self._store.acquire_lease(WRITER_LEASE, self.holder, self.lease_ttl):
+            return True
+        if self.is_writer:
+            log.warning("Lost the Sheets writer lease to another process")
+        self.is_writer = False
+        self._roster = None
+        return False
+
+    async def _take_over(self):
+        self._roster = RosterStore(self._source)
+        await self._roster.load()
+        self._synced_at = self._compacted_at = time.monotonic()
+        await self._push()
+        await self._reconcile()
+        if await self._store.catalog_due(self.catalog_ttl):
+            await self._copy_catalog()
+        await self._store.mark_seeded()
+
+    async def _push(self):
+        while True:
+            seq, rows, removed = await self._store.pending_pushes(PUSH_BATCH_SIZE)
+            if seq is None:
+                return
+
+            updates = {}
+            for _, row in rows:
+                entry = RosterEntry.from_row(row)
+                if self._roster.get_entry(entry.user_id, entry.hero_name) is None:
+                    await self._roster.add(entry.user_id, entry.hero_name)
+                updates[(entry.user_id, entry.hero_name)] = entry.to_row()[2:]
+            if updates:
+                await self._roster.update_rows('C', updates)
+            for user_id, hero_name in removed:
+                await self._roster.remove(user_id, hero_name)
+
+            # The log entries only count as pushed once the spreadsheet has them
+            if rows or removed:
+                await self._source.flush()
+                log.debug("Pushed %d changed and %d removed roster rows to the spreadsheet", len(rows), len(removed))
+            await self._store.mark_pushed(seq)
+
+    async def _pull(self):
+        self._synced_at = time.monotonic()
+        changed = await self._roster.sync()
+        if changed is None:
+            await self._reconcile()  # The spreadsheet's roster was reloaded, anything may have changed
+            return
+        if changed:
+            rows = []
+            removed = []
+            for user_id, hero_name in changed:
+                entry = self._roster.get_entry(user_id, hero_name)
+                if entry is None:
+                    removed.append((user_id, hero_name))
+                else:
+                    rows.append(entry.to_row())
+            copied = await self._store.apply_sheet_rows(rows, removed)
+            log.info("Copied %d roster rows edited in the spreadsheet into the shared store", copied)
+
+    async def _reconcile(self):
+        # Makes the shared store match the spreadsheet's roster, writing only the rows that differ
+        stored = await self._store.load_roster_by_key()
+        rows = []
+        for user_id, hero_name, entry in self._roster.entries():
+            row = entry.to_row()
+            stored_row = stored.pop((user_id, hero_name), None)
+            if stored_row is None or RosterEntry.from_row(stored_row).to_row() != row:
+                rows.append(row)
+        copied = await self._store.apply_sheet_rows(rows, list(stored))
+        log.info("Shared store matched with the spreadsheet, %d roster rows copied or removed", copied)
+
+    async def _copy_catalog(self):
+        master_values, hero_values = await self._source.load_catalog()
+        await self._store.store_catalog(master_values, hero_values)
+        log.info("Hero catalog copied into the shared store")
+
+    async def close(self):
+        # Hands the lease on straight away instead of letting the other processes wait for it to run out
+        if self.is_writer:
+            try:
+                await self._source.flush()
+            finally:
+                await self._store.release_lease(WRITER_LEASE, self.holder)
+        self._store.close()
+        self._source.close()
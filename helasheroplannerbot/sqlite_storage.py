@@ -0,0 +1,199 @@
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import ROSTER_COLUMNS, DuplicateRosterRowError, RosterRowMissingError, StorageBackend, column_index
+
+ROSTER_VALUE_COLUMNS = ROSTER_COLUMNS[2:]
+MAX_QUERY_PARAMETERS = 500  # Well below SQLite's limit on bound parameters per statement
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS master_tab (
+    position INTEGER PRIMARY KEY,
+    hero_name TEXT NOT NULL,
+    row_json TEXT NOT NULL
+);
+
+-- Position 0 holds the header row, like row 1 of the 'Hero Data General' tab
+CREATE TABLE IF NOT EXISTS hero_data (
+    position INTEGER PRIMARY KEY,
+    hero_name TEXT NOT NULL,
+    row_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hero_data_hero_name ON hero_data (hero_name);
+
+CREATE TABLE IF NOT EXISTS user_hero_data (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    hero_name TEXT NOT NULL,
+    {", ".join(f"{name} TEXT NOT NULL DEFAULT ''" for name in ROSTER_VALUE_COLUMNS)}
+);
+CREATE UNIQUE INDEX IF NOT EXISTS user_hero_data_user_hero ON user_hero_data (user_id, hero_name);
+CREATE INDEX IF NOT EXISTS user_hero_data_hero_name ON user_hero_data (hero_name);
+"""
+
+
+def _cell(value):
+    return "" if value is None else str(value)
+
+
+class SqliteBackend(StorageBackend):
+    """Local SQLite storage with the same data model as the spreadsheets.
+
+    sqlite3 connections belong to the thread that opened them, so every query
+    runs on one dedicated worker thread and is awaited from the event loop.
+    Roster row keys are the `user_hero_data.id` values.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self._path)
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _roster_changed(self, connection, row_keys):
+        # Called inside the transaction of every roster write, with the ids of the rows it touches
+        pass
+
+    def _load_catalog(self):
+        connection = self._connect()
+        master_values = [json.loads(row_json) for (row_json,) in connection.execute("SELECT row_json FROM master_tab ORDER BY position")]
+        hero_values = [json.loads(row_json) for (row_json,) in connection.execute("SELECT row_json FROM hero_data ORDER BY position")]
+        return master_values, hero_values
+
+    async def load_catalog(self, master_fields=None):
+        # Local reads are cheap, so projections are ignored and full rows are returned
+        return await self._run(self._load_catalog)
+
+    def _replace_catalog(self, master_values, hero_values):
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM master_tab")
+            connection.executemany(
+                "INSERT INTO master_tab (position, hero_name, row_json) VALUES (?, ?, ?)",
+                [(i, row[0] if row else "", json.dumps(row)) for i, row in enumerate(master_values)],
+            )
+            connection.execute("DELETE FROM hero_data")
+            connection.executemany(
+                "INSERT INTO hero_data (position, hero_name, row_json) VALUES (?, ?, ?)",
+                [(i, row[0] if row else "", json.dumps(row)) for i, row in enumerate(hero_values)],
+            )
+
+    async def replace_catalog(self, master_values, hero_values):
+        await self._run(self._replace_catalog, master_values, hero_values)
+
+    def _load_roster(self):
+        connection = self._connect()
+        cursor = connection.execute(f"SELECT id, {', '.join(ROSTER_COLUMNS)} FROM user_hero_data ORDER BY id")
+        return [(row[0], list(row[1:])) for row in cursor]
+
+    async def load_roster(self, fields=None):
+        return await self._run(self._load_roster)
+
+    def _load_roster_rows(self, row_keys):
+        connection = self._connect()
+        row_keys = sorted(row_keys)
+        rows = []
+        for i in range(0, len(row_keys), MAX_QUERY_PARAMETERS):
+            chunk = row_keys[i:i + MAX_QUERY_PARAMETERS]
+            cursor = connection.execute(
+                f"SELECT id, {', '.join(ROSTER_COLUMNS)} FROM user_hero_data WHERE id IN ({', '.join('?' for _ in chunk)}) ORDER BY id",
+                chunk,
+            )
+            rows.extend((row[0], list(row[1:])) for row in cursor)
+        return rows
+
+    async def load_roster_rows(self, row_keys):
+        return await self._run(self._load_roster_rows, row_keys)
+
+    def _roster_revision(self):
+        # Changes whenever another connection (the sqlite3 shell, a migration) commits; the bot's own writes leave it as is
+        return self._connect().execute("PRAGMA data_version").fetchone()[0]
+
+    async def roster_revision(self):
+        return await self._run(self._roster_revision)
+
+    def _replace_roster(self, rows):
+        connection = self._connect()
+        placeholders = ", ".join("?" for _ in ROSTER_COLUMNS)
+        with connection:
+            connection.execute("DELETE FROM user_hero_data")
+            connection.executemany(
+                f"INSERT OR REPLACE INTO user_hero_data ({', '.join(ROSTER_COLUMNS)}) VALUES ({placeholders})",
+                [
+                    [_cell(row[i]) if i < len(row) else "" for i in range(len(ROSTER_COLUMNS))]
+                    for row in rows if len(row) >= 2 and row[0]
+                ],
+            )
+
+    async def replace_roster(self, rows):
+        await self._run(self._replace_roster, rows)
+
+    def _append_roster_row(self, row):
+        connection = self._connect()
+        columns = ROSTER_COLUMNS[:len(row)]
+        with connection:
+            try:
+                cursor = connection.execute(
+                    f"INSERT INTO user_hero_data ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    [_cell(value) for value in row],
+                )
+            except sqlite3.IntegrityError as e:
+                raise DuplicateRosterRowError(f"User {row[0]} already tracks {row[1]}") from e
+            self._roster_changed(connection, [cursor.lastrowid])
+        return cursor.lastrowid
+
+    async def append_roster_row(self, row):
+        return await self._run(self._append_roster_row, row)
+
+    async def update_roster_row(self, row_key, first_column, values):
+        await self._run(self._update_roster_rows, first_column, [(row_key, values)])
+
+    def _update_roster_rows(self, first_column, updates):
+        connection = self._connect()
+        start = column_index(first_column)
+        with connection:
+            for row_key, values in updates:
+                columns = ROSTER_COLUMNS[start:start + len(values)]
+                cursor = connection.execute(
+                    f"UPDATE user_hero_data SET {', '.join(f'{name} = ?' for name in columns)} WHERE id = ?",
+                    [_cell(value) for value in values] + [row_key],
+                )
+                if cursor.rowcount != 1:
+                    raise RosterRowMissingError(f"No roster row with id {row_key}")  # Rolls back the whole batch
+            self._roster_changed(connection, [row_key for row_key, _ in updates])
+
+    async def update_roster_rows(self, first_column, updates):
+        # All rows are written in one transaction
+        await self._run(self._update_roster_rows, first_column, updates)
+
+    def _delete_roster_row(self, row_key):
+        connection = self._connect()
+        with connection:
+            self._roster_changed(connection, [row_key])  # Before the row is gone, so its key can still be read
+            if connection.execute("DELETE FROM user_hero_data WHERE id = ?", (row_key,)).rowcount != 1:
+                raise RosterRowMissingError(f"No roster row with id {row_key}")
+
+    async def delete_roster_row(self, row_key):
+        await self._run(self._delete_roster_row, row_key)
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def close(self):
+        # Queued behind any statements still pending; the worker thread drains them and exits without blocking the caller
+        self._executor.submit(self._close)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,104 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+
+log = logging.getLogger(__name__)
+
+STARTING = "starting"
+WARMING = "warming"
+READY = "ready"
+DEGRADED = "degraded"  # Warm-up failed; commands still run and load what they need on demand
+
+DEFAULT_QUEUE_TIMEOUT = 60  # Longest a command waits for warm-up before running anyway
+
+
+class Readiness:
+    """Startup state of the bot, and the queue for commands that arrive before warm-up has finished.
+
+    Commands decorated with `gate` are acknowledged straight away and then
+    wait until `finish()` is called, so they run against warm caches instead
+    of all paying the cold-start cost at once.
+    """
+
+    def __init__(self, queue_timeout=DEFAULT_QUEUE_TIMEOUT):
+        self.state = STARTING
+        self.queue_timeout = queue_timeout
+        self.queued = 0
+        self._finished = asyncio.Event()
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def start(self):
+        self.state = WARMING
+
+    def finish(self, state=READY):
+        self.state = state
+        self._finished.set()
+
+    async def wait(self):
+        if self._finished.is_set():
+            return
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._finished.wait(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            log.warning("Warm-up is still running after %ss, running a queued command anyway", self.queue_timeout)
+        finally:
+            self.queued -= 1
+
+    def gate(self, func):
+        """Decorator for slash command callbacks that holds them until warm-up has finished."""
+        @functools.wraps(func)
+        async def wrapper(interaction, *args, **kwargs):
+            if not self._finished.is_set():
+                # Acknowledge now so the interaction token doesn't expire while the command waits
+                if not interaction.response.is_done():
+                    await interaction.response.defer()
+                await self.wait()
+            return await func(interaction, *args, **kwargs)
+        return wrapper
+
+
+async def defer(interaction, **kwargs):
+    # Commands queued by Readiness.gate have already been deferred
+    if not interaction.response.is_done():
+        await interaction.response.defer(**kwargs)
+
+
+def command_tree_hash(tree):
+    payload = []
+    for command in tree.get_commands():
+        try:
+            payload.append(command.to_dict(tree))  # discord.py 2.4+
+        except TypeError:
+            payload.append(command.to_dict())
+    payload.sort(key=lambda command: command["name"])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def sync_command_tree(tree, state_file, force=False):
+    """Syncs the application commands only when their definitions changed since the last sync.
+
+    The hash of the synced command set is kept in `state_file`. Returns True
+    when a sync was sent to Discord.
+    """
+    digest = command_tree_hash(tree)
+    try:
+        with open(state_file) as f:
+            previous = f.read().strip()
+    except FileNotFoundError:
+        previous = None
+
+    if not force and digest == previous:
+        log.info("Command tree unchanged since the last sync, skipping it")
+        return False
+
+    await tree.sync()
+    with open(state_file, "w") as f:
+        f.write(digest)
+    log.info("Command tree synced (%s)", digest[:12])
+    return True
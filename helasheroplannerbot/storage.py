@@ -0,0 +1,194 @@
+import contextlib
+import functools
+
+ROSTER_SHEET = 'User Hero Data'
+
+# Columns A to P of the 'User Hero Data' tab: the key, the user's inputs (C-F) and the derived values (G-P)
+ROSTER_COLUMNS = (
+    "user_id",
+    "hero_name",
+    "current_level",
+    "current_relics",
+    "next_goal_level",
+    "ultimate_goal_level",
+    "next_unlock",
+    "relics_to_next_unlock",
+    "relics_to_next_goal",
+    "relics_to_ultimate_goal",
+    "xp_to_next_unlock",
+    "oaths_to_next_unlock",
+    "xp_to_next_goal",
+    "oaths_to_next_goal",
+    "xp_to_ultimate_goal",
+    "oaths_to_ultimate_goal",
+)
+ROSTER_KEY_FIELDS = ROSTER_COLUMNS[:2]
+ROSTER_INPUT_FIELDS = ROSTER_COLUMNS[2:6]
+ROSTER_DERIVED_FIELDS = ROSTER_COLUMNS[6:]
+
+GOOGLE_API_VERSIONS = {"sheets": "v4", "drive": "v3"}
+GOOGLE_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive.metadata.readonly',  # Only read for the spreadsheet's version number, see SheetsBackend.roster_revision()
+]
+
+
+def column_letter(index):
+    # 0 -> A, 25 -> Z, 26 -> AA, ...
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def column_index(letter):
+    index = 0
+    for char in letter:
+        index = index * 26 + ord(char) - ord('A') + 1
+    return index - 1
+
+
+class RosterRowMissingError(LookupError):
+    """A roster write addressed a row key that storage no longer has, so the in-memory index is out of date."""
+
+
+class DuplicateRosterRowError(ValueError):
+    """The user already tracks the hero in storage, though the in-memory index didn't have it yet."""
+
+
+class StorageBackend:
+    """Where the hero catalog and the user hero rosters are persisted.
+
+    Catalog values use the same shapes as the spreadsheet ranges they came
+    from: Master Tab rows from A2:E, and Hero Data General rows from A1:ZZ
+    with the header row first. Roster rows are lists of column A-P values
+    addressed by an opaque row key chosen by the backend.
+
+    The load methods take an optional list of field names. A backend may then
+    fetch only those columns and leave the others empty; None loads
+    everything, which is what migrations need.
+    """
+
+    # Row keys are stable: deleting a row never changes the key of another row, except in compact_roster()
+
+    async def load_catalog(self, master_fields=None):
+        # `master_fields` name Master Tab columns; 'Hero Data General' is always loaded in full for /hero_info
+        raise NotImplementedError
+
+    async def replace_catalog(self, master_values, hero_values):
+        raise NotImplementedError
+
+    async def catalog_revision(self):
+        # A cheap token that changes whenever the stored catalog changes, or None when the backend has none
+        return None
+
+    async def refresh_catalog(self):
+        # Has a backend that holds a copy of the catalog re-read it from its source; backends that are the source do nothing
+        pass
+
+    async def load_roster(self, fields=None):
+        # Returns a list of (row_key, row values) pairs in storage order; `fields` are ROSTER_COLUMNS names
+        raise NotImplementedError
+
+    async def load_roster_rows(self, row_keys):
+        # Returns (row_key, row values) pairs with every column for just these rows, skipping rows that are empty
+        raise NotImplementedError
+
+    async def roster_revision(self):
+        # A cheap token that changes whenever the stored roster may have changed, or None when the backend has none
+        return None
+
+    async def roster_changes(self, since):
+        """Rows that other writers changed after roster revision `since`, for backends that keep a change log.
+
+        Returns (revision, rows, removed): the revision the changes go up to,
+        the (row_key, row values) of every changed row that still exists, and
+        the (user_id, hero_name) of every removed one. Returns None when the
+        backend has no change log, or no longer has entries back to `since`.
+        """
+        return None
+
+    @contextlib.asynccontextmanager
+    async def lock_users(self, user_ids):
+        """Holds these users' roster rows against writes from other processes sharing the storage.
+
+        Yields the users' current (row_key, row values) pairs, read under the
+        lock, or None when the process's own index is all there is to know.
+        """
+        yield None
+
+    async def replace_roster(self, rows):
+        raise NotImplementedError
+
+    async def append_roster_row(self, row):
+        # Returns the row key of the new row; raises DuplicateRosterRowError if storage already has the user's hero
+        raise NotImplementedError
+
+    async def update_roster_row(self, row_key, first_column, values):
+        # Writes `values` into consecutive columns of the row, starting at column letter `first_column`
+        raise NotImplementedError
+
+    async def update_roster_rows(self, first_column, updates):
+        # Batch form of update_roster_row for a list of (row_key, values) pairs
+        for row_key, values in updates:
+            await self.update_roster_row(row_key, first_column, values)
+
+    async def delete_roster_row(self, row_key):
+        raise NotImplementedError
+
+    async def compact_roster(self):
+        # Reclaims the space of deleted rows; returns True when row keys may have changed and the roster must be reloaded
+        return False
+
+    async def flush(self):
+        # Persists any writes the backend is still holding back
+        pass
+
+    def close(self):
+        pass
+
+
+def connect_google(service_account_file, api):
+    """Builds the client for a Google API ("sheets" or "drive"); called by the Sheets gateway when it first uses that API.
+
+    The API surface comes from the discovery document bundled with
+    googleapiclient (static discovery), so building it needs no network
+    round-trip and nothing is written to a discovery cache.
+    """
+    from googleapiclient.discovery import build
+    from google.oauth2 import service_account
+
+    creds = service_account.Credentials.from_service_account_file(service_account_file, scopes=GOOGLE_SCOPES)
+    return build(api, GOOGLE_API_VERSIONS[api], credentials=creds, static_discovery=True, cache_discovery=False), creds
+
+
+def create_storage_backend(config):
+    # Backends are imported lazily so the SQLite engine never needs the Google client libraries
+    if config.STORAGE_BACKEND == "sqlite":
+        from sqlite_storage import SqliteBackend
+
+        return SqliteBackend(config.SQLITE_DATABASE_FILE)
+
+    if config.STORAGE_BACKEND == "sheets":
+        from sheets_gateway import SheetsGateway
+        from sheets_storage import SheetsBackend
+
+        sheets = SheetsGateway(
+            functools.partial(connect_google, config.SERVICE_ACCOUNT_FILE),
+            max_workers=config.SHEETS_MAX_WORKERS,
+            timeout=config.SHEETS_TIMEOUT,
+            reads_per_minute=config.SHEETS_READS_PER_MINUTE,
+            writes_per_minute=config.SHEETS_WRITES_PER_MINUTE,
+            max_retries=config.SHEETS_MAX_RETRIES,
+        )
+        return SheetsBackend(
+            sheets,
+            config.SPREADSHEET_ID,
+            config.SPREADSHEET_ID_HERO_DATA,
+            roster_sheet_id=config.USER_HERO_DATA_SHEET_ID,
+            flush_interval=config.ROSTER_WRITE_FLUSH_INTERVAL,
+        )
+
+    raise ValueError(f"Unknown storage backend '{config.STORAGE_BACKEND}', expected 'sheets' or 'sqlite'")
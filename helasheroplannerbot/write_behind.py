@@ -0,0 +1,133 @@
+import asyncio
+import functools
+import logging
+
+from googleapiclient.errors import HttpError
+
+from metrics import current_command
+from storage import column_letter
+
+log = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 2.0  # Seconds that pending row writes are collected before one batch write
+
+
+def _rejected(error):
+    # A 4xx other than a rate limit means Sheets refuses the request itself, so sending it again cannot help
+    return isinstance(error, HttpError) and 400 <= error.resp.status < 500 and error.resp.status != 429
+
+
+class WriteBehindQueue:
+    """Coalesces roster cell writes into one Sheets `values().batchUpdate` per flush window.
+
+    Staged values are keyed by (row number, column), so repeated edits of the
+    same cells inside one window collapse into a single write, and all rows
+    staged in the window share one API call. Callers keep their own in-memory
+    copy of what they staged, which gives read-your-writes consistency before
+    the flush lands.
+
+    A batch that fails is put back and sent again with the next flush. When
+    Sheets rejects it outright (a 4xx), its ranges are sent one at a time
+    instead and the ones rejected again are dropped, so one bad range cannot
+    hold back every other write; their rows are kept in `rejected_rows` for
+    the owner to re-read.
+
+    Batches are written with `send(data)`, which defaults to the gateway's
+    `batch_update_values()`; the owner can wrap it to observe its writes.
+    """
+
+    def __init__(self, sheets, spreadsheet_id, sheet_name, flush_interval=DEFAULT_FLUSH_INTERVAL, send=None):
+        self._send = send or functools.partial(sheets.batch_update_values, spreadsheet_id)
+        self._sheet_name = sheet_name
+        self.flush_interval = flush_interval
+
+        self._pending = {}  # row number -> {column index: value}
+        self.rejected_rows = set()  # Rows with dropped writes, whose stored values may differ from what was staged
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def pending_rows(self):
+        return len(self._pending)
+
+    def stage(self, row_number, first_column_index, values):
+        cells = self._pending.setdefault(row_number, {})
+        for offset, value in enumerate(values):
+            column = first_column_index + offset
+            # None leaves a cell untouched in the Sheets API, so it must not undo an earlier staged value
+            if value is None and column in cells:
+                continue
+            cells[column] = value
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # The task inherits the context of whichever command staged the first write; the batch belongs to nobody in particular
+        current_command.set("background")
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception:
+            log.exception("An error occurred while flushing roster writes, they will be retried")
+        finally:
+            # Writes staged while this flush was running, or a failed batch, go out in the next window
+            if self._pending:
+                self._flush_task = asyncio.create_task(self._flush_later())
+
+    def _ranges(self, pending):
+        # One range per run of adjacent columns in each row
+        data = []
+        for row_number, cells in sorted(pending.items()):
+            columns = sorted(cells)
+            run = [columns[0]]
+            for column in columns[1:] + [None]:
+                if column is not None and column == run[-1] + 1:
+                    run.append(column)
+                    continue
+                data.append({
+                    'range': f"{self._sheet_name}!{column_letter(run[0])}{row_number}:{column_letter(run[-1])}{row_number}",
+                    'values': [[cells[c] for c in run]],
+                })
+                if column is not None:
+                    run = [column]
+        return data
+
+    def _requeue(self, pending):
+        # Puts writes back underneath anything staged while they were in flight
+        for row_number, cells in pending.items():
+            newer = self._pending.get(row_number, {})
+            cells.update(newer)
+            self._pending[row_number] = cells
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            try:
+                await self._send(self._ranges(pending))
+            except Exception as e:
+                if not _rejected(e):
+                    self._requeue(pending)
+                    raise
+                log.warning("Sheets rejected the batch of roster writes for %d rows (HTTP %s), sending its ranges one at a time", len(pending), e.resp.status)
+                await self._flush_one_by_one(pending)
+                return
+            log.debug("Flushed roster writes for %d rows in one batch", len(pending))
+
+    async def _flush_one_by_one(self, pending):
+        for row_number in sorted(pending):
+            for item in self._ranges({row_number: pending[row_number]}):
+                try:
+                    await self._send([item])
+                except Exception as e:
+                    if not _rejected(e):
+                        # Whatever is left goes out with the next flush; resending a range already written is harmless
+                        self._requeue({row: cells for row, cells in pending.items() if row >= row_number})
+                        raise
+                    log.error("Sheets rejected the roster write to %s (HTTP %s), dropping it: %s", item['range'], e.resp.status, e)
+                    self.rejected_rows.add(row_number)
+
+    def discard_row(self, row_number):
+        self._pending.pop(row_number, None)
@@ -0,0 +1,29 @@
+"""Shared fixtures for the offline tests: a small spreadsheet on the fake Sheets API, and backends over it."""
+from fake_sheets import FakeSheetsGateway, FakeSheetsServer
+from sheets_storage import SheetsBackend
+from storage import ROSTER_COLUMNS, ROSTER_SHEET
+
+SPREADSHEET_ID = "roster-spreadsheet"
+HERO_DATA_SPREADSHEET_ID = "hero-data-spreadsheet"
+
+
+def roster_server(rows):
+    # `rows` are 'User Hero Data' rows below the header row
+    header = [column.replace("_", " ").title() for column in ROSTER_COLUMNS]
+    return FakeSheetsServer({
+        SPREADSHEET_ID: {
+            "Master Tab": [["Name", "", "", "", "Rarity"], ["Alpha", "", "", "", "Common"], ["Beta", "", "", "", "Epic"]],
+            ROSTER_SHEET: [header] + [list(row) for row in rows],
+        },
+        HERO_DATA_SPREADSHEET_ID: {"Hero Data General": [["Name", "Rarity", "Max Level"], ["Alpha", "Common", "40"], ["Beta", "Epic", "60"]]},
+    })
+
+
+def sheets_backend(server, flush_interval=60):
+    # A long flush interval keeps writes staged until a test flushes them explicitly
+    gateway = FakeSheetsGateway(server, max_workers=2, reads_per_minute=100000, writes_per_minute=100000)
+    return SheetsBackend(gateway, SPREADSHEET_ID, HERO_DATA_SPREADSHEET_ID, flush_interval=flush_interval)
+
+
+def roster_tab(server):
+    return server.tab(SPREADSHEET_ID, ROSTER_SHEET)
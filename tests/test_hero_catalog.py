@@ -0,0 +1,52 @@
+import asyncio
+import unittest
+
+from hero_catalog import HeroCatalog
+from sqlite_storage import SqliteBackend
+
+
+class CountingBackend(SqliteBackend):
+    def __init__(self, path):
+        super().__init__(path)
+        self.catalog_loads = 0
+
+    async def load_catalog(self, master_fields=None):
+        self.catalog_loads += 1
+        await asyncio.sleep(0.01)  # Long enough for every caller to arrive while the first load runs
+        return await super().load_catalog(master_fields)
+
+
+class HeroCatalogTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.storage = CountingBackend(":memory:")
+        await self.storage.replace_catalog(
+            [["Alpha", "", "", "", "Common"], ["Beta", "", "", "", "Epic"]],
+            [["Name", "Rarity", "Max Level"], ["Alpha", "Common", "40"], ["Beta", "Epic", "60"]],
+        )
+        self.catalog = HeroCatalog(self.storage, ttl=3600)
+
+    async def asyncTearDown(self):
+        self.storage.close()
+
+    async def test_concurrent_first_use_loads_once(self):
+        await asyncio.gather(*(self.catalog.ensure_fresh() for _ in range(10)))
+
+        self.assertEqual(self.storage.catalog_loads, 1)
+        self.assertEqual(self.catalog.find_hero("Beta").max_level, 60)
+
+    async def test_explicit_load_always_reloads(self):
+        await self.catalog.ensure_fresh()
+        await self.catalog.load()
+
+        self.assertEqual(self.storage.catalog_loads, 2)
+        self.assertEqual(self.catalog.version, 2)
+
+    async def test_max_level_is_found_by_its_header(self):
+        await self.storage.replace_catalog(
+            [["Alpha", "", "", "", "Common"]],
+            [["Name", "Max Level", "Rarity"], ["Alpha", "45", "Common"]],
+        )
+
+        await self.catalog.load()
+
+        self.assertEqual(self.catalog.find_hero("Alpha").max_level, 45)
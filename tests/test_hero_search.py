@@ -0,0 +1,25 @@
+import unittest
+
+from hero_search import HeroNameIndex
+
+
+class HeroNameIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = HeroNameIndex(["Dragonslayer", "Red Dragon", "Drake", "Sandra", "Alpha", "Alpha", "Dra"])
+
+    def test_exact_match_comes_first_then_prefix_word_and_substring_matches(self):
+        self.assertEqual(self.index.search("dra"), ["Dra", "Dragonslayer", "Drake", "Red Dragon", "Sandra"])
+
+    def test_query_is_trimmed_and_case_insensitive(self):
+        self.assertEqual(self.index.search("  RED dr "), ["Red Dragon"])
+
+    def test_typos_fall_back_to_fuzzy_matches(self):
+        self.assertEqual(self.index.search("Dragnslayer"), ["Dragonslayer"])
+        self.assertEqual(self.index.search("Dragnslayer", fuzzy=False), [])
+
+    def test_empty_query_lists_names_alphabetically_up_to_the_limit(self):
+        self.assertEqual(self.index.search("", limit=3), ["Alpha", "Dra", "Dragonslayer"])
+
+    def test_duplicate_names_are_listed_once(self):
+        self.assertEqual(len(self.index), 6)
+        self.assertEqual(self.index.search("alpha"), ["Alpha"])
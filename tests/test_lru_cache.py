@@ -0,0 +1,41 @@
+import unittest
+
+from lru_cache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")  # "b" is now the least recently used
+        cache.put("c", 3)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_putting_an_existing_key_refreshes_it(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("a", 10)
+        cache.put("c", 3)
+
+        self.assertEqual(cache.get("a"), 10)
+        self.assertNotIn("b", cache)
+
+    def test_hits_and_misses_are_counted(self):
+        cache = LRUCache(2)
+        self.assertEqual(cache.hit_rate, 0.0)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("a")
+        cache.get("missing")
+
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertAlmostEqual(cache.hit_rate, 2 / 3)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
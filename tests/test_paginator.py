@@ -0,0 +1,101 @@
+import types
+import unittest
+
+import discord
+
+from paginator import PaginatedView, _JumpModal
+
+OWNER_ID = 1
+
+
+class FakeResponse:
+    def __init__(self):
+        self.edits = []
+        self.messages = []
+
+    async def edit_message(self, **kwargs):
+        self.edits.append(kwargs)
+
+    async def send_message(self, content, ephemeral=False):
+        self.messages.append(content)
+
+
+class FakeComponentInteraction:
+    # What a button press or menu choice hands the view
+    def __init__(self, user_id=OWNER_ID):
+        self.user = types.SimpleNamespace(id=user_id)
+        self.response = FakeResponse()
+
+
+def render(entries, page_index, page_count):
+    return discord.Embed(title=f"Page {page_index + 1}/{page_count}", description=", ".join(map(str, entries)))
+
+
+class PaginatedViewTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.rendered = 0
+
+        def counting_render(*args):
+            self.rendered += 1
+            return render(*args)
+
+        self.view = PaginatedView(list(range(1, 26)), counting_render, per_page=10, owner_id=OWNER_ID,
+                                  filters={"Parity": {"Even": lambda n: n % 2 == 0, "Odd": lambda n: n % 2 == 1, "Neither": lambda n: False}})
+
+    async def asyncTearDown(self):
+        self.view.stop()
+
+    async def jump(self, text):
+        interaction = FakeComponentInteraction()
+        modal = _JumpModal(self.view)
+        modal.page_number._refresh_state(interaction, {"value": text})  # What Discord's modal submit fills in
+        await modal.on_submit(interaction)
+        return interaction
+
+    async def test_jump_goes_to_the_page_and_clamps_out_of_range_numbers(self):
+        interaction = await self.jump("3")
+        self.assertEqual(self.view.page, 2)
+        self.assertEqual(interaction.response.edits[0]["embed"].description, "21, 22, 23, 24, 25")
+        self.assertTrue(self.view.next_button.disabled)
+        self.assertFalse(self.view.previous_button.disabled)
+
+        await self.jump("999")
+        self.assertEqual(self.view.page, 2)
+        await self.jump("-4")
+        self.assertEqual(self.view.page, 0)
+
+    async def test_jump_rejects_text_that_is_not_a_number(self):
+        interaction = await self.jump("two")
+
+        self.assertEqual(interaction.response.messages, ["'two' is not a page number."])
+        self.assertEqual(interaction.response.edits, [])
+
+    async def test_filter_restarts_at_the_first_page_of_the_matching_entries(self):
+        await self.view.show_page(FakeComponentInteraction(), 2)
+        interaction = FakeComponentInteraction()
+
+        await self.view.set_filter(interaction, "Parity", "Even")
+
+        self.assertEqual((self.view.page, self.view.page_count), (0, 2))
+        embed = interaction.response.edits[0]["embed"]
+        self.assertEqual(embed.description, "2, 4, 6, 8, 10, 12, 14, 16, 18, 20")
+        self.assertEqual(embed.footer.text, "Filtered by Even")
+
+    async def test_filter_matching_nothing_says_so(self):
+        await self.view.set_filter(FakeComponentInteraction(), "Parity", "Neither")
+
+        self.assertEqual(self.view.page_count, 1)
+        self.assertEqual(self.view.current_embed().description, "Nothing matches the selected filters.")
+        self.assertTrue(self.view.jump_button.disabled)
+
+    async def test_pages_already_shown_are_not_rendered_again(self):
+        for page in (0, 1, 0, 1):
+            await self.view.show_page(FakeComponentInteraction(), page)
+
+        self.assertEqual(self.rendered, 2)
+
+    async def test_only_the_owner_can_use_the_controls(self):
+        stranger = FakeComponentInteraction(user_id=2)
+
+        self.assertFalse(await self.view.interaction_check(stranger))
+        self.assertTrue(await self.view.interaction_check(FakeComponentInteraction()))
@@ -0,0 +1,52 @@
+import unittest
+
+import discord
+
+import helaheroplannerbot
+from benchmark import FakeInteraction
+from sqlite_storage import SqliteBackend
+
+USER_ID = 100000000000000001
+HERO_COUNT = 120
+
+
+class RecordingInteraction(FakeInteraction):
+    # Keeps every message's embeds, to check them against Discord's limits
+    def __init__(self, command, user_id):
+        super().__init__(command, user_id)
+        self.messages = []
+
+    async def _reply(self, content, kwargs):
+        await super()._reply(content, kwargs)
+        self.messages.append(([kwargs["embed"]] if kwargs.get("embed") else []) + list(kwargs.get("embeds") or []))
+
+
+class PlanAllTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.storage = SqliteBackend(":memory:")
+        names = [f"Hero With A Long Name {i:03d}" for i in range(HERO_COUNT)]
+        await self.storage.replace_catalog(
+            [[name, "", "", "", "Epic"] for name in names],
+            [["Name", "Rarity", "Max Level"]] + [[name, "Epic", "60"] for name in names],
+        )
+        await self.storage.replace_roster([[str(USER_ID), name, "12", "345", "40", "60"] for name in names] + [[str(USER_ID), "Retired Hero", "1"]])
+        self.bot = helaheroplannerbot
+        self.bot.create_app(storage_backend=self.storage)
+        await self.bot.hero_catalog.load()
+        await self.bot.roster.load()
+        self.bot.readiness.finish()
+
+    async def asyncTearDown(self):
+        self.storage.close()
+
+    async def test_every_message_fits_discords_limits(self):
+        interaction = RecordingInteraction(self.bot.plan_all, USER_ID)
+        await self.bot.plan_all.callback(interaction, goal="ultimate_goal")
+
+        self.assertFalse(interaction.failed, interaction.replies)
+        for embeds in interaction.messages:
+            self.assertLessEqual(sum(len(embed) for embed in embeds), 6000)
+            for embed in embeds:
+                self.assertIsInstance(embed, discord.Embed)
+                self.assertTrue(all(len(field.value) <= 1024 for field in embed.fields))
+        self.assertIn("Retired Hero", interaction.messages[0][0].footer.text)
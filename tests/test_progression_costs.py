@@ -0,0 +1,80 @@
+import itertools
+import unittest
+
+from progression_costs import (
+    MAX_TABLE_LEVEL, OATH_COSTS, OATH_MILESTONES, OATH_TABLE, RELIC_COSTS, RELIC_MILESTONES, RELIC_TABLE, XP_COSTS,
+    XP_MILESTONES, XP_TABLE, cost_between, requirements, roster_requirements,
+)
+
+
+# The per-milestone summation the commands used before the cumulative tables, as the reference
+def old_cost(current_level, target_level, milestones, costs):
+    if current_level >= target_level:
+        return "Current level is higher than the target level"
+    elif target_level == 1:  # Special case for level 1, no oaths needed
+        return 0
+    milestones_in_range = [level for level in milestones if current_level < level <= target_level]
+    return sum(costs[milestones.index(level)] for level in milestones_in_range)
+
+
+def old_relics_to_goal(current_level, current_relics, goal_level, goal_name, unset_message):
+    if goal_level is None:
+        return unset_message
+    if current_level >= goal_level:
+        return f"Current level is higher than {goal_name} level, please adjust using /manage_hero"
+    milestones_in_range = [level for level in RELIC_MILESTONES if current_level < level <= goal_level]
+    needed = sum(RELIC_COSTS[RELIC_MILESTONES.index(level)] for level in milestones_in_range) - current_relics
+    if needed < 0:
+        return f"You already have enough relics for the {goal_name} level"
+    return needed
+
+
+def old_requirements(current_level, current_relics, max_level, next_goal_level, ultimate_goal_level):
+    next_unlock = next((level for level in RELIC_MILESTONES if level > current_level and level <= max_level), "Hero Already Maxed")
+    if next_unlock == "Hero Already Maxed":
+        relics_to_next_unlock = "Hero Already Maxed"
+    else:
+        relics_to_next_unlock = RELIC_COSTS[RELIC_MILESTONES.index(next_unlock)] - current_relics
+        if relics_to_next_unlock < 0:
+            relics_to_next_unlock = "You already have enough relics for the next unlock level"
+    relics_to_next_goal = old_relics_to_goal(current_level, current_relics, next_goal_level, "next goal", "No next goal level has been set")
+    relics_to_ultimate_goal = old_relics_to_goal(current_level, current_relics, ultimate_goal_level, "ultimate goal", "No ultimate goal level has been set")
+
+    if next_unlock == "Hero Already Maxed":
+        xp_to_next_unlock = oaths_to_next_unlock = "Hero Already Maxed"
+    else:
+        xp_to_next_unlock = old_cost(current_level, int(next_unlock), XP_MILESTONES, XP_COSTS)
+        oaths_to_next_unlock = old_cost(current_level, int(next_unlock), OATH_MILESTONES, OATH_COSTS)
+    xp_to_next_goal = old_cost(current_level, next_goal_level, XP_MILESTONES, XP_COSTS) if next_goal_level else "No next goal level has been set"
+    oaths_to_next_goal = old_cost(current_level, next_goal_level, OATH_MILESTONES, OATH_COSTS) if next_goal_level else "No next goal level has been set"
+    xp_to_ultimate_goal = old_cost(current_level, ultimate_goal_level, XP_MILESTONES, XP_COSTS) if ultimate_goal_level else "No ultimate goal level has been set"
+    oaths_to_ultimate_goal = old_cost(current_level, ultimate_goal_level, OATH_MILESTONES, OATH_COSTS) if ultimate_goal_level else "No ultimate goal level has been set"
+
+    return (next_unlock, relics_to_next_unlock, relics_to_next_goal, relics_to_ultimate_goal,
+            xp_to_next_unlock, oaths_to_next_unlock, xp_to_next_goal, oaths_to_next_goal, xp_to_ultimate_goal, oaths_to_ultimate_goal)
+
+
+LEVELS = range(0, MAX_TABLE_LEVEL + 1)  # Level 0 is how a blank current level is planned
+GOALS = [None, 0, 1, 2, 9, 10, 11, 30, 31, 59, 60]  # Unset, blank, the first and last levels and both sides of milestones
+MAX_LEVELS = [1, 39, 40, 60]
+RELICS = [0, 6100, 10 ** 7]
+
+
+class CostTableTest(unittest.TestCase):
+    def test_every_level_range_matches_the_milestone_sum(self):
+        tables = [(RELIC_TABLE, RELIC_MILESTONES, RELIC_COSTS), (XP_TABLE, XP_MILESTONES, XP_COSTS), (OATH_TABLE, OATH_MILESTONES, OATH_COSTS)]
+        for table, milestones, costs in tables:
+            for from_level, to_level in itertools.product(LEVELS, repeat=2):
+                expected = sum(cost for level, cost in zip(milestones, costs) if from_level < level <= to_level)
+                self.assertEqual(cost_between(table, from_level, to_level), expected, (milestones[0], from_level, to_level))
+
+    def test_requirements_match_the_old_calculation(self):
+        for inputs in itertools.product(LEVELS, RELICS, MAX_LEVELS, GOALS, GOALS[::2]):
+            self.assertEqual(tuple(requirements(*inputs)), old_requirements(*inputs), inputs)
+
+    def test_roster_batch_matches_one_hero_at_a_time(self):
+        heroes = [(0, 0, 60, None, None), (1, 500, 40, 10, 40), (60, 0, 60, 60, 60), (1, 500, 40, 10, 40), (35, 10 ** 7, 39, 38, 2)]
+
+        results = roster_requirements(heroes)
+
+        self.assertEqual([tuple(result) for result in results], [old_requirements(*hero) for hero in heroes])
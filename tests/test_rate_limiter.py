@@ -0,0 +1,63 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+import rate_limiter
+from rate_limiter import BACKGROUND, INTERACTIVE, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTest(unittest.IsolatedAsyncioTestCase):
+    async def test_no_minute_sees_more_than_the_quota(self):
+        clock = FakeClock()
+        with mock.patch.object(rate_limiter.time, "monotonic", clock):
+            bucket = TokenBucket(60)
+            granted = []
+            # Take every token as soon as it is available, 10 ms at a time
+            while clock.now < 1180:
+                bucket._refill()
+                while bucket._tokens >= 1:
+                    await bucket.acquire()
+                    granted.append(clock.now)
+                clock.now += 0.01
+
+        for start in granted:
+            in_window = [t for t in granted if start <= t < start + 60]
+            self.assertLessEqual(len(in_window), 60)
+        # ...while still using most of it
+        self.assertGreaterEqual(len([t for t in granted if t < 1060]), 59)
+
+    async def test_callers_beyond_the_burst_are_paced(self):
+        bucket = TokenBucket(6000, burst=2)  # 100 a second after the burst
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(12)))
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    async def test_interactive_callers_go_first(self):
+        bucket = TokenBucket(600, burst=1)
+        await bucket.acquire()
+        order = []
+
+        async def take(priority, name):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        background = [asyncio.create_task(take(BACKGROUND, f"background{i}")) for i in range(2)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(take(INTERACTIVE, "interactive"))
+        await asyncio.gather(*background, interactive)
+
+        self.assertEqual(order, ["interactive", "background0", "background1"])
+
+    async def test_zero_per_minute_is_unlimited(self):
+        bucket = TokenBucket(0)
+        await asyncio.wait_for(asyncio.gather(*(bucket.acquire() for _ in range(1000))), 1)
+        self.assertEqual(bucket.waiting, 0)
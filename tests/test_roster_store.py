@@ -0,0 +1,198 @@
+import asyncio
+import collections
+import unittest
+from unittest import mock
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from roster_store import RosterStore
+from sqlite_storage import SqliteBackend
+from support import SPREADSHEET_ID, roster_server, roster_tab, sheets_backend
+from storage import ROSTER_SHEET, RosterRowMissingError
+
+
+class RosterWriteTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.storage = SqliteBackend(":memory:")
+        await self.storage.replace_roster([["u1", "Alpha", "1"], ["u1", "Beta", "1"], ["u2", "Alpha", "1"]])
+        self.roster = RosterStore(self.storage)
+        await self.roster.load()
+
+    async def asyncTearDown(self):
+        self.storage.close()
+
+    async def test_same_user_writes_wait_for_the_transaction(self):
+        async with self.roster.transaction("u1") as transaction:
+            same_user = asyncio.create_task(self.roster.update("u1", "Alpha", "C", [3]))
+            other_user = asyncio.create_task(self.roster.update("u2", "Alpha", "C", [7]))
+            await asyncio.wait_for(other_user, timeout=5)
+            self.assertFalse(same_user.done())
+            await transaction.update("Alpha", "C", [2])
+
+        await asyncio.wait_for(same_user, timeout=5)
+        self.assertEqual(self.roster.get_entry("u1", "Alpha").current_level, 3)
+        self.assertEqual(self.roster.get_entry("u2", "Alpha").current_level, 7)
+
+    async def test_rows_written_since_their_version_was_read_are_skipped(self):
+        versions = {("u1", "Alpha"): self.roster.version("u1", "Alpha"), ("u1", "Beta"): self.roster.version("u1", "Beta")}
+        await self.roster.update("u1", "Alpha", "C", [5])
+
+        stale = await self.roster.update_rows("G", {("u1", "Alpha"): [100], ("u1", "Beta"): [200]}, expected_versions=versions)
+
+        self.assertEqual(stale, [("u1", "Alpha")])
+        self.assertIsNone(self.roster.get_entry("u1", "Alpha").next_unlock)
+        self.assertEqual(self.roster.get_entry("u1", "Beta").next_unlock, 200)
+
+    async def test_removed_rows_count_as_stale(self):
+        versions = {("u1", "Beta"): self.roster.version("u1", "Beta")}
+        await self.roster.remove("u1", "Beta")
+
+        stale = await self.roster.update_rows("G", {("u1", "Beta"): [1]}, expected_versions=versions)
+
+        self.assertEqual(stale, [("u1", "Beta")])
+
+    async def test_write_to_a_row_gone_from_storage_fails(self):
+        rows = await self.storage.load_roster()
+        await self.storage.delete_roster_row(rows[0][0])  # Deleted behind the index's back
+
+        with self.assertRaises(RosterRowMissingError):
+            await self.roster.update_many("u1", "C", {"Alpha": [4], "Beta": [5]})
+        self.assertEqual(self.roster.get_entry("u1", "Beta").current_level, 1)
+        self.assertEqual([row[:3] for _, row in await self.storage.load_roster()], [["u1", "Beta", "1"], ["u2", "Alpha", "1"]])
+
+
+class CountingBackend(SqliteBackend):
+    def __init__(self, path):
+        super().__init__(path)
+        self.roster_loads = 0
+
+    async def load_roster(self, fields=None):
+        self.roster_loads += 1
+        await asyncio.sleep(0.01)  # Long enough for every caller to arrive while the first load runs
+        return await super().load_roster(fields)
+
+
+class RosterLoadTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.storage = CountingBackend(":memory:")
+        await self.storage.replace_roster([["u1", "Alpha", "1"]])
+        self.roster = RosterStore(self.storage)
+
+    async def asyncTearDown(self):
+        self.storage.close()
+
+    async def test_concurrent_first_use_loads_once(self):
+        await asyncio.gather(*(self.roster.ensure_loaded() for _ in range(10)))
+
+        self.assertEqual(self.storage.roster_loads, 1)
+        self.assertEqual(self.roster.get_entry("u1", "Alpha").current_level, 1)
+
+
+class RosterSyncTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # Enough rows that a few edits stay below the share that makes sync() reload instead
+        self.server = roster_server([["u1", "Alpha", "1", "10"], ["u1", "Beta", "2", "20"]] + [[f"user{i}", "Alpha", "3", "30"] for i in range(10)])
+        self.storage = sheets_backend(self.server)
+        self.roster = RosterStore(self.storage)
+        await self.roster.load()
+
+    async def asyncTearDown(self):
+        self.storage.close()
+
+    def edit(self, row_number, first_column, values):
+        self.server.edit(SPREADSHEET_ID, ROSTER_SHEET, row_number, first_column, values)
+
+    async def assert_matches_a_fresh_load(self):
+        fresh = RosterStore(self.storage)
+        await fresh.load()
+        snapshot = lambda roster: {(user_id, hero_name): entry.to_row() for user_id, hero_name, entry in roster.entries()}
+        self.assertEqual(snapshot(self.roster), snapshot(fresh))
+
+    async def test_unchanged_spreadsheet_reads_only_its_version(self):
+        before = collections.Counter(self.server.requests)
+        self.assertEqual(await self.roster.sync(), set())
+        self.assertEqual(self.server.requests - before, {"drive.files.get": 1})
+
+    async def test_own_writes_keep_the_sync_on_its_fast_path(self):
+        await self.roster.update("u1", "Alpha", "C", [7])
+        await self.roster.add("u2", "Beta")
+        await self.storage.flush()
+
+        before = collections.Counter(self.server.requests)
+        self.assertEqual(await self.roster.sync(), set())
+        self.assertEqual(self.server.requests - before, {"drive.files.get": 1})
+
+    async def test_edit_made_after_an_own_write_is_still_found(self):
+        await self.roster.update("u1", "Alpha", "C", [7])
+        await self.storage.flush()
+        self.edit(3, "C", ["8"])
+
+        self.assertEqual(await self.roster.sync(), {("u1", "Beta")})
+        self.assertEqual(self.roster.get_entry("u1", "Beta").current_level, 8)
+        await self.assert_matches_a_fresh_load()
+
+    async def test_edited_cleared_and_appended_rows_are_patched(self):
+        self.edit(2, "C", ["9"])
+        self.edit(3, "A", [""] * 4)
+        self.edit(14, "A", ["u3", "Alpha", "5"])
+
+        changed = await self.roster.sync()
+
+        self.assertEqual(changed, {("u1", "Alpha"), ("u1", "Beta"), ("u3", "Alpha")})
+        self.assertEqual(self.roster.get_entry("u1", "Alpha").current_level, 9)
+        self.assertIsNone(self.roster.get_entry("u1", "Beta"))
+        self.assertEqual(self.roster.get_entry("u3", "Alpha").current_level, 5)
+        await self.assert_matches_a_fresh_load()
+
+    async def test_rows_whose_writes_were_rejected_are_read_back(self):
+        async def reject(spreadsheet_id, data):
+            raise HttpError(httplib2.Response({"status": 400}), b"{}")
+
+        await self.roster.update("u1", "Alpha", "C", [7])
+        with mock.patch.object(self.storage.sheets, "batch_update_values", reject):
+            await self.storage.flush()
+
+        self.assertEqual(await self.roster.sync(), {("u1", "Alpha")})
+        self.assertEqual(self.roster.get_entry("u1", "Alpha").current_level, 1)
+        await self.assert_matches_a_fresh_load()
+
+    async def test_inserted_row_reloads_the_roster(self):
+        roster_tab(self.server).insert(2, ["u3", "Beta", "6"])
+        self.edit(15, "A", [])  # Only raises the spreadsheet's version
+
+        self.assertIsNone(await self.roster.sync())
+        self.assertEqual(self.roster.get_entry("u3", "Beta").current_level, 6)
+        await self.assert_matches_a_fresh_load()
+
+    async def test_moved_rows_reload_the_roster(self):
+        tab = roster_tab(self.server)
+        tab[1], tab[2] = tab[2], tab[1]
+        self.edit(15, "A", [])
+
+        self.assertIsNone(await self.roster.sync())
+        await self.roster.update("u1", "Alpha", "C", [8])
+        await self.storage.flush()
+        self.assertEqual(tab[2][:3], ["u1", "Alpha", "8"])
+
+    async def test_duplicate_row_does_not_reload_on_every_sync(self):
+        self.edit(14, "A", ["u1", "Alpha", "99"])
+        self.assertEqual(await self.roster.sync(), set())
+        self.edit(3, "C", ["7"])
+
+        self.assertEqual(await self.roster.sync(), {("u1", "Beta")})
+        self.assertEqual(self.roster.get_entry("u1", "Alpha").current_level, 1)
+
+    async def test_bot_write_during_sync_keeps_the_bot_value(self):
+        self.edit(2, "C", ["50"])
+        load_roster = self.storage.load_roster
+
+        async def load_roster_then_write(fields=None):
+            rows = await load_roster(fields)
+            await self.roster.update("u1", "Alpha", "C", [60])
+            return rows
+
+        self.storage.load_roster = load_roster_then_write
+        await self.roster.sync()
+
+        self.assertEqual(self.roster.get_entry("u1", "Alpha").current_level, 60)
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import shared_store
+from roster_store import RosterStore
+from shared_store import SharedStoreBackend
+from storage import ROSTER_COLUMNS, DuplicateRosterRowError
+
+
+def full_row(*values):
+    return list(values) + [""] * (len(ROSTER_COLUMNS) - len(values))
+
+
+class SharedStoreTest(unittest.IsolatedAsyncioTestCase):
+    """Two shard processes, A and B, sharing one store file."""
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, "shared.db")
+        self.store_a = SharedStoreBackend(path, "a")
+        self.store_b = SharedStoreBackend(path, "b")
+        await self.store_a.apply_sheet_rows([full_row("u1", "Alpha", "1", "10"), full_row("u1", "Beta", "2", "20"), full_row("u2", "Alpha", "3", "30")], [])
+        await self.store_a.mark_seeded()
+        self.roster_a = RosterStore(self.store_a)
+        self.roster_b = RosterStore(self.store_b)
+        await self.roster_a.load()
+        await self.roster_b.load()
+
+    async def asyncTearDown(self):
+        self.store_a.close()
+        self.store_b.close()
+        self.directory.cleanup()
+
+    async def stored_row(self, user_id, hero_name):
+        row = (await self.store_a.load_roster_by_key()).get((user_id, hero_name))
+        return row and row[:4]
+
+    async def test_writes_reach_the_other_process_on_sync(self):
+        await self.roster_a.update("u1", "Alpha", "C", [5, 50])
+        await self.roster_a.remove("u2", "Alpha")
+
+        self.assertEqual(await self.roster_b.sync(), {("u1", "Alpha"), ("u2", "Alpha")})
+        self.assertEqual(self.roster_b.get_entry("u1", "Alpha").current_level, 5)
+        self.assertIsNone(self.roster_b.get_entry("u2", "Alpha"))
+        self.assertEqual(await self.roster_a.sync(), set())  # Its own writes are already in its index
+
+    async def test_hero_removed_and_added_again_elsewhere_takes_the_new_row(self):
+        await self.roster_a.remove("u1", "Beta")
+        await self.roster_a.add("u1", "Beta")
+
+        self.assertEqual(await self.roster_b.sync(), {("u1", "Beta")})
+        await self.roster_b.update("u1", "Beta", "C", [10, 5])
+
+        self.assertEqual(await self.stored_row("u1", "Beta"), ["u1", "Beta", "10", "5"])
+
+    async def add_relics(self, roster, amount):
+        async with roster.transaction("u1") as transaction:
+            relics = transaction.get_entry("Alpha").current_relics
+            await asyncio.sleep(0.05)  # Both processes would read the same value without the cross-process lock
+            await transaction.update("Alpha", "D", [relics + amount])
+
+    async def test_read_modify_write_from_two_processes_loses_nothing(self):
+        await asyncio.gather(self.add_relics(self.roster_a, 5), self.add_relics(self.roster_b, 7))
+
+        self.assertEqual(await self.stored_row("u1", "Alpha"), ["u1", "Alpha", "1", "22"])
+
+    async def test_other_users_are_not_held_up(self):
+        async with self.roster_a.transaction("u1"):
+            await asyncio.wait_for(self.roster_b.update("u2", "Alpha", "C", [9]), timeout=5)
+
+    async def test_lock_held_longer_than_its_ttl_is_renewed(self):
+        with mock.patch.object(shared_store, "USER_LOCK_TTL", 0.1), mock.patch.object(shared_store, "USER_LOCK_RENEW_INTERVAL", 0.03):
+            async with self.roster_a.transaction("u1"):
+                await asyncio.sleep(0.3)
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.roster_b.update("u1", "Alpha", "C", [9]), timeout=0.2)
+
+    async def test_transaction_sees_a_hero_added_by_the_other_process(self):
+        await self.roster_a.add("u1", "Gamma")
+
+        async with self.roster_b.transaction("u1") as transaction:
+            self.assertIsNotNone(transaction.get_entry("Gamma"))
+
+    async def test_adding_a_hero_storage_already_has_is_reported(self):
+        await self.roster_a.add("u1", "Gamma")
+
+        with self.assertRaises(DuplicateRosterRowError):
+            await self.store_b.append_roster_row(["u1", "Gamma"])
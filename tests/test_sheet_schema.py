@@ -0,0 +1,41 @@
+import unittest
+
+from sheet_schema import SheetSchema
+
+
+class SheetSchemaTest(unittest.TestCase):
+    def setUp(self):
+        self.schema = SheetSchema("Roster", ("user_id", "hero_name", "current_level", "current_relics", None, "goal"))
+
+    def test_header_row_moves_and_renames_columns(self):
+        self.schema.resolve(["User ID", "Hero  Name", "Goal", "Current Level"])
+
+        self.assertEqual(self.schema.column("goal"), 2)
+        self.assertEqual(self.schema.column("Current_Level"), 3)
+        self.assertEqual(self.schema.column("hero_name"), 1)
+        with self.assertRaises(KeyError):
+            self.schema.column("rarity")
+
+    def test_fields_become_the_fewest_column_ranges(self):
+        runs = self.schema.column_runs(["goal", "user_id", "hero_name"])
+
+        self.assertEqual(runs, [(0, 1), (5, 5)])
+        self.assertEqual(self.schema.ranges(runs), ["Roster!A2:B", "Roster!F2:F"])
+
+    def test_assemble_rebuilds_positional_rows(self):
+        runs = [(0, 1), (3, 4)]
+        value_ranges = [
+            [["u1", "Alpha"], [], ["u3", "Gamma"]],
+            [["7", "8"], [], [], ["9"]],
+        ]
+
+        self.assertEqual(SheetSchema.assemble(runs, value_ranges), [
+            ["u1", "Alpha", "", "7", "8"],
+            [],  # Empty in every range, like an empty row of a plain read
+            ["u3", "Gamma", "", "", ""],
+            ["", "", "", "9", ""],
+        ])
+
+    def test_assemble_with_no_values(self):
+        self.assertEqual(SheetSchema.assemble([(0, 1)], [[]]), [])
+        self.assertEqual(SheetSchema.assemble([], []), [])
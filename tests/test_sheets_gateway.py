@@ -0,0 +1,51 @@
+import asyncio
+import unittest
+
+from fake_sheets import FakeSheetsGateway
+from support import SPREADSHEET_ID, roster_server, roster_tab
+from storage import ROSTER_SHEET
+
+
+class SheetsGatewayTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = roster_server([["u1", "Alpha", "1"]])
+        self.gateway = FakeSheetsGateway(self.server, max_workers=4, reads_per_minute=100000, writes_per_minute=100000)
+
+    async def asyncTearDown(self):
+        self.gateway.close()
+
+    async def test_append_is_not_abandoned_by_the_call_timeout(self):
+        self.server.latency = 0.2
+        self.gateway.timeout = 0.05
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.gateway.get_values(SPREADSHEET_ID, f"{ROSTER_SHEET}!A2:P")
+        result = await self.gateway.append_values(SPREADSHEET_ID, f"{ROSTER_SHEET}!A2:P", [["u2", "Beta"]])
+
+        self.assertEqual(result["updates"]["updatedRange"], f"'{ROSTER_SHEET}'!A3:B3")
+        self.assertEqual(roster_tab(self.server)[2], ["u2", "Beta"])
+
+    async def test_overlapping_identical_reads_share_one_request(self):
+        self.server.latency = 0.05
+        range_name = f"{ROSTER_SHEET}!A2:P"
+
+        results = await asyncio.gather(*(self.gateway.get_values(SPREADSHEET_ID, range_name) for _ in range(5)))
+
+        self.assertEqual(self.server.requests["sheets.spreadsheets.values.get"], 1)
+        self.assertEqual(results, [[["u1", "Alpha", "1"]]] * 5)
+        results[0][0][2] = "changed"  # Every caller gets rows of its own
+        self.assertEqual(results[1][0][2], "1")
+
+    async def test_read_issued_after_a_write_does_not_join_an_earlier_read(self):
+        self.server.latency = 0.05
+        range_name = f"{ROSTER_SHEET}!C2"
+
+        before = asyncio.create_task(self.gateway.get_values(SPREADSHEET_ID, range_name))
+        while not self.server.requests["sheets.spreadsheets.values.get"]:  # Wait until the server has read the cell
+            await asyncio.sleep(0.001)
+        await self.gateway.update_values(SPREADSHEET_ID, range_name, [["7"]])
+        after = await self.gateway.get_values(SPREADSHEET_ID, range_name)
+
+        self.assertEqual(after, [["7"]])
+        self.assertEqual(await before, [["1"]])
+        self.assertEqual(self.server.requests["sheets.spreadsheets.values.get"], 2)
@@ -0,0 +1,58 @@
+import unittest
+
+from roster_store import RosterStore
+from support import SPREADSHEET_ID, roster_server, roster_tab, sheets_backend
+from storage import ROSTER_SHEET
+
+
+class SheetsRosterAppendTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = roster_server([["u1", "Alpha", "1"]])
+        self.storage = sheets_backend(self.server)
+        self.roster = RosterStore(self.storage)
+        await self.roster.load()
+
+    async def asyncTearDown(self):
+        self.storage.close()
+
+    async def test_new_row_never_lands_on_a_row_typed_into_the_sheet(self):
+        self.server.edit(SPREADSHEET_ID, ROSTER_SHEET, 3, "A", ["human", "Beta", "5"])
+
+        await self.roster.add("u2", "Beta")
+        await self.roster.update("u2", "Beta", "C", [2])
+        await self.storage.flush()
+
+        tab = roster_tab(self.server)
+        self.assertEqual(tab[2][:3], ["human", "Beta", "5"])
+        self.assertEqual(tab[3][:3], ["u2", "Beta", "2"])
+
+    async def test_appended_rows_are_found_again_after_a_reload(self):
+        await self.roster.add("u2", "Beta")
+        await self.roster.add("u3", "Alpha")
+        await self.roster.update("u3", "Alpha", "C", [4])
+        await self.storage.flush()
+
+        reloaded = RosterStore(self.storage)
+        await reloaded.load()
+        self.assertIsNotNone(reloaded.get_entry("u2", "Beta"))
+        self.assertEqual(reloaded.get_entry("u3", "Alpha").current_level, 4)
+
+    async def test_row_cleared_in_the_sheet_is_reused_without_its_old_writes(self):
+        await self.roster.add("u2", "Beta")
+        await self.roster.add("u3", "Beta")
+        await self.storage.flush()
+        await self.roster.update("u2", "Beta", "C", [7])
+        self.server.edit(SPREADSHEET_ID, ROSTER_SHEET, 3, "A", [""] * 4)  # Cleared by hand before the update is flushed
+
+        await self.roster.add("u4", "Alpha")
+        await self.storage.flush()
+
+        tab = roster_tab(self.server)
+        self.assertEqual([row[:3] for row in tab[1:4]], [["u1", "Alpha", "1"], ["u4", "Alpha", ""], ["u3", "Beta"]])
+        self.assertIsNone(self.roster.get_entry("u2", "Beta"))
+
+    async def test_replacing_the_roster_forgets_its_tombstones(self):
+        await self.roster.remove("u1", "Alpha")
+        await self.storage.replace_roster([["u2", "Beta"]])
+
+        self.assertFalse(await self.storage.compact_roster())
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from roster_store import RosterStore
+from sheets_writer import SheetsWriter
+from shared_store import SharedStoreBackend
+from storage import ROSTER_SHEET
+from support import SPREADSHEET_ID, roster_server, roster_tab, sheets_backend
+
+
+class SheetsWriterTest(unittest.IsolatedAsyncioTestCase):
+    """Two shard processes, A and B, sharing one store file and one spreadsheet."""
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, "shared.db")
+        self.server = roster_server([["u1", "Alpha", "1"], ["u1", "Beta", "2"], ["u2", "Alpha", "3"]])
+        self.writer_a = SheetsWriter(SharedStoreBackend(path, "a"), sheets_backend(self.server), "a", lease_ttl=30, catalog_ttl=3600, sync_interval=0, compaction_interval=0.01)
+        self.writer_b = SheetsWriter(SharedStoreBackend(path, "b"), sheets_backend(self.server), "b", lease_ttl=30, catalog_ttl=3600, sync_interval=0)
+        self.store_a = SharedStoreBackend(path, "a")
+        self.roster_a = RosterStore(self.store_a)
+
+        await self.writer_a.step()
+        await self.writer_b.step()
+        await self.roster_a.load()
+
+    async def asyncTearDown(self):
+        for writer in (self.writer_a, self.writer_b):
+            if writer is not None:
+                await writer.close()
+        self.store_a.close()
+        self.directory.cleanup()
+
+    async def test_only_one_process_writes_to_sheets(self):
+        self.assertTrue(self.writer_a.is_writer)
+        self.assertFalse(self.writer_b.is_writer)
+
+        await self.writer_a.close()  # Hands the lease on
+        self.writer_a = None
+        await self.writer_b.step()
+        self.assertTrue(self.writer_b.is_writer)
+
+    async def test_shard_writes_are_pushed_to_the_spreadsheet(self):
+        await self.roster_a.update("u1", "Alpha", "C", [7])
+        await self.roster_a.add("u3", "Beta")
+
+        await self.writer_a.step()
+
+        tab = roster_tab(self.server)
+        self.assertEqual(tab[1][:3], ["u1", "Alpha", "7"])
+        self.assertEqual(tab[4][:2], ["u3", "Beta"])
+
+    async def test_spreadsheet_edits_reach_the_shards(self):
+        self.writer_a.sync_interval = 0.001
+        self.server.edit(SPREADSHEET_ID, ROSTER_SHEET, 3, "C", ["9"])
+        await asyncio.sleep(0.01)
+
+        await self.writer_a.step()
+
+        self.assertEqual(await self.roster_a.sync(), {("u1", "Beta")})
+        self.assertEqual(self.roster_a.get_entry("u1", "Beta").current_level, 9)
+
+    async def test_removed_rows_are_compacted_out_of_the_spreadsheet(self):
+        await self.roster_a.remove("u1", "Beta")
+        await asyncio.sleep(0.02)
+
+        await self.writer_a.step()
+
+        self.assertEqual([row[:2] for row in roster_tab(self.server)[1:]], [["u1", "Alpha"], ["u2", "Alpha"]])
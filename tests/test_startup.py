@@ -0,0 +1,116 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from startup import DEGRADED, READY, Readiness, sync_command_tree
+
+
+class FakeCommand:
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+
+    def to_dict(self, tree=None):
+        return {"name": self.name, "description": self.description}
+
+
+class FakeTree:
+    def __init__(self, *commands):
+        self.commands = list(commands)
+        self.syncs = 0
+
+    def get_commands(self):
+        return self.commands
+
+    async def sync(self):
+        self.syncs += 1
+
+
+class FakeResponse:
+    def __init__(self):
+        self.deferred = False
+
+    def is_done(self):
+        return self.deferred
+
+    async def defer(self, **kwargs):
+        self.deferred = True
+
+
+class FakeInteraction:
+    def __init__(self):
+        self.response = FakeResponse()
+
+
+class SyncCommandTreeTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.directory.name, ".command_tree.sha256")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def test_only_changed_definitions_are_synced(self):
+        tree = FakeTree(FakeCommand("help", "Lists the commands"), FakeCommand("hero_info", "Shows a hero"))
+
+        self.assertTrue(await sync_command_tree(tree, self.state_file))
+        self.assertFalse(await sync_command_tree(tree, self.state_file))
+        tree.commands.reverse()  # Order doesn't matter
+        self.assertFalse(await sync_command_tree(tree, self.state_file))
+
+        tree.commands[0].description = "Lists every command"
+        self.assertTrue(await sync_command_tree(tree, self.state_file))
+        self.assertEqual(tree.syncs, 2)
+
+    async def test_force_syncs_an_unchanged_tree(self):
+        tree = FakeTree(FakeCommand("help", "Lists the commands"))
+        await sync_command_tree(tree, self.state_file)
+
+        self.assertTrue(await sync_command_tree(tree, self.state_file, force=True))
+        self.assertEqual(tree.syncs, 2)
+
+
+class ReadinessTest(unittest.IsolatedAsyncioTestCase):
+    async def test_commands_wait_for_warm_up_after_being_acknowledged(self):
+        readiness = Readiness()
+        readiness.start()
+        ran = []
+
+        @readiness.gate
+        async def command(interaction):
+            ran.append(interaction)
+
+        interaction = FakeInteraction()
+        task = asyncio.create_task(command(interaction))
+        await asyncio.sleep(0.01)
+        self.assertTrue(interaction.response.deferred)
+        self.assertEqual((ran, readiness.queued), ([], 1))
+
+        readiness.finish()
+        await task
+        self.assertEqual((ran, readiness.queued), ([interaction], 0))
+        self.assertTrue(readiness.ready)
+
+    async def test_commands_after_warm_up_run_straight_away(self):
+        readiness = Readiness()
+        readiness.finish(DEGRADED)
+
+        @readiness.gate
+        async def command(interaction):
+            return "done"
+
+        interaction = FakeInteraction()
+        self.assertEqual(await command(interaction), "done")
+        self.assertFalse(interaction.response.deferred)  # Left to the command itself
+        self.assertFalse(readiness.ready)
+
+    async def test_queued_command_runs_anyway_after_the_queue_timeout(self):
+        readiness = Readiness(queue_timeout=0.01)
+        readiness.start()
+
+        @readiness.gate
+        async def command(interaction):
+            return readiness.state
+
+        self.assertNotEqual(await asyncio.wait_for(command(FakeInteraction()), timeout=1), READY)
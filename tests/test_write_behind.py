@@ -0,0 +1,86 @@
+import unittest
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from write_behind import WriteBehindQueue
+
+
+class FlakySheets:
+    # Records batch writes; the first `failures` of them raise
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    async def batch_update_values(self, spreadsheet_id, data):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Sheets is unreachable")
+        self.batches.append({item["range"]: item["values"] for item in data})
+
+
+class RejectingSheets(FlakySheets):
+    # Answers HTTP 400 for any batch that writes one of the `bad_ranges`
+    def __init__(self, bad_ranges):
+        super().__init__()
+        self.bad_ranges = set(bad_ranges)
+
+    async def batch_update_values(self, spreadsheet_id, data):
+        if any(item["range"] in self.bad_ranges for item in data):
+            raise HttpError(httplib2.Response({"status": 400}), b'{"error": {"code": 400, "status": "INVALID_ARGUMENT"}}')
+        await super().batch_update_values(spreadsheet_id, data)
+
+
+class WriteBehindQueueTest(unittest.IsolatedAsyncioTestCase):
+    async def test_writes_in_one_window_share_one_batch(self):
+        sheets = FlakySheets()
+        queue = WriteBehindQueue(sheets, "spreadsheet", "Roster", flush_interval=60)
+        queue.stage(2, 2, ["1", "2"])
+        queue.stage(2, 2, ["3"])
+        queue.stage(5, 0, ["u1"])
+
+        await queue.flush()
+
+        self.assertEqual(sheets.batches, [{"Roster!C2:D2": [["3", "2"]], "Roster!A5:A5": [["u1"]]}])
+        self.assertEqual(queue.pending_rows, 0)
+
+    async def test_failed_batch_is_requeued_under_newer_writes(self):
+        sheets = FlakySheets(failures=1)
+        queue = WriteBehindQueue(sheets, "spreadsheet", "Roster", flush_interval=60)
+        queue.stage(2, 2, ["1", "2"])
+
+        with self.assertRaises(ConnectionError):
+            await queue.flush()
+        self.assertEqual(queue.pending_rows, 1)
+        queue.stage(2, 3, ["9"])
+        await queue.flush()
+
+        self.assertEqual(sheets.batches, [{"Roster!C2:D2": [["1", "9"]]}])
+
+    async def test_none_does_not_undo_a_staged_value(self):
+        sheets = FlakySheets()
+        queue = WriteBehindQueue(sheets, "spreadsheet", "Roster", flush_interval=60)
+        queue.stage(2, 2, ["1"])
+        queue.stage(2, 2, [None, "2"])
+
+        await queue.flush()
+
+        self.assertEqual(sheets.batches, [{"Roster!C2:D2": [["1", "2"]]}])
+
+    async def test_rejected_range_is_dropped_and_the_rest_written(self):
+        sheets = RejectingSheets(["Roster!C3:C3"])
+        queue = WriteBehindQueue(sheets, "spreadsheet", "Roster", flush_interval=60)
+        queue.stage(2, 2, ["1"])
+        queue.stage(3, 2, ["bad"])
+        queue.stage(3, 5, ["6"])
+
+        await queue.flush()
+
+        self.assertEqual(sheets.batches, [{"Roster!C2:C2": [["1"]]}, {"Roster!F3:F3": [["6"]]}])
+        self.assertEqual(queue.pending_rows, 0)
+        self.assertEqual(queue.rejected_rows, {3})
+
+        # Nothing is left behind to block later flushes
+        queue.stage(2, 2, ["2"])
+        await queue.flush()
+        self.assertEqual(sheets.batches[-1], {"Roster!C2:C2": [["2"]]})